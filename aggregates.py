@@ -0,0 +1,127 @@
+from sqlalchemy import text, inspect as sa_inspect
+import database
+
+# Tabel rollup yang dipelihara inkremental oleh load Fakta_Penjualan.
+# Laporan membaca tabel kecil ini, bukan memindai ulang seluruh tabel fakta.
+# kategori NULL disimpan sebagai '' (kolom primary key tidak boleh NULL).
+TABEL_AGREGAT = {
+    'agg_penjualan_kategori_bulan': """
+        CREATE TABLE IF NOT EXISTS agg_penjualan_kategori_bulan (
+            kategori TEXT NOT NULL,
+            tahun INTEGER NOT NULL,
+            bulan INTEGER NOT NULL,
+            total_penjualan NUMERIC NOT NULL DEFAULT 0,
+            jumlah_baris BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (kategori, tahun, bulan)
+        )
+    """,
+    'agg_penjualan_pelanggan': """
+        CREATE TABLE IF NOT EXISTS agg_penjualan_pelanggan (
+            pelanggan_key INTEGER PRIMARY KEY,
+            total_belanja NUMERIC NOT NULL DEFAULT 0,
+            jumlah_baris BIGINT NOT NULL DEFAULT 0
+        )
+    """,
+    'agg_penjualan_lokasi_bulan': """
+        CREATE TABLE IF NOT EXISTS agg_penjualan_lokasi_bulan (
+            id_lokasi INTEGER NOT NULL,
+            tahun INTEGER NOT NULL,
+            bulan INTEGER NOT NULL,
+            total_penjualan NUMERIC NOT NULL DEFAULT 0,
+            jumlah_baris BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (id_lokasi, tahun, bulan)
+        )
+    """,
+}
+
+# Kolom fakta yang dibutuhkan untuk menghitung delta
+KOLOM_DELTA = ['id_order_detail', 'id_produk', 'id_waktu', 'pelanggan_key', 'id_lokasi', 'total_harga']
+
+# Query merge per rollup. {sumber} berisi baris (..., nilai, jumlah) dengan tanda +/-.
+_MERGE_SQL = {
+    'agg_penjualan_kategori_bulan': """
+        INSERT INTO agg_penjualan_kategori_bulan (kategori, tahun, bulan, total_penjualan, jumlah_baris)
+        SELECT COALESCE(dp.kategori, ''), d.id_waktu / 10000, (d.id_waktu / 100) % 100, SUM(d.nilai), SUM(d.jumlah)
+        FROM ({sumber}) d LEFT JOIN "Dim_Produk" dp ON d.id_produk = dp.id_produk
+        GROUP BY 1, 2, 3
+        ON CONFLICT (kategori, tahun, bulan) DO UPDATE SET
+            total_penjualan = agg_penjualan_kategori_bulan.total_penjualan + EXCLUDED.total_penjualan,
+            jumlah_baris = agg_penjualan_kategori_bulan.jumlah_baris + EXCLUDED.jumlah_baris
+    """,
+    'agg_penjualan_pelanggan': """
+        INSERT INTO agg_penjualan_pelanggan (pelanggan_key, total_belanja, jumlah_baris)
+        SELECT d.pelanggan_key, SUM(d.nilai), SUM(d.jumlah)
+        FROM ({sumber}) d
+        GROUP BY 1
+        ON CONFLICT (pelanggan_key) DO UPDATE SET
+            total_belanja = agg_penjualan_pelanggan.total_belanja + EXCLUDED.total_belanja,
+            jumlah_baris = agg_penjualan_pelanggan.jumlah_baris + EXCLUDED.jumlah_baris
+    """,
+    'agg_penjualan_lokasi_bulan': """
+        INSERT INTO agg_penjualan_lokasi_bulan (id_lokasi, tahun, bulan, total_penjualan, jumlah_baris)
+        SELECT d.id_lokasi, d.id_waktu / 10000, (d.id_waktu / 100) % 100, SUM(d.nilai), SUM(d.jumlah)
+        FROM ({sumber}) d
+        WHERE d.id_lokasi IS NOT NULL
+        GROUP BY 1, 2, 3
+        ON CONFLICT (id_lokasi, tahun, bulan) DO UPDATE SET
+            total_penjualan = agg_penjualan_lokasi_bulan.total_penjualan + EXCLUDED.total_penjualan,
+            jumlah_baris = agg_penjualan_lokasi_bulan.jumlah_baris + EXCLUDED.jumlah_baris
+    """,
+}
+
+def pastikan_tabel_agregat(connection):
+    """Membuat tabel rollup jika belum ada. Mengembalikan True jika ada tabel yang baru dibuat."""
+    inspector = sa_inspect(connection)
+    baru = [nama for nama in TABEL_AGREGAT if not inspector.has_table(nama)]
+    for nama in baru:
+        connection.execute(text(TABEL_AGREGAT[nama]))
+    return bool(baru)
+
+def bangun_ulang_agregat(connection):
+    """Menghitung ulang semua rollup dari nol berdasarkan isi Fakta_Penjualan saat ini."""
+    pastikan_tabel_agregat(connection)
+    connection.execute(text(f"TRUNCATE TABLE {', '.join(TABEL_AGREGAT)}"))
+    sumber = 'SELECT id_produk, id_waktu, pelanggan_key, id_lokasi, total_harga AS nilai, 1 AS jumlah FROM "Fakta_Penjualan"'
+    for sql in _MERGE_SQL.values():
+        connection.execute(text(sql.format(sumber=sumber)))
+    print("   -> ✅ Tabel agregat dibangun ulang dari Fakta_Penjualan.")
+
+def terapkan_delta(connection, df_delta):
+    """
+    Menggabungkan delta load fakta ke semua rollup.
+    WAJIB dipanggil di transaksi load, SEBELUM baris fakta ditulis: baris lama dengan
+    id_order_detail yang sama dikurangkan (kontribusi negatif), baris baru ditambahkan.
+    """
+    tabel_delta = '_agg_delta'
+    database.bulk_load(df_delta[KOLOM_DELTA], tabel_delta, connection, if_exists='replace')
+    terapkan_delta_tabel(connection, tabel_delta)
+    connection.execute(text(f"DROP TABLE IF EXISTS {tabel_delta}"))
+
+def terapkan_delta_tabel(connection, tabel_delta):
+    """
+    Seperti terapkan_delta, tetapi delta sudah berada di tabel database
+    (minimal kolom KOLOM_DELTA, satu baris per id_order_detail), mis. tabel muat paralel fakta.
+    """
+    if pastikan_tabel_agregat(connection):
+        # Rollup baru dibuat sementara fakta mungkin sudah berisi -> isi dulu dari fakta
+        bangun_ulang_agregat(connection)
+
+    sumber = f"""
+        SELECT id_produk, id_waktu, pelanggan_key, id_lokasi, total_harga AS nilai, 1 AS jumlah FROM {tabel_delta}
+        UNION ALL
+        SELECT f.id_produk, f.id_waktu, f.pelanggan_key, f.id_lokasi, -f.total_harga, -1
+        FROM "Fakta_Penjualan" f JOIN {tabel_delta} d ON f.id_order_detail = d.id_order_detail
+    """
+    for sql in _MERGE_SQL.values():
+        connection.execute(text(sql.format(sumber=sumber)))
+
+def keluarkan_dari_agregat(connection, query_baris):
+    """
+    Mengurangkan kontribusi baris fakta hasil query_baris (SELECT dengan kolom Fakta_Penjualan)
+    dari semua rollup, mis. untuk partisi fakta yang diganti atau dipensiunkan.
+    """
+    if pastikan_tabel_agregat(connection):
+        bangun_ulang_agregat(connection)
+    sumber = f"SELECT id_produk, id_waktu, pelanggan_key, id_lokasi, -total_harga AS nilai, -1 AS jumlah FROM ({query_baris}) f"
+    for sql in _MERGE_SQL.values():
+        connection.execute(text(sql.format(sumber=sumber)))
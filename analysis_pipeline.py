@@ -1,122 +1,168 @@
 import pandas as pd
 from sqlalchemy import create_engine
-import matplotlib.pyplot as plt
-import seaborn as sns
 import os
 from datetime import datetime
 import re
-from wordcloud import WordCloud
+from functools import partial
 import config
+import database
+import query_engine
+import report_cache
+import chart_renderer
+import run_metrics
+import checkpoint
+import scheduler
+import frekuensi_kata
+import sketsa
 
-def generate_report_penjualan_per_kategori(p_source_engine, p_target_engine, show_plot=True):
+def _baca_laporan(nama_laporan, query, p_source_engine):
+    """
+    Menjalankan query laporan. p_source_engine boleh engine PostgreSQL (query asli)
+    atau koneksi lake DuckDB dari query_engine.buka_koneksi_lake() (query setara di atas file lake).
+    """
+    if query_engine.adalah_koneksi_lake(p_source_engine):
+        df = query_engine.jalankan_query_lake(p_source_engine, nama_laporan)
+    else:
+        df = pd.read_sql_query(query, p_source_engine)
+    run_metrics.catat_baca(len(df))
+    return df
+
+def _simpan_ke_data_mart(df_report, nama_tabel, p_target_engine, label='Hasil analisis'):
+    """Menyimpan hasil ke Data Mart; dilewati jika p_target_engine None (mis. mode lake tanpa server DB)."""
+    if p_target_engine is None:
+        print("   -> ⏭️ Tanpa target Data Mart, penyimpanan hasil dilewati.")
+        return
+    database.bulk_load(df_report, nama_tabel, p_target_engine)
+    print(f"   -> ✅ {label} berhasil disimpan ke Data Mart.")
+
+def _render_atau_antre(tugas, show_plot, antrean_render):
+    """
+    Render grafik langsung (pemakaian per fungsi, mis. di notebook) atau masukkan ke antrean
+    supaya run_all_analysis merender semuanya paralel setelah semua data terkumpul.
+    """
+    if antrean_render is not None:
+        antrean_render.append(tugas)
+        return None
+    image_path = chart_renderer.render(tugas, tampilkan=show_plot)
+    chart_renderer.catat_hasil(tugas, image_path)
+    return image_path
+
+# Tabel input tiap laporan (mode PostgreSQL), dipakai untuk kunci cache laporan
+TABEL_INPUT_LAPORAN = {
+    'penjualan_per_kategori': ['agg_penjualan_kategori_bulan'],
+    'tren_bulanan': ['agg_penjualan_kategori_bulan'],
+    'top_10_pelanggan': ['agg_penjualan_pelanggan', 'Dim_Pelanggan'],
+    'sentimen_vs_penjualan': ['Fakta_Penjualan', 'Dim_Pelanggan', 'stg_analisis_sentimen'],
+    'kinerja_kuartalan': ['stg_dokumen_pdf'],
+    'word_cloud': [frekuensi_kata.TABEL_FREKUENSI],
+    'pelanggan_unik_kota_bulan': [sketsa.TABEL_SKETSA, 'Dim_Lokasi'],
+    'persentil_belanja_kategori': [sketsa.TABEL_SKETSA],
+}
+
+def _cek_cache(nama_laporan, query, p_source_engine, pakai_cache):
+    """
+    Menghitung kunci cache (query + versi tabel input) dan mengecek apakah laporan bisa dilewati.
+    Mengembalikan (kunci, hit). kunci None jika cache tidak dipakai.
+    """
+    if not pakai_cache:
+        return None, False
+    if query_engine.adalah_koneksi_lake(p_source_engine):
+        kunci = report_cache.hitung_kunci(query_engine.QUERY_LAKE[nama_laporan], query_engine.sidik_jari_lake())
+    else:
+        kunci = report_cache.hitung_kunci(query, database.baca_versi_tabel(p_source_engine, TABEL_INPUT_LAPORAN[nama_laporan]))
+    hit = report_cache.cek(nama_laporan, kunci)
+    if hit:
+        print("   -> ⏭️ Input & query tidak berubah (cache hit): query, Data Mart & grafik dilewati.")
+    return kunci, hit
+
+def generate_report_penjualan_per_kategori(p_source_engine, p_target_engine, show_plot=True, pakai_cache=False, antrean_render=None):
     """
     Membuat laporan penjualan per kategori, menyimpan hasil ke Data Mart,
     dan membuat visualisasi bar chart.
     """
     print("\n--- 📞 Laporan 1: Penjualan per Kategori ---")
     try:
+        # Dibaca dari tabel rollup (dipelihara inkremental oleh load fakta), bukan scan Fakta_Penjualan
         query = """
-            SELECT dp.kategori, SUM(fp.total_harga) AS total_penjualan
-            FROM "Fakta_Penjualan" fp JOIN "Dim_Produk" dp ON fp.id_produk = dp.id_produk
-            GROUP BY dp.kategori ORDER BY total_penjualan DESC;
+            SELECT NULLIF(kategori, '') AS kategori, SUM(total_penjualan) AS total_penjualan
+            FROM agg_penjualan_kategori_bulan
+            GROUP BY 1 ORDER BY total_penjualan DESC;
         """
-        df_report = pd.read_sql_query(query, p_source_engine)
+        kunci, hit = _cek_cache('penjualan_per_kategori', query, p_source_engine, pakai_cache)
+        if hit:
+            return
+        df_report = _baca_laporan('penjualan_per_kategori', query, p_source_engine)
         
         df_report['tgl_laporan'] = datetime.now()
-        df_report.to_sql('rpt_penjualan_per_kategori', p_target_engine, if_exists='append', index=False)
-        print("   -> ✅ Hasil analisis berhasil disimpan ke Data Mart.")
+        _simpan_ke_data_mart(df_report, 'rpt_penjualan_per_kategori', p_target_engine)
         
-        plt.figure(figsize=(12, 7))
-        barplot = sns.barplot(x='total_penjualan', y='kategori', data=df_report, palette='magma')
-        plt.title('Total Penjualan Berdasarkan Kategori Produk', fontsize=16, pad=20)
-        plt.xlabel('Total Penjualan (dalam Juta)'); plt.ylabel('Kategori Produk')
-        barplot.xaxis.set_major_formatter(lambda x, pos: f'{x/1e6:.0f} Jt')
-        plt.tight_layout()
-        
-        timestamp_str = datetime.now().strftime("%Y%m%d_%H%M%S")
-        nama_file_baru = f"{timestamp_str}_penjualan_per_kategori.png"
-        image_path = os.path.join(config.OUTPUT_PATH, nama_file_baru)
-        plt.savefig(image_path, dpi=300, bbox_inches='tight')
-        print(f"   -> ✅ Grafik disimpan di: {image_path}")
-        if show_plot: plt.show()
+        tugas = chart_renderer.buat_tugas('penjualan_per_kategori', df_report, 'penjualan_per_kategori', cache=('penjualan_per_kategori', kunci) if kunci else None)
+        _render_atau_antre(tugas, show_plot, antrean_render)
         
     except Exception as e:
+        run_metrics.catat_error(e)
         print(f"   -> ❌ GAGAL! Error: {e}")
 
-def generate_report_tren_bulanan(p_source_engine, p_target_engine, show_plot=True):
+def generate_report_tren_bulanan(p_source_engine, p_target_engine, show_plot=True, pakai_cache=False, antrean_render=None):
     """
     Membuat laporan tren penjualan bulanan, menyimpan hasil ke Data Mart,
     dan membuat visualisasi line chart.
     """
     print("\n--- 📞 Laporan 2: Tren Penjualan Bulanan ---")
     try:
+        # Dibaca dari tabel rollup (dipelihara inkremental oleh load fakta), bukan scan Fakta_Penjualan
         query = """
-            SELECT TO_DATE(w.tahun || '-' || w.bulan, 'YYYY-MM') AS periode, SUM(fp.total_harga) AS total_penjualan
-            FROM "Fakta_Penjualan" fp JOIN "Dim_Waktu" w ON fp.id_waktu = w.id_waktu
+            SELECT MAKE_DATE(tahun, bulan, 1) AS periode, SUM(total_penjualan) AS total_penjualan
+            FROM agg_penjualan_kategori_bulan
             GROUP BY 1 ORDER BY 1;
         """
-        df_report = pd.read_sql_query(query, p_source_engine)
+        kunci, hit = _cek_cache('tren_bulanan', query, p_source_engine, pakai_cache)
+        if hit:
+            return
+        df_report = _baca_laporan('tren_bulanan', query, p_source_engine)
         
         df_report['tgl_laporan'] = datetime.now()
-        df_report.to_sql('rpt_tren_penjualan_bulanan', p_target_engine, if_exists='append', index=False)
-        print("   -> ✅ Hasil analisis berhasil disimpan ke Data Mart.")
-
-        plt.figure(figsize=(15, 7))
-        lineplot = sns.lineplot(x='periode', y='total_penjualan', data=df_report, marker='o', color='royalblue')
-        plt.title('Tren Total Penjualan per Bulan', fontsize=18, pad=20)
-        plt.xlabel('Periode (Bulan)'); plt.ylabel('Total Penjualan (dalam Juta)')
-        plt.xticks(rotation=45); lineplot.yaxis.set_major_formatter(lambda x, pos: f'{x/1e6:.1f} Jt')
-        plt.tight_layout()
-        
-        timestamp_str = datetime.now().strftime("%Y%m%d_%H%M%S")
-        nama_file_baru = f"{timestamp_str}_report_tren_bulanan.png"
-        image_path = os.path.join(config.OUTPUT_PATH, nama_file_baru)
-        plt.savefig(image_path, dpi=300, bbox_inches='tight')
-        print(f"   -> ✅ Grafik disimpan di: {image_path}")
-        if show_plot: plt.show()
+        _simpan_ke_data_mart(df_report, 'rpt_tren_penjualan_bulanan', p_target_engine)
+
+        tugas = chart_renderer.buat_tugas('tren_bulanan', df_report, 'report_tren_bulanan', cache=('tren_bulanan', kunci) if kunci else None)
+        _render_atau_antre(tugas, show_plot, antrean_render)
         
     except Exception as e:
+        run_metrics.catat_error(e)
         print(f"   -> ❌ GAGAL! Error: {e}")
 
-def generate_report_top_10_pelanggan(p_source_engine, p_target_engine, show_plot=True):
+def generate_report_top_10_pelanggan(p_source_engine, p_target_engine, show_plot=True, pakai_cache=False, antrean_render=None):
     """
     Membuat laporan top 10 pelanggan, menyimpan hasil ke Data Mart,
     dan membuat visualisasi horizontal bar chart.
     """
     print("\n--- 📞 Laporan 3: Top 10 Pelanggan ---")
     try:
+        # Dibaca dari tabel rollup (dipelihara inkremental oleh load fakta), bukan scan Fakta_Penjualan
         query = """
-            SELECT p.nama_lengkap, SUM(fp.total_harga) AS total_belanja
-            FROM "Fakta_Penjualan" fp
-            JOIN "Dim_Pelanggan" p ON fp.pelanggan_key = p.pelanggan_key
+            SELECT p.nama_lengkap, SUM(ap.total_belanja) AS total_belanja
+            FROM agg_penjualan_pelanggan ap
+            JOIN "Dim_Pelanggan" p ON ap.pelanggan_key = p.pelanggan_key
             WHERE p.status_sekarang = TRUE
             GROUP BY p.nama_lengkap
             ORDER BY total_belanja DESC LIMIT 10;
         """
-        df_report = pd.read_sql_query(query, p_source_engine)
+        kunci, hit = _cek_cache('top_10_pelanggan', query, p_source_engine, pakai_cache)
+        if hit:
+            return
+        df_report = _baca_laporan('top_10_pelanggan', query, p_source_engine)
         
         df_report['tgl_laporan'] = datetime.now()
-        df_report.to_sql('rpt_top_10_pelanggan', p_target_engine, if_exists='append', index=False)
-        print("   -> ✅ Hasil analisis berhasil disimpan ke Data Mart.")
-
-        plt.figure(figsize=(12, 8))
-        barplot = sns.barplot(x='total_belanja', y='nama_lengkap', data=df_report, palette='viridis')
-        plt.title('Top 10 Pelanggan dengan Total Belanja Terbanyak', fontsize=18, pad=20)
-        plt.xlabel('Total Belanja (dalam Ribu)'); plt.ylabel('Nama Pelanggan')
-        barplot.xaxis.set_major_formatter(lambda x, pos: f'{(x/1e3):.0f} Rb')
-        plt.tight_layout()
-        
-        timestamp_str = datetime.now().strftime("%Y%m%d_%H%M%S")
-        nama_file_baru = f"{timestamp_str}_report_top_10_pelanggan.png"
-        image_path = os.path.join(config.OUTPUT_PATH, nama_file_baru)
-        plt.savefig(image_path, dpi=300, bbox_inches='tight')
-        print(f"   -> ✅ Grafik disimpan di: {image_path}")
-        if show_plot: plt.show()
+        _simpan_ke_data_mart(df_report, 'rpt_top_10_pelanggan', p_target_engine)
+
+        tugas = chart_renderer.buat_tugas('top_10_pelanggan', df_report, 'report_top_10_pelanggan', cache=('top_10_pelanggan', kunci) if kunci else None)
+        _render_atau_antre(tugas, show_plot, antrean_render)
 
     except Exception as e:
+        run_metrics.catat_error(e)
         print(f"   -> ❌ GAGAL! Error: {e}")
 
-def generate_report_sentimen_vs_penjualan(p_source_engine, p_target_engine, show_plot=True):
+def generate_report_sentimen_vs_penjualan(p_source_engine, p_target_engine, show_plot=True, pakai_cache=False, antrean_render=None):
     """
     Membuat laporan gabungan sentimen vs total belanja, menyimpan hasil ke Data Mart,
     dan membuat visualisasi scatter plot.
@@ -140,49 +186,38 @@ def generate_report_sentimen_vs_penjualan(p_source_engine, p_target_engine, show
             FROM SentimenPelanggan sp
             JOIN BelanjaPelanggan bp ON sp.id_pelanggan = bp.id_pelanggan;
         """
-        df_report = pd.read_sql_query(query, p_source_engine)
+        kunci, hit = _cek_cache('sentimen_vs_penjualan', query, p_source_engine, pakai_cache)
+        if hit:
+            return None, report_cache.output_terakhir('sentimen_vs_penjualan')
+        df_report = _baca_laporan('sentimen_vs_penjualan', query, p_source_engine)
         
         df_report['tgl_laporan'] = datetime.now()
-        df_report.to_sql('rpt_sentimen_vs_penjualan', p_target_engine, if_exists='append', index=False)
-        print("   -> ✅ Hasil analisis gabungan berhasil disimpan ke Data Mart.")
-
-        plt.figure(figsize=(12, 8))
-        sns.scatterplot(
-            data=df_report,
-            x='polarity',
-            y='total_belanja',
-            size='total_belanja',
-            sizes=(50, 1000),
-            alpha=0.7,
-            hue='polarity',
-            palette='coolwarm_r'
-        )
-        plt.title('Korelasi Sentimen Pelanggan vs Total Belanja', fontsize=18, pad=20)
-        plt.xlabel('Polarity Sentimen (Negatif < 0 < Positif)', fontsize=12)
-        plt.ylabel('Total Belanja', fontsize=12)
-        plt.axvline(0, color='grey', linestyle='--') # Tambah garis netral
-        plt.tight_layout()
-        
-        image_path = os.path.join(config.OUTPUT_PATH, 'sentimen_vs_penjualan.png')
-        plt.savefig(image_path, dpi=300, bbox_inches='tight')
-        print(f"   -> ✅ Grafik disimpan di: {image_path}")
-        if show_plot: plt.show()
+        _simpan_ke_data_mart(df_report, 'rpt_sentimen_vs_penjualan', p_target_engine, label='Hasil analisis gabungan')
+
+        tugas = chart_renderer.buat_tugas('sentimen_vs_penjualan', df_report, 'sentimen_vs_penjualan', pakai_timestamp=False, cache=('sentimen_vs_penjualan', kunci) if kunci else None)
+        image_path = _render_atau_antre(tugas, show_plot, antrean_render)
         
         return df_report, image_path
     except Exception as e:
+        run_metrics.catat_error(e)
         print(f"   -> ❌ GAGAL! Error: {e}")
         return None, None
 
-def generate_report_from_pdf(p_source_engine, p_target_engine):
+def generate_report_from_pdf(p_source_engine, p_target_engine, pakai_cache=False):
     """
     Membaca teks mentah dari staging (_st), melakukan ekstraksi informasi
     dengan Regex yang lebih robust, dan menyimpan hasilnya ke Data Mart (_wh).
     """
     print("\n--- 📞 Laporan dari Dokumen PDF (Versi Upgrade) ---")
     try:
+        kunci, hit = _cek_cache('kinerja_kuartalan', 'SELECT * FROM stg_dokumen_pdf', p_source_engine, pakai_cache)
+        if hit:
+            return None
+
         # E: Baca teks mentah dari staging di _st
         print("   -> [E] Membaca teks laporan dari stg_dokumen_pdf...")
         df_staged_pdf = pd.read_sql_table('stg_dokumen_pdf', p_source_engine)
+        run_metrics.catat_baca(len(df_staged_pdf))
         
         hasil_laporan = []
         # T: Lakukan ekstraksi informasi dengan Regex untuk setiap dokumen
@@ -220,88 +255,204 @@ def generate_report_from_pdf(p_source_engine, p_target_engine):
         print(f"   -> [L] Menyimpan hasil ekstraksi ke {target_table_name}...")
         
         # Kita pakai 'replace' agar setiap run hasilnya adalah yang terbaru dari script ini
-        df_report.to_sql(target_table_name, p_target_engine, if_exists='append', index=False)
+        database.bulk_load(df_report, target_table_name, p_target_engine)
         print(f"   -> ✅ {len(df_report)} laporan kuartalan berhasil disimpan ke Data Mart.")
+        if kunci: report_cache.simpan('kinerja_kuartalan', kunci)
         
         # Tampilkan hasilnya di notebook untuk verifikasi
         return df_report
 
     except Exception as e:
+        run_metrics.catat_error(e)
         print(f"   -> ❌ GAGAL! Error: {e}")
         return None
 
-def generate_report_word_cloud(p_source_engine, show_plot=True):
+def generate_report_word_cloud(p_source_engine, show_plot=True, pakai_cache=False, antrean_render=None):
     """
-    Membuat laporan Word Cloud dari semua teks tweet yang ada di staging,
-    dan menyimpan hasilnya sebagai gambar.
+    Membuat laporan Word Cloud dari frekuensi kata tweet yang sudah dihitung saat ingest
+    (tabel frekuensi_kata.TABEL_FREKUENSI), dan menyimpan hasilnya sebagai gambar.
     """
     print("\n--- 📞 Laporan 5: Word Cloud dari Teks Tweet ---")
     try:
-        # E: Baca semua isi tweet dari tabel staging di _st
-        print("   -> [E] Membaca semua teks tweet dari stg_analisis_sentimen...")
-        query = 'SELECT isi_tweet FROM stg_analisis_sentimen'
-        df_tweets = pd.read_sql_query(query, p_source_engine)
+        # Stopword dari file konfigurasi; ikut jadi bagian kunci cache supaya perubahan daftar memicu render ulang
+        stopwords = frekuensi_kata.baca_stopwords()
+        kunci, hit = _cek_cache('word_cloud', f"{frekuensi_kata.TABEL_FREKUENSI}|{config.WORDCLOUD_MAX_KATA}|{','.join(stopwords)}", p_source_engine, pakai_cache)
+        if hit:
+            return report_cache.output_terakhir('word_cloud')
+
+        # E: Baca kata teratas (di luar stopword) dari tabel frekuensi, bukan seluruh korpus tweet
+        print(f"   -> [E] Membaca {config.WORDCLOUD_MAX_KATA} kata teratas dari {frekuensi_kata.TABEL_FREKUENSI}...")
+        frekuensi = frekuensi_kata.kata_teratas(p_source_engine, stopwords)
+        run_metrics.catat_baca(len(frekuensi))
 
-        if df_tweets.empty:
+        if not frekuensi:
             print("   -> ⚠️ Tidak ada data tweet untuk dibuatkan Word Cloud.")
             return None
 
-        # T: Gabungkan semua teks menjadi satu paragraf raksasa
-        print("   -> [T] Menggabungkan dan membersihkan teks...")
-        all_text = ' '.join(df_tweets['isi_tweet'])
-
-        # Definisikan 'stop words' (kata-kata umum yang mau kita abaikan)
-        # Kita bisa tambahkan kata lain di sini jika perlu
-        stopwords = set([
-            "di", "dan", "yang", "ini", "itu", "ke", "dari", "buat", "aja", "gak", "ga", "nggak", 
-            "nya", "sih", "deh", "kok", "mah", "banget", "udah", "ada", "bisa", "jadi", "sama", 
-            "tapi", "juga", "gue", "loh", "satu", "soal", "buat", "yg", "aja", "adventureworks"
-        ])
-
-        # Buat objek WordCloud
-        wordcloud = WordCloud(
-            width=1200, 
-            height=600, 
-            background_color='white',
-            stopwords=stopwords,
-            colormap='cividis', # Palet warna lain biar beda
-            min_font_size=10,
-            collocations=False # Menghindari kata ganda seperti "sepeda gunung" dihitung aneh
-        ).generate(all_text)
-        print("   -> ✅ Word Cloud berhasil dibuat.")
-
-        # L: Simpan gambar
-        timestamp_str = datetime.now().strftime("%Y%m%d_%H%M%S")
-        nama_file_baru = f"{timestamp_str}_word_cloud_tweets.png"
-        image_path = os.path.join(config.OUTPUT_PATH, nama_file_baru)
-        
-        wordcloud.to_file(image_path)
-        print(f"   -> ✅ Grafik disimpan di: {image_path}")
-
-        # Visualisasi
-        if show_plot:
-            plt.figure(figsize=(15, 8))
-            plt.imshow(wordcloud, interpolation='bilinear')
-            plt.axis("off")
-            plt.tight_layout(pad=0)
-            plt.show()
+        # Render WordCloud diserahkan ke chart_renderer (langsung, atau diantrekan untuk render paralel)
+        tugas = chart_renderer.buat_tugas('word_cloud', {'frekuensi': frekuensi}, 'word_cloud_tweets',
+                                          cache=('word_cloud', kunci) if kunci else None)
+        image_path = _render_atau_antre(tugas, show_plot, antrean_render)
         
         return image_path
 
     except Exception as e:
+        run_metrics.catat_error(e)
+        print(f"   -> ❌ GAGAL! Error: {e}")
+        return None
+
+def generate_report_pelanggan_unik_per_kota(p_source_engine, p_target_engine, pakai_cache=False):
+    """
+    Laporan perkiraan jumlah pelanggan unik per kota & bulan, dijawab dari sketsa HyperLogLog
+    (dipelihara oleh load fakta) tanpa memindai Fakta_Penjualan. Setiap baris membawa batas galatnya.
+    """
+    print("\n--- 📞 Laporan 6: Perkiraan Pelanggan Unik per Kota & Bulan (HyperLogLog) ---")
+    try:
+        kunci, hit = _cek_cache('pelanggan_unik_kota_bulan', f"{sketsa.TABEL_SKETSA}|hll", p_source_engine, pakai_cache)
+        if hit:
+            return None
+
+        df_report, durasi_ms = sketsa.pelanggan_unik_per_kota_bulan(p_source_engine)
+        run_metrics.catat_baca(len(df_report))
+        if df_report.empty:
+            print("   -> ⚠️ Belum ada sketsa penjualan (jalankan ETL fakta dulu).")
+            return None
+        print(f"   -> Dijawab dari sketsa dalam {durasi_ms:.1f} ms: {len(df_report)} kota x bulan, "
+              f"galat baku ±{df_report['galat_relatif'].iloc[0]:.1%} (batas bawah/atas ≈ selang kepercayaan 95%).")
+
+        df_report['tgl_laporan'] = datetime.now()
+        _simpan_ke_data_mart(df_report, 'rpt_pelanggan_unik_kota_bulan', p_target_engine)
+        if kunci: report_cache.simpan('pelanggan_unik_kota_bulan', kunci)
+        return df_report
+
+    except Exception as e:
+        run_metrics.catat_error(e)
+        print(f"   -> ❌ GAGAL! Error: {e}")
+        return None
+
+def generate_report_persentil_belanja_per_kategori(p_source_engine, p_target_engine, pakai_cache=False, sejak_bulan=None):
+    """
+    Laporan persentil total_harga per kategori (config.SKETSA_PERSENTIL), dijawab dari sketsa kuantil
+    yang di-merge lintas bulan & lokasi. Galat relatif setiap persentil paling besar config.SKETSA_KUANTIL_ALPHA.
+    sejak_bulan=YYYYMM membatasi periode.
+    """
+    print("\n--- 📞 Laporan 7: Persentil Belanja per Kategori (Sketsa Kuantil) ---")
+    try:
+        kunci, hit = _cek_cache('persentil_belanja_kategori', f"{sketsa.TABEL_SKETSA}|kuantil|{config.SKETSA_PERSENTIL}|{sejak_bulan}",
+                                p_source_engine, pakai_cache)
+        if hit:
+            return None
+
+        df_report, durasi_ms = sketsa.persentil_belanja_per_kategori(p_source_engine, sejak_bulan=sejak_bulan)
+        run_metrics.catat_baca(len(df_report))
+        if df_report.empty:
+            print("   -> ⚠️ Belum ada sketsa penjualan (jalankan ETL fakta dulu).")
+            return None
+        print(f"   -> Dijawab dari sketsa dalam {durasi_ms:.1f} ms: {len(df_report)} kategori, "
+              f"galat relatif maksimum ±{df_report['galat_relatif'].iloc[0]:.1%} per persentil.")
+        print(df_report.to_string(index=False))
+
+        df_report['tgl_laporan'] = datetime.now()
+        _simpan_ke_data_mart(df_report, 'rpt_persentil_belanja_kategori', p_target_engine)
+        if kunci: report_cache.simpan('persentil_belanja_kategori', kunci)
+        return df_report
+
+    except Exception as e:
+        run_metrics.catat_error(e)
         print(f"   -> ❌ GAGAL! Error: {e}")
         return None
 
 # --- FUNGSI UTAMA UNTUK MENJALANKAN SEMUA ANALISIS ---
-def run_all_analysis(p_source_engine, p_target_engine):
-    """Fungsi untuk menjalankan semua analisis dan membuat laporan."""
+def _sidik_laporan(nama_laporan, p_source_engine, mesin, profil_render):
+    """Input laporan untuk checkpoint --resume: versi tabel inputnya (atau sidik file lake), mesin & profil render."""
+    if mesin == 'duckdb' and nama_laporan in query_engine.QUERY_LAKE:
+        versi = query_engine.sidik_jari_lake()
+    else:
+        versi = database.baca_versi_tabel(p_source_engine, TABEL_INPUT_LAPORAN[nama_laporan])
+    return [mesin, profil_render or config.RENDER_PROFIL_AKTIF, versi]
+
+def run_all_analysis(p_source_engine, p_target_engine, mesin='postgres', pakai_cache=True, profil_render=None, hanya=None, resume=False):
+    """
+    Fungsi untuk menjalankan semua analisis dan membuat laporan.
+    mesin='postgres' -> semua query dikirim ke database staging (perilaku awal).
+    mesin='duckdb'   -> laporan kategori, tren bulanan, top-10 dan sentimen vs penjualan
+                        dijalankan in-process di atas file lake; laporan PDF, word cloud & laporan sketsa
+                        tetap butuh p_source_engine dan dilewati jika None.
+                        Query lake meniru aturan warehouse; satu-satunya perbedaan (riwayat SCD2
+                        pelanggan setelah run inkremental) dijelaskan di query_engine.
+    pakai_cache=True -> laporan yang input & query-nya tidak berubah sejak run terakhir dilewati.
+    hanya=['tren_bulanan', ...] -> jalankan laporan-laporan itu saja (nama dari config.LAPORAN).
+    Data semua laporan dikumpulkan dulu, lalu grafiknya dirender paralel (headless)
+    dengan profil_render dari config.RENDER_PROFIL (default config.RENDER_PROFIL_AKTIF).
+    Status tiap laporan (sukses = data tersimpan & grafiknya ter-render) dicatat di config.RUN_STATE_TABLE
+    di p_target_engine; resume=True melewati laporan yang sudah sukses dan inputnya tidak berubah.
+    """
     print("\n\n===== MEMULAI PIPELINE ANALISIS & REPORTING =====")
+    if hanya:
+        tidak_dikenal = set(hanya) - set(config.LAPORAN)
+        if tidak_dikenal:
+            raise ValueError(f"Laporan tidak dikenal: {', '.join(sorted(tidak_dikenal))}. Pilihan: {', '.join(config.LAPORAN)}")
+    dipilih = lambda nama: not hanya or nama in hanya
+    report_cache.reset_statistik()
+    antrean_render = []
+
+    sumber_laporan = p_source_engine
+    if mesin == 'duckdb':
+        print("   -> Mesin query: DuckDB (embedded, di atas file lake)")
+        sumber_laporan = query_engine.buka_koneksi_lake()
     
-    generate_report_penjualan_per_kategori(p_source_engine, p_target_engine, show_plot=False)
-    generate_report_tren_bulanan(p_source_engine, p_target_engine, show_plot=False)
-    generate_report_top_10_pelanggan(p_source_engine, p_target_engine, show_plot=False)
-    generate_report_sentimen_vs_penjualan(p_source_engine, p_target_engine, show_plot=False)
-    generate_report_from_pdf(p_source_engine, p_target_engine)
-    generate_report_word_cloud(p_source_engine, show_plot=False)
+    id_run = run_metrics.mulai_run('laporan')
+    status_run = None
+    if p_target_engine is not None:
+        status_run = checkpoint.Checkpoint(p_target_engine, 'laporan', id_run, resume=resume)
+    elif resume:
+        print("   -> ⚠️ --resume butuh database warehouse untuk status run; semua laporan dijalankan.")
+    opsi = dict(show_plot=False, pakai_cache=pakai_cache, antrean_render=antrean_render)
+    laporan = [
+        ('penjualan_per_kategori', lambda: generate_report_penjualan_per_kategori(sumber_laporan, p_target_engine, **opsi)),
+        ('tren_bulanan', lambda: generate_report_tren_bulanan(sumber_laporan, p_target_engine, **opsi)),
+        ('top_10_pelanggan', lambda: generate_report_top_10_pelanggan(sumber_laporan, p_target_engine, **opsi)),
+        ('sentimen_vs_penjualan', lambda: generate_report_sentimen_vs_penjualan(sumber_laporan, p_target_engine, **opsi)),
+    ]
+    if p_source_engine is not None:
+        laporan += [
+            ('kinerja_kuartalan', lambda: generate_report_from_pdf(p_source_engine, p_target_engine, pakai_cache=pakai_cache)),
+            ('word_cloud', lambda: generate_report_word_cloud(p_source_engine, **opsi)),
+            ('pelanggan_unik_kota_bulan', lambda: generate_report_pelanggan_unik_per_kota(p_source_engine, p_target_engine, pakai_cache=pakai_cache)),
+            ('persentil_belanja_kategori', lambda: generate_report_persentil_belanja_per_kategori(p_source_engine, p_target_engine, pakai_cache=pakai_cache)),
+        ]
+    # {nama: (sidik input, mulai, tugas render)} untuk laporan yang dijalankan; statusnya dicatat setelah render
+    dijalankan = {}
+    for nama, jalankan in laporan:
+        if not dipilih(nama):
+            continue
+        sidik_input = None
+        if status_run is not None:
+            sidik_input = checkpoint.sidik_aman(partial(_sidik_laporan, nama, p_source_engine, mesin, profil_render))
+            if status_run.boleh_dilewati(nama, sidik_input):
+                print(f"\n⏭️  Laporan '{nama}' sudah sukses dan inputnya tidak berubah (resume), dilewati.")
+                continue
+        mulai, jumlah_antre = datetime.now(), len(antrean_render)
+        with run_metrics.ukur(nama, 'laporan'):
+            jalankan()
+        dijalankan[nama] = (sidik_input, mulai, antrean_render[jumlah_antre:])
     
+    if sumber_laporan is not p_source_engine:
+        sumber_laporan.close()
+
+    with run_metrics.ukur('render_grafik', 'laporan'):
+        hasil_render = chart_renderer.render_paralel(antrean_render, profil=profil_render)
+    if status_run is not None:
+        for nama, (sidik_input, mulai, tugas_laporan) in dijalankan.items():
+            hasil = run_metrics.hasil_tahap(nama) or {}
+            status, error = hasil.get('status', scheduler.SUKSES), hasil.get('error')
+            gagal_render = [tugas['nama_dasar'] for tugas in tugas_laporan if tugas['nama_dasar'] not in hasil_render]
+            if gagal_render:
+                status, error = scheduler.GAGAL, f"Render gagal: {', '.join(gagal_render)}"
+            status_run.catat(nama, status, sidik_input, hasil.get('baris_dibaca', 0), hasil.get('baris_ditulis', 0), error, mulai)
+    run_metrics.simpan_run(p_target_engine)
+
+    if pakai_cache:
+        stat = report_cache.statistik()
+        print(f"\n🗃️  Cache laporan: {stat['hit']} hit, {stat['miss']} miss.")
     print("\n\n===== PIPELINE ANALISIS & REPORTING SELESAI! =====")
\ No newline at end of file
@@ -0,0 +1,349 @@
+import argparse
+import glob
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+from datetime import datetime
+import config
+
+# Benchmark skala: membangkitkan data sintetis berbentuk AdventureWorks (CSV penjualan/pelanggan/produk,
+# korpus tweet & PDF), menjalankan run_all_etl + run_all_analysis terhadap database PostgreSQL
+# sekali pakai, lalu menyimpan metrik per tahap (dari run_metrics) per commit supaya bisa dibandingkan.
+#
+#   python benchmark.py --skala 10            # 1 juta baris penjualan
+#   python benchmark.py --skala 100 --inkremental
+#   python benchmark.py --bandingkan --skala 10
+
+_KOTA = ['Bellingham', 'Bothell', 'Burien', 'Everett', 'Issaquah', 'Kirkland', 'Lynnwood', 'Redmond', 'Renton',
+         'Seattle', 'Spokane', 'Tacoma', 'Melbourne', 'Sydney', 'Brisbane', 'Rockhampton', 'Seaford', 'London',
+         'Paris', 'Berlin', 'Frankfurt', 'Hamburg', 'Toronto', 'Vancouver', 'Portland', 'Salem', 'Beaverton']
+_NAMA_DEPAN = ['Jon', 'Eugene', 'Ruben', 'Christy', 'Elizabeth', 'Julio', 'Janet', 'Marco', 'Rob', 'Shannon',
+               'Jacquelyn', 'Curtis', 'Lauren', 'Ian', 'Sydney', 'Chloe', 'Wyatt', 'Shannon', 'Clarence', 'Luke']
+_NAMA_BELAKANG = ['Yang', 'Huang', 'Torres', 'Zhu', 'Johnson', 'Ruiz', 'Alvarez', 'Mehta', 'Verhoff', 'Carlson',
+                  'Suarez', 'Lu', 'Walker', 'Jenkins', 'Bennett', 'Young', 'Hill', 'Wang', 'Rai', 'Lal']
+_KATEGORI = {
+    'Bikes': ['Mountain Bikes', 'Road Bikes', 'Touring Bikes'],
+    'Components': ['Handlebars', 'Bottom Brackets', 'Brakes', 'Chains', 'Cranksets', 'Derailleurs', 'Forks'],
+    'Clothing': ['Bib-Shorts', 'Caps', 'Gloves', 'Jerseys', 'Shorts', 'Socks', 'Tights', 'Vests'],
+    'Accessories': ['Bike Racks', 'Bottles and Cages', 'Cleaners', 'Fenders', 'Helmets', 'Lights', 'Locks'],
+}
+_WARNA = ['Black', 'Silver', 'Red', 'White', 'Blue', 'Multi', 'Yellow', 'Grey', 'Silver/Black', None]
+_LINI = ['R', 'M', 'T', 'S', None]
+_KATA_TWEET = {
+    'positif': ['mantap', 'keren', 'smooth banget', 'puas', 'recommended', 'nyaman', 'awet', 'cepat sampai'],
+    'negatif': ['kecewa', 'lambat', 'rusak', 'mahal banget', 'ribet', 'gak sesuai', 'zonk', 'telat'],
+    'produk': ['sepeda', 'helm', 'sarung tangan', 'jersey', 'rem', 'rantai', 'lampu', 'botol minum', 'ban'],
+}
+
+# Skema minimal database benchmark (database sekali pakai, dibuat ulang setiap run)
+_DDL_STAGING = """
+    CREATE TABLE "Dim_Produk" (
+        id_produk INTEGER PRIMARY KEY, nama_produk TEXT, subkategori TEXT, kategori TEXT,
+        harga_standar NUMERIC(19, 4), warna TEXT, lini_produk TEXT
+    );
+    CREATE TABLE "Dim_Waktu" (
+        id_waktu INTEGER PRIMARY KEY, tanggal DATE, tahun INTEGER, kuartal INTEGER, bulan INTEGER,
+        nama_bulan TEXT, hari INTEGER, nama_hari TEXT
+    );
+    CREATE TABLE "Dim_Lokasi" (id_lokasi SERIAL PRIMARY KEY, nama_kota TEXT UNIQUE);
+    CREATE TABLE "Dim_Pelanggan" (
+        pelanggan_key SERIAL PRIMARY KEY, id_pelanggan INTEGER NOT NULL, nama_lengkap TEXT, email TEXT, kota_asal TEXT,
+        tanggal_mulai DATE, tanggal_akhir DATE, status_sekarang BOOLEAN
+    );
+    CREATE TABLE "Fakta_Penjualan" (
+        id_order_detail INTEGER PRIMARY KEY, id_order INTEGER,
+        pelanggan_key INTEGER REFERENCES "Dim_Pelanggan" (pelanggan_key),
+        id_produk INTEGER REFERENCES "Dim_Produk" (id_produk),
+        id_waktu INTEGER REFERENCES "Dim_Waktu" (id_waktu),
+        id_lokasi INTEGER REFERENCES "Dim_Lokasi" (id_lokasi),
+        jumlah_barang INTEGER, harga_satuan NUMERIC(19, 4), total_harga NUMERIC(19, 4)
+    );
+    CREATE TABLE stg_dokumen_pdf (nama_file TEXT, isi_teks TEXT, hash_konten TEXT, tgl_ekstrak TIMESTAMP);
+    CREATE TABLE stg_analisis_sentimen (
+        id_pelanggan INTEGER, nama_file TEXT, isi_tweet TEXT, polarity DOUBLE PRECISION,
+        subjectivity DOUBLE PRECISION, hash_teks TEXT, tgl_ekstrak TIMESTAMP
+    );
+"""
+
+def _path_kerja(skala):
+    return os.path.join(config.BENCHMARK_PATH, f"sf{skala:g}")
+
+# --- Generator data sintetis ---
+def _tulis_pdf(path, daftar_baris):
+    """PDF satu halaman minimal (Helvetica) tanpa dependency tambahan, cukup untuk diekstrak PyPDF2."""
+    def escape(teks):
+        return teks.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+    isi = 'BT /F1 12 Tf 50 780 Td 16 TL ' + ' '.join(f'({escape(baris)}) Tj T*' for baris in daftar_baris) + ' ET'
+    objek = [
+        '<< /Type /Catalog /Pages 2 0 R >>',
+        '<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+        '<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents 4 0 R /Resources << /Font << /F1 5 0 R >> >> >>',
+        f'<< /Length {len(isi.encode("latin-1"))} >>\nstream\n{isi}\nendstream',
+        '<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>',
+    ]
+    data = b'%PDF-1.4\n'
+    offset = []
+    for i, obj in enumerate(objek, start=1):
+        offset.append(len(data))
+        data += f'{i} 0 obj\n{obj}\nendobj\n'.encode('latin-1')
+    awal_xref = len(data)
+    data += f'xref\n0 {len(objek) + 1}\n0000000000 65535 f \n'.encode('latin-1')
+    data += ''.join(f'{o:010d} 00000 n \n' for o in offset).encode('latin-1')
+    data += f'trailer\n<< /Size {len(objek) + 1} /Root 1 0 R >>\nstartxref\n{awal_xref}\n%%EOF\n'.encode('latin-1')
+    with open(path, 'wb') as file:
+        file.write(data)
+
+def bangkitkan_data(folder, skala, seed=42, ukuran_chunk=1_000_000):
+    """
+    Membangkitkan file landing zone sintetis di 'folder': raw_produk.csv, raw_pelanggan.csv,
+    raw_penjualan.csv (ditulis per chunk, memori tetap kecil di skala besar), tweet-*.txt dan PDF laporan.
+    Mengembalikan jumlah baris/file per jenis.
+    """
+    import numpy as np
+    import pandas as pd
+    rng = np.random.default_rng(seed)
+    os.makedirs(folder, exist_ok=True)
+    jumlah = {jenis: max(1, int(round(n * skala))) for jenis, n in config.BENCHMARK_SKALA.items()}
+    # Produk tidak tumbuh linear di dunia nyata; katalog dibatasi supaya tetap realistis
+    jumlah['produk'] = min(jumlah['produk'], 50000)
+
+    # Produk (baris pertama tanpa kategori, seperti data asli)
+    n = jumlah['produk']
+    pasangan = [(kat, sub) for kat, daftar_sub in _KATEGORI.items() for sub in daftar_sub]
+    idx = rng.integers(0, len(pasangan), n)
+    tanpa_kategori = rng.random(n) < 0.4
+    df_produk = pd.DataFrame({
+        'id_produk': np.arange(1, n + 1),
+        'nama_produk': [f"{pasangan[i][1]} {k}" for k, i in enumerate(idx, start=1)],
+        'subkategori': [None if kosong else pasangan[i][1] for i, kosong in zip(idx, tanpa_kategori)],
+        'kategori': [None if kosong else pasangan[i][0] for i, kosong in zip(idx, tanpa_kategori)],
+        'harga_standar': np.where(tanpa_kategori, 0, np.round(rng.lognormal(4, 1.2, n), 4)),
+        'warna': rng.choice(np.array(_WARNA, dtype=object), n),
+        'lini_produk': rng.choice(np.array(_LINI, dtype=object), n),
+    })
+    df_produk.to_csv(os.path.join(folder, 'raw_produk.csv'), index=False)
+
+    # Pelanggan; jumlah kota tumbuh pelan (akar skala) seperti basis pelanggan sungguhan
+    n = jumlah['pelanggan']
+    jumlah_kota = max(len(_KOTA), int(len(_KOTA) * skala ** 0.5))
+    daftar_kota = np.array([_KOTA[i % len(_KOTA)] + ('' if i < len(_KOTA) else f" {i // len(_KOTA)}") for i in range(jumlah_kota)], dtype=object)
+    depan = rng.choice(np.array(_NAMA_DEPAN, dtype=object), n)
+    belakang = rng.choice(np.array(_NAMA_BELAKANG, dtype=object), n)
+    id_pelanggan = np.arange(11000, 11000 + n)
+    df_pelanggan = pd.DataFrame({
+        'id_pelanggan': id_pelanggan,
+        'nama_depan': depan,
+        'nama_belakang': belakang,
+        'email': [f"{d.lower()}{i % 100}@adventure-works.com" for d, i in zip(depan, id_pelanggan)],
+        'kota_asal': rng.choice(daftar_kota, n),
+    })
+    df_pelanggan.to_csv(os.path.join(folder, 'raw_pelanggan.csv'), index=False)
+
+    # Penjualan: rata-rata 3 detail per order, tanggal 2011-05-31 s.d. 2014-06-30
+    harga_produk = df_produk['harga_standar'].to_numpy()
+    awal, akhir = np.datetime64('2011-05-31'), np.datetime64('2014-06-30')
+    rentang_hari = int((akhir - awal).astype(int))
+    path_penjualan = os.path.join(folder, 'raw_penjualan.csv')
+    n_total = jumlah['penjualan']
+    for mulai in range(0, n_total, ukuran_chunk):
+        n = min(ukuran_chunk, n_total - mulai)
+        id_detail = np.arange(mulai + 1, mulai + n + 1)
+        id_order = 43659 + id_detail // 3
+        # Semua detail dalam satu order punya tanggal & pelanggan yang sama
+        rng_order = np.random.default_rng([seed, mulai])
+        order_unik, balik = np.unique(id_order, return_inverse=True)
+        tanggal = (awal + rng_order.integers(0, rentang_hari + 1, len(order_unik)).astype('timedelta64[D]'))[balik]
+        pelanggan = rng_order.choice(id_pelanggan, len(order_unik))[balik]
+        produk = rng_order.integers(1, len(harga_produk) + 1, n)
+        jumlah_barang = rng_order.integers(1, 6, n)
+        harga = harga_produk[produk - 1]
+        df = pd.DataFrame({
+            'id_order': id_order, 'id_order_detail': id_detail, 'tanggal_order': tanggal,
+            'id_pelanggan': pelanggan, 'id_produk': produk, 'jumlah_barang': jumlah_barang,
+            'harga_satuan': harga, 'total_harga': np.round(jumlah_barang * harga, 4),
+        })
+        df.to_csv(path_penjualan, mode='w' if mulai == 0 else 'a', header=(mulai == 0), index=False, date_format='%Y-%m-%d')
+
+    # Korpus tweet
+    for i in range(1, jumlah['tweet'] + 1):
+        nada = 'positif' if rng.random() < 0.6 else 'negatif'
+        kata = [rng.choice(_KATA_TWEET[nada]) for _ in range(2)]
+        teks = f"Baru beli {rng.choice(_KATA_TWEET['produk'])} dari AdventureWorks, {kata[0]}! Pokoknya {kata[1]} buat harian."
+        with open(os.path.join(folder, f"tweet-{i}.txt"), 'w', encoding='utf-8') as file:
+            file.write(teks)
+
+    # Korpus PDF laporan kuartalan
+    for i in range(jumlah['pdf']):
+        kuartal, tahun = i % 4 + 1, 2025 + i // 4
+        _tulis_pdf(os.path.join(folder, f"Laporan Penjualan Q{kuartal} {tahun}.pdf"), [
+            'AdventureWorks Cycles', f'Laporan Penjualan Kuartal {kuartal} {tahun}',
+            f'Total pendapatan kuartal ini mencapai ${rng.uniform(5, 50):.1f} juta,',
+            f'tumbuh {int(rng.integers(1, 30))}% dibanding kuartal sebelumnya.',
+        ])
+
+    with open(os.path.join(folder, '_SELESAI.json'), 'w', encoding='utf-8') as file:
+        json.dump({'skala': skala, 'seed': seed, 'jumlah': jumlah}, file)
+    return jumlah
+
+def _data_sumber(skala, seed):
+    """Data sintetis di-cache per (skala, seed); membangkitkan 10M baris tidak perlu diulang tiap run."""
+    folder = os.path.join(_path_kerja(skala), f"sumber_seed{seed}")
+    penanda = os.path.join(folder, '_SELESAI.json')
+    if os.path.exists(penanda):
+        with open(penanda, 'r', encoding='utf-8') as file:
+            return folder, json.load(file)['jumlah']
+    print(f"🧪 Membangkitkan data sintetis skala {skala:g} ke {folder} ...")
+    mulai = time.perf_counter()
+    shutil.rmtree(folder, ignore_errors=True)
+    jumlah = bangkitkan_data(folder, skala, seed)
+    print(f"   -> Selesai dalam {time.perf_counter() - mulai:.1f} dtk: {jumlah}")
+    return folder, jumlah
+
+# --- Persiapan lingkungan sekali pakai ---
+def _siapkan_database(buat_db):
+    """Mengarahkan pipeline ke database benchmark lalu membuat ulang skemanya dari nol."""
+    from sqlalchemy import create_engine, text
+    import database
+    if config.BENCHMARK_DB_STAGING in (config.DB_NAME_STAGING, config.DB_NAME_WAREHOUSE) or \
+            config.BENCHMARK_DB_WAREHOUSE in (config.DB_NAME_STAGING, config.DB_NAME_WAREHOUSE):
+        raise ValueError("Database benchmark tidak boleh sama dengan database pipeline (isinya dihapus setiap run).")
+
+    if buat_db:
+        admin = create_engine(database.url_database('postgres'), isolation_level='AUTOCOMMIT')
+        with admin.connect() as connection:
+            ada = {row[0] for row in connection.execute(text("SELECT datname FROM pg_database"))}
+            for nama_db in (config.BENCHMARK_DB_STAGING, config.BENCHMARK_DB_WAREHOUSE):
+                if nama_db not in ada:
+                    connection.execute(text(f'CREATE DATABASE "{nama_db}"'))
+        admin.dispose()
+
+    database.tutup_semua_engine()
+    config.DB_NAME_STAGING = config.BENCHMARK_DB_STAGING
+    config.DB_NAME_WAREHOUSE = config.BENCHMARK_DB_WAREHOUSE
+    for engine, ddl in ((database.get_staging_engine(), _DDL_STAGING), (database.get_warehouse_engine(), '')):
+        with engine.begin() as connection:
+            connection.execute(text("DROP SCHEMA public CASCADE; CREATE SCHEMA public;"))
+            if ddl:
+                connection.execute(text(ddl))
+    return database.get_staging_engine(), database.get_warehouse_engine()
+
+def _siapkan_folder(skala, folder_sumber):
+    """Workspace terisolasi: landing zone berisi salinan data sintetis, zona lain kosong."""
+    kerja = os.path.join(_path_kerja(skala), 'workspace')
+    shutil.rmtree(kerja, ignore_errors=True)
+    # Semua setting di bawah CACHE_PATH (manifest ingest, cache PDF/laporan/peta kunci, metrik, ...)
+    # dipindah ke workspace sekaligus, jadi path cache yang ditambahkan nanti juga tidak menyentuh cache
+    # produksi. BENCHMARK_PATH tetap; dan karena workspace sendiri ada di bawahnya, path data baru
+    # di-set setelah pemindahan ini.
+    awalan = os.path.normpath(config.CACHE_PATH) + os.sep
+    cache_baru = os.path.join(kerja, 'cache')
+    for nama, nilai in list(vars(config).items()):
+        if nama.isupper() and nama != 'BENCHMARK_PATH' and isinstance(nilai, str) and os.path.normpath(nilai).startswith(awalan):
+            setattr(config, nama, os.path.join(cache_baru, os.path.normpath(nilai)[len(awalan):]))
+    config.CACHE_PATH = cache_baru
+    config.RAW_DATA_PATH = os.path.join(kerja, 'data_raw')
+    config.ORGANIZED_PATH = os.path.join(kerja, 'data_organized')
+    config.CURATED_PATH = os.path.join(kerja, 'data_curated')
+    config.OUTPUT_PATH = os.path.join(kerja, 'output')
+    config.DUPLIKAT_PATH = os.path.join(kerja, 'data_duplikat')
+    shutil.copytree(folder_sumber, config.RAW_DATA_PATH, ignore=shutil.ignore_patterns('_SELESAI.json'))
+    return kerja
+
+def _info_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+        kotor = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], capture_output=True, text=True).stdout.strip())
+        return commit + ('-dirty' if kotor else '')
+    except (OSError, subprocess.CalledProcessError):
+        return 'tanpa-git'
+
+# --- Eksekusi & laporan ---
+def jalankan_benchmark(skala, seed=42, buat_db=False, inkremental=False, max_workers=None):
+    import etl_pipeline
+    import analysis_pipeline
+    import run_metrics
+    folder_sumber, jumlah = _data_sumber(skala, seed)
+    _siapkan_folder(skala, folder_sumber)
+    engine_st, engine_wh = _siapkan_database(buat_db)
+
+    skenario = {}
+    mulai = time.perf_counter()
+    etl_pipeline.run_all_etl(engine_st, full_rebuild=True, max_workers=max_workers, engine_metrik=engine_wh)
+    skenario['etl_full'] = run_metrics.run_terakhir('etl')
+    analysis_pipeline.run_all_analysis(engine_st, engine_wh, pakai_cache=False)
+    skenario['laporan'] = run_metrics.run_terakhir('laporan')
+    if inkremental:
+        # Run kedua tanpa file baru: mengukur biaya "tidak ada perubahan" jalur inkremental
+        etl_pipeline.run_all_etl(engine_st, full_rebuild=False, max_workers=max_workers, engine_metrik=engine_wh)
+        skenario['etl_inkremental'] = run_metrics.run_terakhir('etl')
+    durasi_total = time.perf_counter() - mulai
+
+    hasil = {
+        'commit': _info_commit(), 'waktu': datetime.now().isoformat(), 'skala': skala, 'seed': seed,
+        'jumlah': jumlah, 'durasi_total_detik': round(durasi_total, 3),
+        'mesin': {'python': platform.python_version(), 'platform': platform.platform(), 'cpu': os.cpu_count()},
+        'tahap': {nama_skenario: {t['tahap']: {k: t[k] for k in ('status', 'durasi_detik', 'cpu_detik', 'rss_proses_puncak_mb', 'rss_worker_puncak_mb', 'baris_dibaca', 'baris_ditulis')}
+                                  for t in (data or {}).get('tahap', [])}
+                  for nama_skenario, data in skenario.items()},
+    }
+    folder_hasil = os.path.join(config.BENCHMARK_PATH, 'hasil')
+    os.makedirs(folder_hasil, exist_ok=True)
+    path_hasil = os.path.join(folder_hasil, f"{datetime.now():%Y%m%d_%H%M%S}_{hasil['commit']}_sf{skala:g}.json")
+    with open(path_hasil, 'w', encoding='utf-8') as file:
+        json.dump(hasil, file, indent=2)
+    print(f"\n🏁 Benchmark skala {skala:g} selesai dalam {durasi_total:.1f} dtk. Hasil: {path_hasil}")
+    return hasil
+
+def bandingkan(skala, batas=8):
+    """Mencetak tabel durasi per tahap untuk run-run benchmark terakhir pada skala yang sama (satu kolom per commit)."""
+    daftar = []
+    for path in sorted(glob.glob(os.path.join(config.BENCHMARK_PATH, 'hasil', '*.json'))):
+        with open(path, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+        if data['skala'] == skala:
+            daftar.append(data)
+    daftar = daftar[-batas:]
+    if not daftar:
+        print(f"Belum ada hasil benchmark untuk skala {skala:g}.")
+        return
+    baris = []
+    for data in daftar:
+        for nama_skenario, tahap in data['tahap'].items():
+            for nama in tahap:
+                if (nama_skenario, nama) not in baris:
+                    baris.append((nama_skenario, nama))
+    print(f"\n📊 Durasi per tahap (detik), skala {skala:g}:")
+    print(f"   {'skenario/tahap':<36}" + ''.join(f"{d['commit'][:12]:>14}" for d in daftar))
+    for nama_skenario, nama in baris:
+        nilai = []
+        for d in daftar:
+            t = d['tahap'].get(nama_skenario, {}).get(nama)
+            nilai.append(f"{t['durasi_detik']:>14.2f}" if t else f"{'-':>14}")
+        print(f"   {nama_skenario + '/' + nama:<36}" + ''.join(nilai))
+    print(f"   {'TOTAL':<36}" + ''.join(f"{d['durasi_total_detik']:>14.2f}" for d in daftar))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark skala pipeline dengan data sintetis")
+    parser.add_argument('--skala', type=float, default=1, help="Scale factor (1 = %d baris penjualan)" % config.BENCHMARK_SKALA['penjualan'])
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--buat-db', action='store_true', help="Buat database benchmark jika belum ada (butuh hak CREATEDB)")
+    parser.add_argument('--inkremental', action='store_true', help="Tambah run ETL inkremental kedua tanpa perubahan data")
+    parser.add_argument('--workers', type=int, default=None, help="max_workers scheduler ETL (default config.ETL_MAX_WORKERS)")
+    parser.add_argument('--hanya-data', action='store_true', help="Hanya bangkitkan data sintetis, tanpa menjalankan pipeline")
+    parser.add_argument('--bandingkan', action='store_true', help="Cetak perbandingan hasil benchmark antar-commit untuk skala ini")
+    args = parser.parse_args(argv)
+
+    if args.bandingkan:
+        bandingkan(args.skala)
+    elif args.hanya_data:
+        _data_sumber(args.skala, args.seed)
+    else:
+        jalankan_benchmark(args.skala, args.seed, buat_db=args.buat_db, inkremental=args.inkremental, max_workers=args.workers)
+        bandingkan(args.skala)
+
+if __name__ == "__main__":
+    sys.exit(main())
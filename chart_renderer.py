@@ -0,0 +1,179 @@
+import os
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import config
+import report_cache
+import run_metrics
+
+# Tahap render grafik yang terpisah dari query laporan.
+# Grafik dibuat lewat API objek matplotlib (Figure, bukan state global pyplot),
+# sehingga aman dijalankan paralel di process pool dengan backend Agg (headless).
+
+def buat_tugas(jenis, data, nama_dasar, pakai_timestamp=True, cache=None):
+    """
+    Membungkus data laporan menjadi tugas render.
+    cache=(nama_laporan, kunci) -> kunci dicatat di report_cache setelah grafik berhasil disimpan.
+    """
+    return {
+        'jenis': jenis,
+        'data': data,
+        'nama_dasar': nama_dasar,
+        'timestamp': datetime.now().strftime("%Y%m%d_%H%M%S") if pakai_timestamp else None,
+        'cache': cache,
+    }
+
+def _profil(profil):
+    """Profil render (dpi, format, bbox_tight) dari config; default config.RENDER_PROFIL_AKTIF."""
+    return config.RENDER_PROFIL[profil or config.RENDER_PROFIL_AKTIF]
+
+def _path_output(tugas, profil):
+    prefix = f"{tugas['timestamp']}_" if tugas['timestamp'] else ''
+    return os.path.join(config.OUTPUT_PATH, f"{prefix}{tugas['nama_dasar']}.{profil['format']}")
+
+def _tampilkan(fig):
+    """Menampilkan figure di notebook (tanpa pyplot); diam-diam dilewati di luar IPython."""
+    try:
+        from IPython.display import display
+        display(fig)
+    except ImportError:
+        pass
+
+# --- Fungsi penggambar per jenis grafik ---
+def _gambar_penjualan_per_kategori(ax, df):
+    import seaborn as sns
+    sns.barplot(x='total_penjualan', y='kategori', data=df, palette='magma', ax=ax)
+    ax.set_title('Total Penjualan Berdasarkan Kategori Produk', fontsize=16, pad=20)
+    ax.set_xlabel('Total Penjualan (dalam Juta)'); ax.set_ylabel('Kategori Produk')
+    ax.xaxis.set_major_formatter(lambda x, pos: f'{x/1e6:.0f} Jt')
+
+def _gambar_tren_bulanan(ax, df):
+    import seaborn as sns
+    sns.lineplot(x='periode', y='total_penjualan', data=df, marker='o', color='royalblue', ax=ax)
+    ax.set_title('Tren Total Penjualan per Bulan', fontsize=18, pad=20)
+    ax.set_xlabel('Periode (Bulan)'); ax.set_ylabel('Total Penjualan (dalam Juta)')
+    ax.tick_params(axis='x', rotation=45); ax.yaxis.set_major_formatter(lambda x, pos: f'{x/1e6:.1f} Jt')
+
+def _gambar_top_10_pelanggan(ax, df):
+    import seaborn as sns
+    sns.barplot(x='total_belanja', y='nama_lengkap', data=df, palette='viridis', ax=ax)
+    ax.set_title('Top 10 Pelanggan dengan Total Belanja Terbanyak', fontsize=18, pad=20)
+    ax.set_xlabel('Total Belanja (dalam Ribu)'); ax.set_ylabel('Nama Pelanggan')
+    ax.xaxis.set_major_formatter(lambda x, pos: f'{(x/1e3):.0f} Rb')
+
+def _gambar_sentimen_vs_penjualan(ax, df):
+    import seaborn as sns
+    sns.scatterplot(
+        data=df,
+        x='polarity',
+        y='total_belanja',
+        size='total_belanja',
+        sizes=(50, 1000),
+        alpha=0.7,
+        hue='polarity',
+        palette='coolwarm_r',
+        ax=ax
+    )
+    ax.set_title('Korelasi Sentimen Pelanggan vs Total Belanja', fontsize=18, pad=20)
+    ax.set_xlabel('Polarity Sentimen (Negatif < 0 < Positif)', fontsize=12)
+    ax.set_ylabel('Total Belanja', fontsize=12)
+    ax.axvline(0, color='grey', linestyle='--') # Tambah garis netral
+
+_PENGGAMBAR = {
+    'penjualan_per_kategori': (_gambar_penjualan_per_kategori, (12, 7)),
+    'tren_bulanan': (_gambar_tren_bulanan, (15, 7)),
+    'top_10_pelanggan': (_gambar_top_10_pelanggan, (12, 8)),
+    'sentimen_vs_penjualan': (_gambar_sentimen_vs_penjualan, (12, 8)),
+}
+
+def _render_word_cloud(data, path, profil, tampilkan):
+    from wordcloud import WordCloud
+    wordcloud = WordCloud(
+        width=1200, 
+        height=600, 
+        background_color='white',
+        colormap='cividis', # Palet warna lain biar beda
+        min_font_size=10,
+        max_words=len(data['frekuensi']),
+    ).generate_from_frequencies(data['frekuensi'])  # frekuensi sudah dihitung & difilter stopword di database
+
+    if profil['format'] == 'svg':
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(wordcloud.to_svg())
+    else:
+        wordcloud.to_image().save(path)
+
+    if tampilkan:
+        from matplotlib.figure import Figure
+        fig = Figure(figsize=(15, 8))
+        ax = fig.subplots()
+        ax.imshow(wordcloud, interpolation='bilinear')
+        ax.axis("off")
+        fig.tight_layout(pad=0)
+        _tampilkan(fig)
+
+def render(tugas, profil=None, tampilkan=False):
+    """Merender satu tugas ke file sesuai profil dan mengembalikan path-nya."""
+    profil = _profil(profil)
+    path = _path_output(tugas, profil)
+
+    if tugas['jenis'] == 'word_cloud':
+        _render_word_cloud(tugas['data'], path, profil, tampilkan)
+        return path
+
+    from matplotlib.figure import Figure
+    penggambar, ukuran = _PENGGAMBAR[tugas['jenis']]
+    fig = Figure(figsize=ukuran)
+    try:
+        ax = fig.subplots()
+        penggambar(ax, tugas['data'])
+        fig.tight_layout()
+        fig.savefig(path, dpi=profil['dpi'], format=profil['format'],
+                    bbox_inches='tight' if profil['bbox_tight'] else None)
+        if tampilkan:
+            _tampilkan(fig)
+    finally:
+        # Lifecycle eksplisit: figure tidak terdaftar di pyplot, cukup dibersihkan di sini
+        fig.clear()
+    return path
+
+def _init_worker():
+    import matplotlib
+    matplotlib.use('Agg')
+
+def catat_hasil(tugas, path):
+    print(f"   -> ✅ Grafik disimpan di: {path}")
+    if tugas['cache']:
+        nama_laporan, kunci = tugas['cache']
+        report_cache.simpan(nama_laporan, kunci, path)
+
+def render_paralel(daftar_tugas, profil=None, max_workers=None):
+    """
+    Merender semua tugas secara paralel di process pool (backend Agg).
+    Mengembalikan {nama_dasar: path} untuk grafik yang berhasil.
+    """
+    if not daftar_tugas:
+        return {}
+    workers = max_workers or config.RENDER_MAX_WORKERS
+    print(f"\n--- 🎨 Merender {len(daftar_tugas)} grafik (profil '{profil or config.RENDER_PROFIL_AKTIF}', {workers} worker) ---")
+    os.makedirs(config.OUTPUT_PATH, exist_ok=True)
+
+    hasil = {}
+    if workers <= 1 or len(daftar_tugas) == 1:
+        for tugas in daftar_tugas:
+            try:
+                hasil[tugas['nama_dasar']] = render(tugas, profil)
+                catat_hasil(tugas, hasil[tugas['nama_dasar']])
+            except Exception as e:
+                print(f"   -> ❌ GAGAL render '{tugas['nama_dasar']}': {e}")
+        return hasil
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        futures = {run_metrics.kirim(executor, render, tugas, profil): tugas for tugas in daftar_tugas}
+        for future in as_completed(futures):
+            tugas = futures[future]
+            try:
+                hasil[tugas['nama_dasar']] = future.result()
+                catat_hasil(tugas, hasil[tugas['nama_dasar']])
+            except Exception as e:
+                print(f"   -> ❌ GAGAL render '{tugas['nama_dasar']}': {e}")
+    return hasil
@@ -0,0 +1,144 @@
+import functools
+import hashlib
+import json
+import os
+from datetime import datetime
+from sqlalchemy import text
+import config
+import run_metrics
+import scheduler
+
+# Checkpoint run pipeline: status terakhir setiap tahap (ETL) / laporan disimpan di tabel kontrol
+# config.RUN_STATE_TABLE bersama sidik jari inputnya dan jumlah baris dibaca/ditulis.
+# Dengan --resume, tahap yang sudah sukses di rantai run yang sama dan inputnya tidak berubah dilewati,
+# jadi run yang gagal di tengah dilanjutkan dari tahap yang gagal, bukan diulang dari awal.
+# Rantai: run biasa memulai rantai baru; run --resume melanjutkan rantai run terakhir jenis yang sama.
+
+def sidik(*bagian):
+    """Sidik jari (md5) dari nilai-nilai yang bisa di-serialisasi JSON."""
+    return hashlib.md5(json.dumps(bagian, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+def sidik_folder(path, ekstensi=None):
+    """[(nama, ukuran, mtime)] file di sebuah folder (kosong jika folder belum ada)."""
+    if not os.path.isdir(path):
+        return []
+    hasil = []
+    for nama in sorted(os.listdir(path)):
+        path_file = os.path.join(path, nama)
+        if os.path.isfile(path_file) and (ekstensi is None or nama.lower().endswith(ekstensi)):
+            stat = os.stat(path_file)
+            hasil.append((nama, stat.st_size, stat.st_mtime))
+    return hasil
+
+def _pastikan_tabel(connection):
+    connection.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {config.RUN_STATE_TABLE} (
+            jenis TEXT NOT NULL,
+            tahap TEXT NOT NULL,
+            id_rantai TEXT NOT NULL,
+            id_run TEXT NOT NULL,
+            sidik_input TEXT,
+            status TEXT NOT NULL,
+            baris_dibaca BIGINT,
+            baris_ditulis BIGINT,
+            error TEXT,
+            mulai TIMESTAMP,
+            selesai TIMESTAMP,
+            PRIMARY KEY (jenis, tahap)
+        )
+    """))
+
+class Checkpoint:
+    """Status tahap untuk satu run (jenis 'etl' / 'laporan'), dibaca dari dan ditulis ke config.RUN_STATE_TABLE."""
+
+    def __init__(self, engine, jenis, id_run, resume=False):
+        self.engine = engine
+        self.jenis = jenis
+        self.id_run = id_run
+        self.resume = resume
+        self.status = {}
+        self.dilewati = set()
+        with engine.begin() as connection:
+            _pastikan_tabel(connection)
+            id_rantai = None
+            if resume:
+                id_rantai = connection.execute(text(f"""
+                    SELECT id_rantai FROM {config.RUN_STATE_TABLE} WHERE jenis = :jenis ORDER BY selesai DESC LIMIT 1
+                """), {'jenis': jenis}).scalar()
+            self.id_rantai = id_rantai or id_run
+            if id_rantai:
+                rows = connection.execute(text(f"""
+                    SELECT tahap, sidik_input, status FROM {config.RUN_STATE_TABLE}
+                    WHERE jenis = :jenis AND id_rantai = :id_rantai
+                """), {'jenis': jenis, 'id_rantai': id_rantai}).fetchall()
+                self.status = {row[0]: {'sidik_input': row[1], 'status': row[2]} for row in rows}
+        if resume:
+            selesai = sorted(t for t, s in self.status.items() if s['status'] == scheduler.SUKSES)
+            print(f"   -> Resume rantai run {self.id_rantai}: {len(selesai)} tahap sudah sukses"
+                  + (f" ({', '.join(selesai)})" if selesai else ''))
+
+    def boleh_dilewati(self, tahap, sidik_input, deps=()):
+        """
+        True jika tahap sudah sukses di rantai ini dengan sidik input yang sama, dan semua
+        dependensinya juga dilewati (tahap hulu yang dijalankan ulang bisa mengubah inputnya).
+        """
+        if not self.resume or sidik_input is None:
+            return False
+        lama = self.status.get(tahap)
+        return (lama is not None and lama['status'] == scheduler.SUKSES and lama['sidik_input'] == sidik_input
+                and all(dep in self.dilewati for dep in deps))
+
+    def catat(self, tahap, status, sidik_input=None, baris_dibaca=0, baris_ditulis=0, error=None, mulai=None):
+        """Menyimpan status terakhir satu tahap (transaksi sendiri, langsung terlihat oleh run berikutnya)."""
+        with self.engine.begin() as connection:
+            connection.execute(text(f"""
+                INSERT INTO {config.RUN_STATE_TABLE}
+                    (jenis, tahap, id_rantai, id_run, sidik_input, status, baris_dibaca, baris_ditulis, error, mulai, selesai)
+                VALUES (:jenis, :tahap, :id_rantai, :id_run, :sidik_input, :status, :baris_dibaca, :baris_ditulis, :error, :mulai, :selesai)
+                ON CONFLICT (jenis, tahap) DO UPDATE SET
+                    id_rantai = EXCLUDED.id_rantai, id_run = EXCLUDED.id_run, sidik_input = EXCLUDED.sidik_input,
+                    status = EXCLUDED.status, baris_dibaca = EXCLUDED.baris_dibaca, baris_ditulis = EXCLUDED.baris_ditulis,
+                    error = EXCLUDED.error, mulai = EXCLUDED.mulai, selesai = EXCLUDED.selesai
+            """), {'jenis': self.jenis, 'tahap': tahap, 'id_rantai': self.id_rantai, 'id_run': self.id_run,
+                   'sidik_input': sidik_input, 'status': status, 'baris_dibaca': baris_dibaca, 'baris_ditulis': baris_ditulis,
+                   'error': error, 'mulai': mulai or datetime.now(), 'selesai': datetime.now()})
+        self.status[tahap] = {'sidik_input': sidik_input, 'status': status}
+
+    def catat_dari_metrik(self, tahap, sidik_input, mulai=None):
+        """Mencatat status & jumlah baris tahap dari metrik run_metrics yang baru saja diukur."""
+        hasil = run_metrics.hasil_tahap(tahap) or {}
+        self.catat(tahap, hasil.get('status', scheduler.SUKSES), sidik_input,
+                   hasil.get('baris_dibaca', 0), hasil.get('baris_ditulis', 0), hasil.get('error'), mulai)
+
+    def bungkus(self, tahap, fungsi, hitung_sidik, deps=()):
+        """
+        Membungkus fungsi tahap (yang sudah diinstrumentasi run_metrics): dilewati jika boleh_dilewati,
+        selain itu dijalankan lalu statusnya dicatat. Sidik input disimpan sesudah tahap sukses,
+        jadi input yang dikonsumsi tahapnya sendiri (mis. landing zone oleh sortir) tidak dianggap berubah.
+        Exception tetap diteruskan ke scheduler setelah statusnya dicatat.
+        """
+        @functools.wraps(fungsi)
+        def pembungkus(*args, **kwargs):
+            sidik_awal = sidik_aman(hitung_sidik)
+            if self.boleh_dilewati(tahap, sidik_awal, deps):
+                self.dilewati.add(tahap)
+                print(f"⏭️  Tahap '{tahap}' sudah sukses dan inputnya tidak berubah (resume), dilewati.")
+                return None
+            mulai = datetime.now()
+            try:
+                hasil = fungsi(*args, **kwargs)
+            except Exception:
+                self.catat_dari_metrik(tahap, sidik_awal, mulai)
+                raise
+            sukses = (run_metrics.hasil_tahap(tahap) or {}).get('status', scheduler.SUKSES) == scheduler.SUKSES
+            self.catat_dari_metrik(tahap, sidik_aman(hitung_sidik) if sukses else sidik_awal, mulai)
+            return hasil
+        return pembungkus
+
+def sidik_aman(hitung_sidik):
+    """Sidik input tahap; None (tahap tidak pernah dilewati) jika input tidak bisa dibaca."""
+    try:
+        return sidik(hitung_sidik())
+    except Exception as e:
+        print(f"   -> ⚠️ Sidik input tidak bisa dihitung ({e}); tahap akan dijalankan.")
+        return None
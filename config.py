@@ -1,17 +1,218 @@
+import os
+
 # --- Konfigurasi Koneksi Database ---
-DB_USER = 'postgres'
-DB_PASSWORD = 'ardiwinata230803'
-DB_HOST = 'localhost'
-DB_PORT = '5432'
-DB_NAME_STAGING = 'adventureworks_st'
-DB_NAME_WAREHOUSE = 'adventureworks_wh'
+# Semua nilai bisa ditimpa lewat environment variable AW_* (nilai di bawah hanya default lokal).
+# Password tidak punya default: isi AW_DB_PASSWORD, atau kosongkan dan simpan di PGPASSWORD / ~/.pgpass
+# (dibaca libpq); tanpa keduanya koneksi ditolak dengan pesan yang jelas (database.url_database).
+DB_USER = os.environ.get('AW_DB_USER', 'postgres')
+DB_PASSWORD = os.environ.get('AW_DB_PASSWORD')
+DB_HOST = os.environ.get('AW_DB_HOST', 'localhost')
+DB_PORT = os.environ.get('AW_DB_PORT', '5432')
+DB_NAME_STAGING = os.environ.get('AW_DB_NAME_STAGING', 'adventureworks_st')
+DB_NAME_WAREHOUSE = os.environ.get('AW_DB_NAME_WAREHOUSE', 'adventureworks_wh')
+
+# --- Konfigurasi Connection Pool (satu engine bersama per database per proses) ---
+DB_POOL_SIZE = int(os.environ.get('AW_DB_POOL_SIZE', 5))
+DB_MAX_OVERFLOW = int(os.environ.get('AW_DB_MAX_OVERFLOW', 10))
+DB_POOL_TIMEOUT = float(os.environ.get('AW_DB_POOL_TIMEOUT', 30))
+DB_POOL_RECYCLE = int(os.environ.get('AW_DB_POOL_RECYCLE', 1800))
+DB_POOL_PRE_PING = os.environ.get('AW_DB_POOL_PRE_PING', '1').lower() in ('1', 'true', 'yes')
+# statement_timeout per koneksi dalam milidetik (0 = tanpa batas)
+DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('AW_DB_STATEMENT_TIMEOUT_MS', 0))
+# Jalur cepat executemany psycopg2: 'values_only' atau 'values_plus_batch'
+DB_EXECUTEMANY_MODE = os.environ.get('AW_DB_EXECUTEMANY_MODE', 'values_plus_batch')
 
 # --- Konfigurasi Path Folder ---
 ORGANIZED_PATH = 'data_organized'
 RAW_DATA_PATH = 'data_raw'
 OUTPUT_PATH = 'output'
+CURATED_PATH = 'data_curated'
+CACHE_PATH = '.cache'
+PDF_CACHE_PATH = CACHE_PATH + '/pdf'
+
+# --- Registry Skema Dataset Sumber ---
+# Satu entri per kolom CSV (urutan = urutan kolom di file): dtype pandas saat dibaca dan boleh/tidaknya kosong.
+#   - integer di-downcast ke lebar terkecil yang aman; kolom nullable memakai integer nullable (Int32 dst.),
+#   - teks berulang dengan sedikit nilai unik -> 'category' (dictionary encoding, ikut ke Parquet),
+#   - teks bebas -> 'string[pyarrow]' (buffer Arrow, bukan satu objek Python per sel),
+#   - tanggal langsung di-parse oleh pembaca CSV.
+SKEMA_PELANGGAN = {
+    'id_pelanggan': {'dtype': 'int32', 'nullable': False},
+    'nama_depan': {'dtype': 'string[pyarrow]', 'nullable': True},
+    'nama_belakang': {'dtype': 'string[pyarrow]', 'nullable': True},
+    'email': {'dtype': 'string[pyarrow]', 'nullable': True},
+    'kota_asal': {'dtype': 'category', 'nullable': True},
+}
+SKEMA_PRODUK = {
+    'id_produk': {'dtype': 'int32', 'nullable': False},
+    'nama_produk': {'dtype': 'string[pyarrow]', 'nullable': False},
+    'subkategori': {'dtype': 'category', 'nullable': True},
+    'kategori': {'dtype': 'category', 'nullable': True},
+    'harga_standar': {'dtype': 'float64', 'nullable': True},
+    'warna': {'dtype': 'category', 'nullable': True},
+    'lini_produk': {'dtype': 'category', 'nullable': True},
+}
+SKEMA_PENJUALAN = {
+    'id_order': {'dtype': 'int32', 'nullable': False},
+    'id_order_detail': {'dtype': 'int32', 'nullable': False},
+    'tanggal_order': {'dtype': 'datetime64[ns]', 'nullable': False},
+    'id_pelanggan': {'dtype': 'int32', 'nullable': False},
+    'id_produk': {'dtype': 'int32', 'nullable': False},
+    'jumlah_barang': {'dtype': 'int32', 'nullable': False},
+    # Nilai uang tetap float64: float32 kehilangan presisi sen pada nominal besar
+    'harga_satuan': {'dtype': 'float64', 'nullable': False},
+    'total_harga': {'dtype': 'float64', 'nullable': False},
+}
 
 # --- Konfigurasi Nama Kolom ---
-PELANGGAN_COLS = ['id_pelanggan', 'nama_depan', 'nama_belakang', 'email', 'kota_asal']
-PRODUK_COLS = ['id_produk', 'nama_produk', 'subkategori', 'kategori', 'harga_standar', 'warna', 'lini_produk']
-PENJUALAN_COLS = ['id_order', 'id_order_detail', 'tanggal_order', 'id_pelanggan', 'id_produk', 'jumlah_barang', 'harga_satuan', 'total_harga']
\ No newline at end of file
+PELANGGAN_COLS = list(SKEMA_PELANGGAN)
+PRODUK_COLS = list(SKEMA_PRODUK)
+PENJUALAN_COLS = list(SKEMA_PENJUALAN)
+
+# --- Konfigurasi Dataset Zona Curated (Parquet) ---
+DATASET_LAKE = {
+    'penjualan': {
+        'csv': 'raw_penjualan.csv',
+        'kolom': PENJUALAN_COLS,
+        'skema': SKEMA_PENJUALAN,
+        'kunci': 'id_order_detail',
+        'partisi': 'tanggal_order',
+        # Kolom yang harus ada di dataset dimensi yang dirujuk (diperiksa saat konversi ke zona curated)
+        'referensi': {'id_pelanggan': 'pelanggan', 'id_produk': 'produk'},
+    },
+    'pelanggan': {
+        'csv': 'raw_pelanggan.csv',
+        'kolom': PELANGGAN_COLS,
+        'skema': SKEMA_PELANGGAN,
+        'kunci': 'id_pelanggan',
+    },
+    'produk': {
+        'csv': 'raw_produk.csv',
+        'kolom': PRODUK_COLS,
+        'skema': SKEMA_PRODUK,
+        'kunci': 'id_produk',
+    },
+}
+
+# --- Konfigurasi Ingest Landing Zone (manifest & watch mode) ---
+MANIFEST_FILE = CACHE_PATH + '/manifest_ingest.json'
+DUPLIKAT_PATH = 'data_duplikat'
+INGEST_INTERVAL_DETIK = 30
+# File yang mtime-nya lebih baru dari ini dianggap masih ditulis dan ditunda
+INGEST_STABIL_DETIK = 5
+# Tahap ETL yang membaca tiap file (nama file CSV) atau tipe file (nama folder)
+TAHAP_PER_FILE = {
+    DATASET_LAKE['penjualan']['csv']: ['curated', 'fakta'],
+    DATASET_LAKE['pelanggan']['csv']: ['curated', 'dim_pelanggan', 'dim_lokasi'],
+    DATASET_LAKE['produk']['csv']: ['curated', 'dim_produk'],
+    'pdf': ['pdf'],
+    'txt': ['txt'],
+}
+
+# --- Konfigurasi Load Inkremental ---
+WATERMARK_TABLE = 'etl_watermark'
+# Status terakhir setiap tahap ETL/laporan untuk --resume (di database staging untuk ETL, warehouse untuk laporan)
+RUN_STATE_TABLE = 'etl_run_state'
+VERSI_TABEL_TABLE = 'etl_versi_tabel'
+
+# --- Konfigurasi Validasi Kualitas Data ---
+# Baris yang gagal validasi dipindah ke tabel <prefix><dataset> di database staging beserta alasannya
+QUARANTINE_PREFIX = 'quarantine_'
+# Selisih absolut maksimum |total_harga - jumlah_barang * harga_satuan|;
+# naikkan jika total sumber sudah memuat diskon per baris
+VALIDASI_TOLERANSI_TOTAL = 0.01
+# Rentang tanggal_order yang masuk akal: tidak sebelum tanggal ini dan tidak lebih dari N hari ke depan
+VALIDASI_TANGGAL_MIN = '2000-01-01'
+VALIDASI_TANGGAL_MAKS_HARI_KE_DEPAN = 1
+
+# --- Konfigurasi Resolusi Kunci Fakta ---
+# {db} = nama database staging, supaya peta tidak tertukar antar-database (mis. benchmark)
+KUNCI_DIMENSI_CACHE_FILE = CACHE_PATH + '/peta_kunci_{db}.npz'
+# Baris fakta yang kuncinya tidak bisa di-resolve ke dimensi
+REJECT_FAKTA_TABLE = QUARANTINE_PREFIX + 'fakta_penjualan'
+
+# --- Konfigurasi Load Fakta Paralel ---
+# Baris per potongan penjualan; setiap worker memegang paling banyak 2 potongan sekaligus
+FAKTA_CHUNKSIZE = 250000
+# Jumlah proses transform; setiap proses menulis lewat koneksinya sendiri, jadi ini juga jumlah loader bersamaan
+FAKTA_MAX_WORKERS = 4
+
+# --- Konfigurasi Partisi Fakta_Penjualan (RANGE per bulan pada id_waktu) ---
+# Kolom yang diberi indeks sekunder (join laporan ke dimensi); di partisi yang di-swap indeks dibangun setelah data dimuat
+FAKTA_INDEKS_SEKUNDER = ['pelanggan_key', 'id_produk', 'id_lokasi']
+# Partisi yang lebih tua dari sekian bulan (dihitung dari partisi terbaru) dipensiunkan; None = simpan semua
+FAKTA_RETENSI_BULAN = None
+# 'detach' = dilepas menjadi tabel arsip_fakta_penjualan_pYYYYMM, 'drop' = dihapus
+FAKTA_RETENSI_AKSI = 'detach'
+
+# --- Konfigurasi Sketsa Laporan Perkiraan (HyperLogLog & kuantil per bulan x lokasi x kategori) ---
+SKETSA_TABLE = 'sketsa_penjualan'
+# 2^presisi register per HLL: 12 -> 4096 register, galat baku ~1.6%
+SKETSA_HLL_PRESISI = 12
+# Galat relatif maksimum setiap persentil total_harga
+SKETSA_KUANTIL_ALPHA = 0.01
+SKETSA_PERSENTIL = [0.5, 0.9, 0.99]
+
+# --- Konfigurasi Pembacaan Streaming ---
+STREAM_CHUNKSIZE = 50000
+
+# --- Konfigurasi Bulk Load ---
+# True = pakai COPY FROM STDIN di PostgreSQL; False = paksa DataFrame.to_sql (untuk membandingkan kecepatan)
+BULK_LOAD_COPY = True
+
+# --- Konfigurasi Scheduler ETL ---
+ETL_MAX_WORKERS = 4
+
+# --- Konfigurasi Ekstraksi PDF ---
+PDF_MAX_WORKERS = 4
+
+# --- Konfigurasi Analisis Sentimen ---
+SENTIMEN_CACHE_TABLE = 'cache_sentimen'
+SENTIMEN_MAX_WORKERS = 4
+SENTIMEN_BATCH_SIZE = 500
+
+# --- Konfigurasi SCD Tipe 2 (atribut yang dilacak perubahannya per dimensi) ---
+SCD2_DILACAK = {
+    'Dim_Pelanggan': ['nama_lengkap', 'email', 'kota_asal'],
+}
+
+# --- Konfigurasi Word Cloud ---
+# Stopword bahasa Indonesia (satu kata per baris); difilter saat laporan dibaca, tanpa hitung ulang
+STOPWORDS_FILE = 'stopwords_id.txt'
+WORDCLOUD_MAX_KATA = 200
+
+# --- Konfigurasi Cache Laporan ---
+REPORT_CACHE_FILE = CACHE_PATH + '/report_cache.json'
+
+# --- Konfigurasi Render Grafik ---
+# Profil render: 'standar' = kualitas cetak seperti sebelumnya, 'ringan' untuk run malam
+RENDER_PROFIL = {
+    'standar': {'dpi': 300, 'format': 'png', 'bbox_tight': True},
+    'ringan': {'dpi': 110, 'format': 'webp', 'bbox_tight': False},
+    'vektor': {'dpi': 100, 'format': 'svg', 'bbox_tight': True},
+}
+RENDER_PROFIL_AKTIF = 'standar'
+RENDER_MAX_WORKERS = 4
+
+# --- Konfigurasi Metrik Run (instrumentasi per tahap) ---
+RUN_METRICS_TABLE = 'etl_run_metrics'
+RUN_METRICS_PATH = CACHE_PATH + '/run_metrics'
+# Tahap yang durasinya naik lebih dari ini (persen) dibanding run sebelumnya ditandai regresi
+RUN_METRICS_AMBANG_REGRESI = 20
+# Interval (detik) sampling RSS proses selama tahap berjalan
+RUN_METRICS_INTERVAL_RSS = 0.2
+
+# --- Konfigurasi Benchmark (data sintetis) ---
+# Jumlah baris/file per scale factor 1; semuanya dikali --skala (penjualan 10M baris = skala 100)
+BENCHMARK_SKALA = {'pelanggan': 18500, 'produk': 504, 'penjualan': 100000, 'tweet': 200, 'pdf': 4}
+BENCHMARK_PATH = CACHE_PATH + '/benchmark'
+# Database sekali pakai untuk benchmark (semua tabelnya dikosongkan setiap run)
+BENCHMARK_DB_STAGING = os.environ.get('AW_BENCH_DB_STAGING', 'adventureworks_bench_st')
+BENCHMARK_DB_WAREHOUSE = os.environ.get('AW_BENCH_DB_WAREHOUSE', 'adventureworks_bench_wh')
+
+# --- Konfigurasi CLI ---
+# Nama tahap ETL & laporan yang bisa dipilih lewat `etl --only` / `report --only`
+TAHAP_ETL = ['sortir', 'reset', 'curated', 'dim_produk', 'dim_pelanggan', 'dim_lokasi', 'pdf', 'txt', 'fakta']
+LAPORAN = ['penjualan_per_kategori', 'tren_bulanan', 'top_10_pelanggan', 'sentimen_vs_penjualan', 'kinerja_kuartalan', 'word_cloud',
+           'pelanggan_unik_kota_bulan', 'persentil_belanja_kategori']
+STARTUP_METRICS_FILE = CACHE_PATH + '/startup_metrics.jsonl'
@@ -1,14 +1,342 @@
-from sqlalchemy import create_engine
+import hashlib
+import io
+import os
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import quote_plus
+from sqlalchemy import create_engine, event, exc, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
 import config
+import run_metrics
 
-def get_staging_engine():
-    """Membuat engine untuk koneksi ke database Staging/DWH Inti."""
-    conn_string = f"postgresql+psycopg2://{config.DB_USER}:{config.DB_PASSWORD}@{config.DB_HOST}:{config.DB_PORT}/{config.DB_NAME_STAGING}"
-    engine = create_engine(conn_string)
+# --- Registry engine bersama ---
+# Satu engine (dan satu pool) per database per proses. Pemanggilan get_*_engine berulang
+# dari pipeline, notebook, atau tahap paralel memakai pool yang sama, tidak membuka pool baru.
+_ENGINES = {}
+_METRIK_POOL = {}
+_KUNCI_REGISTRY = threading.Lock()
+
+class _PoolTerukur(QueuePool):
+    """QueuePool yang mencatat lama menunggu koneksi (checkout) untuk ukuran pool."""
+
+    def _do_get(self):
+        mulai = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            _catat_metrik(self, timeout=1)
+            raise
+        finally:
+            _catat_metrik(self, tunggu=time.perf_counter() - mulai)
+
+def _catat_metrik(pool, tunggu=None, timeout=0):
+    metrik = getattr(pool, '_metrik', None)
+    if metrik is None:
+        return
+    with metrik['kunci']:
+        metrik['timeout'] += timeout
+        if tunggu is not None:
+            metrik['total_tunggu_detik'] += tunggu
+            metrik['tunggu_maks_detik'] = max(metrik['tunggu_maks_detik'], tunggu)
+
+def _pasang_metrik(engine, nama_db):
+    metrik = {'kunci': threading.Lock(), 'koneksi_baru': 0, 'checkout': 0, 'checkin': 0,
+              'dipakai': 0, 'dipakai_puncak': 0, 'timeout': 0, 'total_tunggu_detik': 0.0, 'tunggu_maks_detik': 0.0}
+    engine.pool._metrik = metrik
+    _METRIK_POOL[nama_db] = metrik
+
+    @event.listens_for(engine, 'connect')
+    def _saat_connect(dbapi_connection, connection_record):
+        with metrik['kunci']:
+            metrik['koneksi_baru'] += 1
+
+    @event.listens_for(engine, 'checkout')
+    def _saat_checkout(dbapi_connection, connection_record, connection_proxy):
+        with metrik['kunci']:
+            metrik['checkout'] += 1
+            metrik['dipakai'] += 1
+            metrik['dipakai_puncak'] = max(metrik['dipakai_puncak'], metrik['dipakai'])
+
+    @event.listens_for(engine, 'checkin')
+    def _saat_checkin(dbapi_connection, connection_record):
+        with metrik['kunci']:
+            metrik['checkin'] += 1
+            metrik['dipakai'] = max(metrik['dipakai'] - 1, 0)
+
+def _ada_pgpass():
+    """True jika libpq bisa mengambil password sendiri (PGPASSWORD atau file pgpass)."""
+    if os.environ.get('PGPASSWORD'):
+        return True
+    if os.name == 'nt':
+        bawaan = os.path.join(os.environ.get('APPDATA', ''), 'postgresql', 'pgpass.conf')
+    else:
+        bawaan = os.path.expanduser('~/.pgpass')
+    return os.path.isfile(os.environ.get('PGPASSFILE', bawaan))
+
+def url_database(nama_db):
+    """
+    URL koneksi ke database 'nama_db'. Password dari config.DB_PASSWORD (AW_DB_PASSWORD); jika tidak diset,
+    URL dibuat tanpa password dan libpq membacanya dari PGPASSWORD / pgpass. Tanpa keduanya: RuntimeError.
+    """
+    if config.DB_PASSWORD:
+        kredensial = f"{quote_plus(config.DB_USER)}:{quote_plus(config.DB_PASSWORD)}"
+    elif _ada_pgpass():
+        kredensial = quote_plus(config.DB_USER)
+    else:
+        raise RuntimeError("Password database belum diset: isi environment variable AW_DB_PASSWORD "
+                           "(atau PGPASSWORD / entri di ~/.pgpass).")
+    return f"postgresql+psycopg2://{kredensial}@{config.DB_HOST}:{config.DB_PORT}/{nama_db}"
+
+def _buat_engine(nama_db):
+    conn_string = url_database(nama_db)
+    connect_args = {}
+    if config.DB_STATEMENT_TIMEOUT_MS:
+        connect_args['options'] = f"-c statement_timeout={config.DB_STATEMENT_TIMEOUT_MS}"
+    engine = create_engine(
+        conn_string,
+        poolclass=_PoolTerukur,
+        pool_size=config.DB_POOL_SIZE,
+        max_overflow=config.DB_MAX_OVERFLOW,
+        pool_timeout=config.DB_POOL_TIMEOUT,
+        pool_recycle=config.DB_POOL_RECYCLE,
+        pool_pre_ping=config.DB_POOL_PRE_PING,
+        executemany_mode=config.DB_EXECUTEMANY_MODE,
+        connect_args=connect_args,
+    )
+    _pasang_metrik(engine, nama_db)
     return engine
 
+def get_engine(nama_db):
+    """Mengambil engine bersama untuk database 'nama_db' (dibuat sekali per proses)."""
+    with _KUNCI_REGISTRY:
+        engine = _ENGINES.get(nama_db)
+        if engine is None:
+            engine = _ENGINES[nama_db] = _buat_engine(nama_db)
+        return engine
+
+def get_staging_engine():
+    """Engine bersama untuk koneksi ke database Staging/DWH Inti."""
+    return get_engine(config.DB_NAME_STAGING)
+
 def get_warehouse_engine():
-    """Membuat engine untuk koneksi ke database Laporan/Data Mart."""
-    conn_string = f"postgresql+psycopg2://{config.DB_USER}:{config.DB_PASSWORD}@{config.DB_HOST}:{config.DB_PORT}/{config.DB_NAME_WAREHOUSE}"
-    engine = create_engine(conn_string)
-    return engine
\ No newline at end of file
+    """Engine bersama untuk koneksi ke database Laporan/Data Mart."""
+    return get_engine(config.DB_NAME_WAREHOUSE)
+
+def statistik_pool():
+    """
+    Ringkasan pemakaian pool per database: checkout, koneksi baru, puncak koneksi terpakai,
+    total/maks waktu tunggu checkout dan jumlah timeout. Dipakai untuk menyetel
+    DB_POOL_SIZE/DB_MAX_OVERFLOW terhadap ETL_MAX_WORKERS.
+    """
+    hasil = {}
+    with _KUNCI_REGISTRY:
+        daftar = list(_ENGINES.items())
+    for nama_db, engine in daftar:
+        metrik = _METRIK_POOL[nama_db]
+        with metrik['kunci']:
+            data = {k: v for k, v in metrik.items() if k != 'kunci'}
+        data['total_tunggu_detik'] = round(data['total_tunggu_detik'], 4)
+        data['tunggu_maks_detik'] = round(data['tunggu_maks_detik'], 4)
+        data['rata_tunggu_detik'] = round(data['total_tunggu_detik'] / data['checkout'], 6) if data['checkout'] else 0.0
+        data['ukuran_pool'] = engine.pool.size()
+        data['overflow'] = engine.pool.overflow()
+        hasil[nama_db] = data
+    return hasil
+
+def cetak_statistik_pool():
+    for nama_db, data in statistik_pool().items():
+        print(f"🔌 Pool '{nama_db}': {data['checkout']} checkout, {data['koneksi_baru']} koneksi baru, "
+              f"puncak {data['dipakai_puncak']} terpakai, tunggu rata2 {data['rata_tunggu_detik'] * 1000:.2f} ms "
+              f"(maks {data['tunggu_maks_detik'] * 1000:.2f} ms), {data['timeout']} timeout")
+
+def tutup_semua_engine():
+    """Menutup semua pool di registry (mis. di akhir run atau sebelum ganti konfigurasi di notebook)."""
+    with _KUNCI_REGISTRY:
+        for engine in _ENGINES.values():
+            engine.dispose()
+        _ENGINES.clear()
+        _METRIK_POOL.clear()
+
+def _reset_setelah_fork():
+    # Koneksi milik proses induk tidak boleh dipakai ulang oleh proses anak (ProcessPool)
+    global _KUNCI_REGISTRY
+    _KUNCI_REGISTRY = threading.Lock()
+    for engine in _ENGINES.values():
+        engine.dispose(close=False)
+    _ENGINES.clear()
+    _METRIK_POOL.clear()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_setelah_fork)
+
+def _copy_dataframe(df, nama_tabel, connection, if_exists):
+    """Streaming DataFrame ke PostgreSQL dengan COPY FROM STDIN lewat buffer CSV di memori."""
+    # Biarkan pandas yang membuat/mengganti tabel (hanya skema, 0 baris), datanya lewat COPY
+    df.head(0).to_sql(nama_tabel, connection, if_exists=if_exists, index=False)
+
+    # Kolom integer yang jadi float karena NaN (mis. hasil left merge) ditulis "5.0",
+    # yang ditolak COPY untuk kolom INTEGER. Kembalikan ke Int64 (nullable) dulu.
+    df_copy = df
+    for kolom_float in df.select_dtypes(include='float').columns:
+        nilai = df[kolom_float].dropna()
+        if not nilai.empty and (nilai % 1 == 0).all():
+            if df_copy is df:
+                df_copy = df.copy()
+            df_copy[kolom_float] = df_copy[kolom_float].astype('Int64')
+
+    # NULL ditulis sebagai \N (bukan field kosong), jadi string kosong tetap '' seperti di jalur to_sql
+    buffer = io.StringIO()
+    df_copy.to_csv(buffer, index=False, header=False, na_rep='\\N')
+    buffer.seek(0)
+
+    kolom = ', '.join(f'"{k}"' for k in df.columns)
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY \"{nama_tabel}\" ({kolom}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer)
+    finally:
+        cursor.close()
+
+def bulk_load(df, nama_tabel, bind, if_exists='append'):
+    """
+    Helper bersama untuk memuat DataFrame ke database.
+    PostgreSQL -> COPY FROM STDIN (jauh lebih cepat dari INSERT per batch),
+    engine lain (atau config.BULK_LOAD_COPY = False) -> fallback ke DataFrame.to_sql.
+    'bind' boleh Engine atau Connection; kalau Connection, COPY ikut transaksinya.
+    Mengembalikan jumlah baris yang dimuat.
+    """
+    if df.empty and if_exists == 'append':
+        return 0
+
+    mulai = time.perf_counter()
+    if config.BULK_LOAD_COPY and bind.dialect.name == 'postgresql':
+        metode = 'COPY'
+        if isinstance(bind, Engine):
+            with bind.begin() as connection:
+                _copy_dataframe(df, nama_tabel, connection, if_exists)
+        else:
+            _copy_dataframe(df, nama_tabel, bind, if_exists)
+    else:
+        metode = 'to_sql'
+        df.to_sql(nama_tabel, bind, if_exists=if_exists, index=False, chunksize=1000)
+
+    durasi = time.perf_counter() - mulai
+    # Tabel bantu (_tmp_*, _agg_delta, _scd2_*) tidak dihitung; baris akhirnya dicatat pemanggil
+    if not nama_tabel.startswith('_'):
+        run_metrics.catat_tulis(len(df))
+    baris_per_detik = len(df) / durasi if durasi > 0 else float('inf')
+    print(f"   -> [{metode}] {len(df)} baris ke '{nama_tabel}' dalam {durasi:.2f} dtk ({baris_per_detik:,.0f} baris/dtk)")
+    return len(df)
+
+# --- Kunci antar-run ---
+@contextmanager
+def kunci_eksklusif(engine, nama):
+    """
+    Session advisory lock PostgreSQL atas 'nama', dipegang satu koneksi khusus selama blok berjalan,
+    supaya dua run (mis. `etl` dan `watch`) tidak mengerjakan bagian yang sama bersamaan. Run kedua
+    menunggu; kunci otomatis lepas jika proses pemegangnya mati (koneksinya putus).
+    """
+    kunci = int.from_bytes(hashlib.md5(nama.encode('utf-8')).digest()[:8], 'big', signed=True)
+    with engine.connect() as connection:
+        if not connection.execute(text("SELECT pg_try_advisory_lock(:kunci)"), {'kunci': kunci}).scalar():
+            print(f"   -> ⏳ Run lain sedang memegang kunci '{nama}', menunggu...")
+            connection.execute(text("SELECT pg_advisory_lock(:kunci)"), {'kunci': kunci})
+        try:
+            yield
+        finally:
+            connection.execute(text("SELECT pg_advisory_unlock(:kunci)"), {'kunci': kunci})
+
+# --- Pembacaan streaming (server-side cursor) ---
+def baca_streaming(query, engine, chunksize=None, params=None, sebagai='pandas'):
+    """
+    Membaca hasil query per potongan lewat server-side cursor (stream_results),
+    sehingga memori puncak sebanding dengan chunksize, bukan ukuran tabel.
+    Menghasilkan (generator) DataFrame pandas, atau pyarrow.RecordBatch jika sebagai='arrow'.
+    """
+    chunksize = chunksize or config.STREAM_CHUNKSIZE
+    with engine.connect() as connection:
+        connection = connection.execution_options(stream_results=True, max_row_buffer=chunksize)
+        result = connection.execute(text(query), params or {})
+        kolom = list(result.keys())
+        while True:
+            rows = result.fetchmany(chunksize)
+            if not rows:
+                break
+            run_metrics.catat_baca(len(rows))
+            if sebagai == 'arrow':
+                import pyarrow as pa
+                yield pa.RecordBatch.from_pydict({k: list(nilai) for k, nilai in zip(kolom, zip(*rows))})
+            else:
+                import pandas as pd
+                yield pd.DataFrame.from_records(rows, columns=kolom)
+
+def baca_streaming_df(query, engine, chunksize=None, params=None, kategori=()):
+    """
+    Membaca query secara streaming lalu menggabungkannya menjadi satu DataFrame ringkas:
+    kolom integer di-downcast dan kolom di 'kategori' disimpan sebagai category per potongan,
+    jadi tidak pernah ada salinan penuh berisi objek Python mentah.
+    """
+    import pandas as pd
+    potongan = []
+    for chunk in baca_streaming(query, engine, chunksize, params):
+        for kolom in chunk.select_dtypes(include='integer').columns:
+            chunk[kolom] = pd.to_numeric(chunk[kolom], downcast='integer')
+        for kolom in kategori:
+            chunk[kolom] = chunk[kolom].astype('category')
+        potongan.append(chunk)
+    if not potongan:
+        with engine.connect() as connection:
+            kolom = list(connection.execute(text(f"SELECT * FROM ({query}) q LIMIT 0"), params or {}).keys())
+        return pd.DataFrame(columns=kolom)
+    # Kategori tiap potongan bisa berbeda; samakan dulu dengan union_categoricals
+    # supaya concat tidak jatuh kembali ke dtype object
+    from pandas.api.types import union_categoricals
+    for kolom in kategori:
+        gabungan = union_categoricals([chunk[kolom] for chunk in potongan]).categories
+        for chunk in potongan:
+            chunk[kolom] = chunk[kolom].cat.set_categories(gabungan)
+    return pd.concat(potongan, ignore_index=True)
+
+# --- Versi tabel (dipakai cache laporan untuk mendeteksi perubahan input) ---
+def _pastikan_tabel_versi(connection):
+    connection.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {config.VERSI_TABEL_TABLE} (
+            nama_tabel TEXT PRIMARY KEY,
+            versi BIGINT NOT NULL,
+            tgl_update TIMESTAMP
+        )
+    """))
+
+def pastikan_tabel_versi(engine):
+    """Membuat tabel versi sekali di awal run (menghindari CREATE bersamaan dari tahap paralel)."""
+    with engine.begin() as connection:
+        _pastikan_tabel_versi(connection)
+
+def tandai_tabel_berubah(bind, *nama_tabel):
+    """
+    Menaikkan nomor versi tabel-tabel yang baru saja ditulis.
+    Sebaiknya dipanggil dengan Connection di transaksi yang sama dengan penulisan datanya.
+    """
+    if isinstance(bind, Engine):
+        with bind.begin() as connection:
+            return tandai_tabel_berubah(connection, *nama_tabel)
+    _pastikan_tabel_versi(bind)
+    for nama in nama_tabel:
+        bind.execute(text(f"""
+            INSERT INTO {config.VERSI_TABEL_TABLE} (nama_tabel, versi, tgl_update)
+            VALUES (:nama_tabel, 1, now())
+            ON CONFLICT (nama_tabel) DO UPDATE SET versi = {config.VERSI_TABEL_TABLE}.versi + 1, tgl_update = now()
+        """), {'nama_tabel': nama})
+
+def baca_versi_tabel(engine, daftar_tabel):
+    """Mengambil {nama_tabel: versi} (0 untuk tabel yang belum pernah ditandai)."""
+    with engine.begin() as connection:
+        _pastikan_tabel_versi(connection)
+        rows = connection.execute(
+            text(f"SELECT nama_tabel, versi FROM {config.VERSI_TABEL_TABLE} WHERE nama_tabel = ANY(:daftar_tabel)"),
+            {'daftar_tabel': list(daftar_tabel)}
+        ).fetchall()
+    versi = {nama: 0 for nama in daftar_tabel}
+    versi.update({row[0]: row[1] for row in rows})
+    return versi
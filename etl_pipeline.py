@@ -1,51 +1,41 @@
 import pandas as pd
-from sqlalchemy import text
+from sqlalchemy import text, inspect as sa_inspect
 import os
-import shutil
-from datetime import date, datetime
-import PyPDF2
-from textblob import TextBlob
+from datetime import datetime
 import random
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 import config
+import database
+import scheduler
+import sentiment_engine
+import scd2_engine
+import lake_storage
+import aggregates
+import frekuensi_kata
+import ingestion
+import kunci_dimensi
+import partisi_fakta
+import sketsa
+import validasi
+import run_metrics
+import checkpoint
 
 # Sortir file mentah dari landing zone ke folder terorganisir
 # Berdasarkan tipe file (CSV, PDF, TXT)
 def sortir_file_mentah():
-    """Menyalin file dari landing zone ke folder terorganisir berdasarkan tipe."""
+    """
+    Memindahkan file dari landing zone ke folder terorganisir berdasarkan tipe.
+    Setiap file dicatat di manifest ingest; file yang isinya sudah pernah diterima dibuang sebagai duplikat.
+    Mengembalikan list file yang diterima (lihat ingestion.terima_file_baru).
+    """
     print("\n--- Memulai Proses Sortir File Mentah ---")
-    
-    # Menggunakan variabel dari config.py, bukan hardcode
-    source_path = config.RAW_DATA_PATH 
-    organized_base = config.ORGANIZED_PATH
-    
-    paths = {
-        '.csv': os.path.join(organized_base, 'csv'),
-        '.pdf': os.path.join(organized_base, 'pdf'),
-        '.txt': os.path.join(organized_base, 'txt')
-    }
-
-    # Pastikan semua folder tujuan ada
-    for path in paths.values():
-        os.makedirs(path, exist_ok=True)
-        
-    # Pindahkan file
-    files_to_move = os.listdir(source_path)
-    if not files_to_move:
-        print(f"-> Folder '{source_path}' kosong, tidak ada file yang disortir.")
-        return
-        
-    for filename in files_to_move:
-        file_path = os.path.join(source_path, filename)
-        _, ext = os.path.splitext(filename)
-        ext = ext.lower()
-
-        if ext in paths:
-            shutil.move(file_path, os.path.join(paths[ext], filename))
-            print(f"  -> File '{filename}' dipindahkan ke '{paths[ext]}'")
-        else:
-            print(f"  -> File '{filename}' tidak dikenali tipenya, dilewati.")
-            
-    print("✅ Proses Sortir File Selesai.")
+    diterima = ingestion.terima_file_baru()
+    if not diterima:
+        print(f"-> Tidak ada file baru di '{config.RAW_DATA_PATH}'.")
+        return diterima
+    print(f"✅ Proses Sortir File Selesai ({len(diterima)} file diterima).")
+    return diterima
 
 # Reset semua tabel DWH & Staging sebelum diisi ulang
 def reset_all_tables(engine_st):
@@ -53,251 +43,761 @@ def reset_all_tables(engine_st):
     print("\n--- MERESET SEMUA TABEL DI adventureworks_st ---")
     with engine_st.connect() as connection:
         try:
+            # Partisi fakta cukup dilepas & dihapus (instan), tanpa menghapus datanya baris demi baris
+            partisi_fakta.hapus_semua_partisi(connection)
             # Menggunakan CASCADE untuk menangani dependensi foreign key
             connection.execute(text('TRUNCATE TABLE "Fakta_Penjualan", "Dim_Waktu", "Dim_Lokasi", "Dim_Produk", "Dim_Pelanggan", stg_dokumen_pdf, stg_analisis_sentimen RESTART IDENTITY CASCADE;'))
+            # Watermark ikut dihapus supaya run inkremental berikutnya mulai dari awal lagi
+            connection.execute(text(f"DROP TABLE IF EXISTS {config.WATERMARK_TABLE};"))
+            # Karantina fakta run lama tidak relevan lagi setelah fakta dimuat ulang
+            connection.execute(text(f"DROP TABLE IF EXISTS {config.REJECT_FAKTA_TABLE};"))
+            # Rollup laporan juga dikosongkan karena fakta dimuat ulang dari nol
+            aggregates.pastikan_tabel_agregat(connection)
+            connection.execute(text(f"TRUNCATE TABLE {', '.join(aggregates.TABEL_AGREGAT)};"))
+            sketsa.pastikan_tabel_sketsa(connection)
+            connection.execute(text(f"TRUNCATE TABLE {sketsa.TABEL_SKETSA};"))
+            frekuensi_kata.pastikan_tabel_frekuensi(connection)
+            connection.execute(text(f"TRUNCATE TABLE {frekuensi_kata.TABEL_FREKUENSI};"))
+            database.tandai_tabel_berubah(connection, 'Fakta_Penjualan', 'Dim_Waktu', 'Dim_Lokasi', 'Dim_Produk', 'Dim_Pelanggan',
+                                          'stg_dokumen_pdf', 'stg_analisis_sentimen', *aggregates.TABEL_AGREGAT, frekuensi_kata.TABEL_FREKUENSI,
+                                          sketsa.TABEL_SKETSA)
             connection.commit()
             print("✅ Semua tabel di adventureworks_st berhasil dikosongkan.")
         except Exception as e:
+            run_metrics.catat_error(e)
             print(f"⚠️ Gagal mereset tabel: {e}")
+            # Diteruskan ke scheduler supaya tahap hilirnya dilewati
+            raise
+
+# --- Helper untuk mode inkremental (watermark & upsert) ---
+def _pastikan_tabel_watermark(connection):
+    """Membuat tabel kontrol watermark jika belum ada."""
+    connection.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {config.WATERMARK_TABLE} (
+            nama_tabel TEXT PRIMARY KEY,
+            tanggal_terakhir DATE,
+            id_terakhir BIGINT,
+            tgl_update TIMESTAMP
+        )
+    """))
+
+def baca_watermark(engine_st, nama_tabel):
+    """Mengambil high-water mark (tanggal, id) terakhir untuk sebuah tabel. (None, None) jika belum ada."""
+    with engine_st.begin() as connection:
+        _pastikan_tabel_watermark(connection)
+        row = connection.execute(
+            text(f"SELECT tanggal_terakhir, id_terakhir FROM {config.WATERMARK_TABLE} WHERE nama_tabel = :nama_tabel"),
+            {'nama_tabel': nama_tabel}
+        ).fetchone()
+    if row is None:
+        return None, None
+    return row[0], row[1]
+
+def simpan_watermark(connection, nama_tabel, tanggal_terakhir, id_terakhir):
+    """Menyimpan high-water mark baru. Dipanggil di dalam transaksi yang sama dengan proses load."""
+    _pastikan_tabel_watermark(connection)
+    connection.execute(text(f"""
+        INSERT INTO {config.WATERMARK_TABLE} (nama_tabel, tanggal_terakhir, id_terakhir, tgl_update)
+        VALUES (:nama_tabel, :tanggal_terakhir, :id_terakhir, :tgl_update)
+        ON CONFLICT (nama_tabel) DO UPDATE SET
+            tanggal_terakhir = GREATEST({config.WATERMARK_TABLE}.tanggal_terakhir, EXCLUDED.tanggal_terakhir),
+            id_terakhir = GREATEST({config.WATERMARK_TABLE}.id_terakhir, EXCLUDED.id_terakhir),
+            tgl_update = EXCLUDED.tgl_update
+    """), {'nama_tabel': nama_tabel, 'tanggal_terakhir': tanggal_terakhir, 'id_terakhir': id_terakhir, 'tgl_update': datetime.now()})
+
+def _upsert_dataframe(connection, df, nama_tabel, kolom_kunci, update=True):
+    """
+    Memuat DataFrame lewat tabel sementara lalu menggabungkannya ke tabel tujuan.
+    update=True  -> INSERT ... ON CONFLICT (kunci) DO UPDATE (butuh constraint unik pada kunci)
+    update=False -> hanya menyisipkan baris yang kuncinya belum ada (tanpa butuh constraint)
+    """
+    tabel_tmp = f"_tmp_{nama_tabel.lower()}"
+    database.bulk_load(df, tabel_tmp, connection, if_exists='replace')
+    jumlah = _gabung_dari_tabel(connection, tabel_tmp, nama_tabel, list(df.columns), kolom_kunci, update)
+    connection.execute(text(f"DROP TABLE IF EXISTS {tabel_tmp}"))
+    run_metrics.catat_tulis(jumlah)
+    return jumlah
 
-def etl_dim_produk(engine_st):
+def _gabung_dari_tabel(connection, tabel_sumber, nama_tabel, kolom, kolom_kunci, update=True):
+    """Bagian SQL dari _upsert_dataframe untuk sumber yang sudah berupa tabel. Mengembalikan jumlah baris."""
+    daftar_kolom = ', '.join(f'"{k}"' for k in kolom)
+    if update:
+        kunci = ', '.join(f'"{k}"' for k in kolom_kunci)
+        kolom_update = ', '.join(f'"{k}" = EXCLUDED."{k}"' for k in kolom if k not in kolom_kunci)
+        aksi = f"DO UPDATE SET {kolom_update}" if kolom_update else "DO NOTHING"
+        sql = f'INSERT INTO "{nama_tabel}" ({daftar_kolom}) SELECT {daftar_kolom} FROM {tabel_sumber} ON CONFLICT ({kunci}) {aksi}'
+    else:
+        kondisi = ' AND '.join(f't."{k}" = s."{k}"' for k in kolom_kunci)
+        kolom_s = ', '.join(f's."{k}"' for k in kolom)
+        sql = f'INSERT INTO "{nama_tabel}" ({daftar_kolom}) SELECT {kolom_s} FROM {tabel_sumber} s WHERE NOT EXISTS (SELECT 1 FROM "{nama_tabel}" t WHERE {kondisi})'
+
+    return connection.execute(text(sql)).rowcount
+
+def etl_dim_produk(engine_st, full_rebuild=True):
     print("\n--- Memulai ETL Dim_Produk ---")
-    path_sumber = os.path.join(config.ORGANIZED_PATH, 'csv', 'raw_produk.csv')
-    df = pd.read_csv(path_sumber, sep=',', header=None, skiprows=1, names=config.PRODUK_COLS)
-    df['warna'].fillna('Tidak Berwarna', inplace=True)
-    df.to_sql('Dim_Produk', engine_st, if_exists='append', index=False, chunksize=1000)
-    print(f"✅ SUKSES! {len(df)} baris dimuat ke Dim_Produk.")
-
-def etl_dim_waktu(engine_st):
-    print("\n--- Memulai ETL Dim_Waktu ---")
-    # E: Extract (Ingest data mentah penjualan dari CSV untuk mendapatkan rentang tanggal)
-    df = pd.read_csv(os.path.join(config.ORGANIZED_PATH, 'csv', 'raw_penjualan.csv'), sep=',', header=None, skiprows=1, names=config.PENJUALAN_COLS)
-    df['tanggal_order'] = pd.to_datetime(df['tanggal_order'])
-    
-    # T: Transform (Membuat rentang tanggal unik dan atribut waktu)
-    date_range = pd.date_range(df['tanggal_order'].min(), df['tanggal_order'].max(), freq='D')
+    df = lake_storage.baca_dataset('produk')
+    df['warna'] = lake_storage.isi_kosong(df['warna'], 'Tidak Berwarna')
+    with engine_st.begin() as connection:
+        if full_rebuild:
+            database.bulk_load(df, 'Dim_Produk', connection)
+        else:
+            # Mode inkremental: hanya produk yang belum terdaftar yang disisipkan
+            jumlah = _upsert_dataframe(connection, df, 'Dim_Produk', ['id_produk'], update=False)
+        database.tandai_tabel_berubah(connection, 'Dim_Produk')
+    if full_rebuild:
+        print(f"✅ SUKSES! {len(df)} baris dimuat ke Dim_Produk.")
+    else:
+        print(f"✅ SUKSES! {jumlah} produk baru dimuat ke Dim_Produk.")
+
+def hitung_id_waktu(tanggal):
+    """id_waktu YYYYMMDD dari Series tanggal, dihitung aritmetis (tanpa format string per baris)."""
+    return (tanggal.dt.year * 10000 + tanggal.dt.month * 100 + tanggal.dt.day).astype('int32')
+
+def _bangun_dim_waktu(tanggal_min, tanggal_max):
+    """Baris Dim_Waktu (satu per hari) untuk rentang tanggal [tanggal_min, tanggal_max]."""
+    date_range = pd.date_range(pd.Timestamp(tanggal_min).normalize(), pd.Timestamp(tanggal_max).normalize(), freq='D')
     df_final = pd.DataFrame(date_range, columns=['tanggal'])
     
-    df_final['id_waktu'] = df_final['tanggal'].dt.strftime('%Y%m%d').astype(int)
+    df_final['id_waktu'] = hitung_id_waktu(df_final['tanggal'])
     df_final['tahun'] = df_final['tanggal'].dt.year
     df_final['kuartal'] = df_final['tanggal'].dt.quarter
     df_final['bulan'] = df_final['tanggal'].dt.month
     df_final['nama_bulan'] = df_final['tanggal'].dt.strftime('%B')
     df_final['hari'] = df_final['tanggal'].dt.day
     df_final['nama_hari'] = df_final['tanggal'].dt.strftime('%A')
-    
-    # L: Load (Muat data ke Dim_Waktu di adventureworks_st)
-    df_final.to_sql('Dim_Waktu', engine_st, if_exists='append', index=False, chunksize=1000)
-    print(f"✅ SUKSES! {len(df_final)} baris dimuat ke Dim_Waktu.")
-    
+    return df_final
+
+def muat_dim_waktu(connection, tanggal_min, tanggal_max, full_rebuild=True):
+    """
+    Membangun (full rebuild) atau memperluas Dim_Waktu untuk rentang tanggal penjualan.
+    Dipanggil dari load fakta dengan min/max yang dikumpulkan di pass yang sama,
+    jadi sumber penjualan tidak perlu dibaca ulang hanya untuk rentang tanggalnya.
+    Mengembalikan jumlah tanggal yang dimuat.
+    """
+    if full_rebuild:
+        df_final = _bangun_dim_waktu(tanggal_min, tanggal_max)
+        database.bulk_load(df_final, 'Dim_Waktu', connection)
+        jumlah = len(df_final)
+    else:
+        # Mode inkremental: rentang digabung dengan isi Dim_Waktu yang sudah ada supaya kalender
+        # tetap tanpa celah; tanggal yang sudah ada tidak disentuh
+        lama_min, lama_max = connection.execute(text('SELECT MIN(tanggal), MAX(tanggal) FROM "Dim_Waktu"')).fetchone()
+        if lama_min is not None:
+            tanggal_min = min(pd.Timestamp(tanggal_min), pd.Timestamp(lama_min))
+            tanggal_max = max(pd.Timestamp(tanggal_max), pd.Timestamp(lama_max))
+        df_final = _bangun_dim_waktu(tanggal_min, tanggal_max)
+        jumlah = _upsert_dataframe(connection, df_final, 'Dim_Waktu', ['id_waktu'], update=False)
+    database.tandai_tabel_berubah(connection, 'Dim_Waktu')
+    return jumlah
+
 def etl_dim_pelanggan_scd2(engine_st):
     print("\n--- Memulai ETL SCD Tipe 2 untuk Dim_Pelanggan ---")
-    path_sumber = os.path.join(config.ORGANIZED_PATH, 'csv', 'raw_pelanggan.csv')
-    source_df = pd.read_csv(path_sumber, sep=',', header=None, skiprows=1, names=config.PELANGGAN_COLS)
+    source_df = lake_storage.baca_dataset('pelanggan')
     source_df['nama_lengkap'] = source_df['nama_depan'] + ' ' + source_df['nama_belakang']
-    try:
-        dwh_df = pd.read_sql_query('SELECT * FROM "Dim_Pelanggan" WHERE status_sekarang = TRUE', engine_st)
-    except:
-        dwh_df = pd.DataFrame(columns=['pelanggan_key', 'id_pelanggan', 'nama_lengkap', 'email', 'kota_asal', 'tanggal_mulai', 'tanggal_akhir', 'status_sekarang'])
-        
-    merged_df = pd.merge(source_df, dwh_df, on='id_pelanggan', how='left', suffixes=('_new', '_old'), indicator=True)
-    new_records = merged_df[merged_df['_merge'] == 'left_only'].copy(); new_to_insert = new_records[['id_pelanggan', 'nama_lengkap_new', 'email_new', 'kota_asal_new']].copy(); new_to_insert.rename(columns={'nama_lengkap_new': 'nama_lengkap', 'email_new': 'email', 'kota_asal_new': 'kota_asal'}, inplace=True)
-    new_to_insert['tanggal_mulai'] = '1900-01-01'; new_to_insert['tanggal_akhir'] = '9999-12-31'; new_to_insert['status_sekarang'] = True
-    changed_df = merged_df[merged_df['_merge'] == 'both'].copy(); changed_df = changed_df[changed_df['kota_asal_new'] != changed_df['kota_asal_old']]
-    keys_to_expire = changed_df['pelanggan_key'].astype(int).tolist() if not changed_df.empty else []
-    updates_as_new = changed_df[['id_pelanggan', 'nama_lengkap_new', 'email_new', 'kota_asal_new']].copy(); updates_as_new.rename(columns={'nama_lengkap_new': 'nama_lengkap', 'email_new': 'email', 'kota_asal_new': 'kota_asal'}, inplace=True)
-    updates_as_new['tanggal_mulai'] = date.today(); updates_as_new['tanggal_akhir'] = '9999-12-31'; updates_as_new['status_sekarang'] = True
-    records_to_insert = pd.concat([new_to_insert, updates_as_new], ignore_index=True)
 
-    with engine_st.connect() as connection:
-        if keys_to_expire:
-            connection.execute(text(f"""UPDATE "Dim_Pelanggan" SET status_sekarang = FALSE, tanggal_akhir = '{date.today()}' WHERE pelanggan_key IN ({','.join(map(str, keys_to_expire))})""")); connection.commit()
-    if not records_to_insert.empty:
-        records_to_insert.to_sql('Dim_Pelanggan', engine_st, if_exists='append', index=False, chunksize=1000)
-    print(f"✅ SUKSES! Proses SCD Tipe 2 Dim_Pelanggan selesai.")
+    # Perbandingan, expire, dan insert versi baru dikerjakan set-based di DB oleh engine SCD2
+    jumlah_expire, jumlah_insert = scd2_engine.terapkan_scd2(
+        engine_st, source_df, 'Dim_Pelanggan',
+        kolom_bisnis='id_pelanggan',
+        kolom_dilacak=config.SCD2_DILACAK['Dim_Pelanggan']
+    )
+    print(f"✅ SUKSES! Proses SCD Tipe 2 Dim_Pelanggan selesai ({jumlah_expire} versi di-expire, {jumlah_insert} versi baru).")
 
-def etl_dim_lokasi(engine_st):
+def etl_dim_lokasi(engine_st, full_rebuild=True):
     print("\n--- Memulai ETL Dim_Lokasi ---")
-    # E: Extract (Ingest data mentah pelanggan dari CSV untuk mendapatkan kota_asal)
-    df = pd.read_csv(os.path.join(config.ORGANIZED_PATH, 'csv', 'raw_pelanggan.csv'), sep=',', header=None, skiprows=1, names=config.PELANGGAN_COLS)
+    # E: Extract (Cukup kolom kota_asal dari zona curated)
+    df = lake_storage.baca_dataset('pelanggan', columns=['kota_asal'])
     
     # T: Transform (Mengambil nilai unik dari kolom 'kota_asal' dan buang nilai NaN)
     df_final = pd.DataFrame(df['kota_asal'].unique(), columns=['nama_kota']).dropna()
     
     # L: Load (Muat data ke Dim_Lokasi di adventureworks_st)
-    df_final.to_sql('Dim_Lokasi', engine_st, if_exists='append', index=False, chunksize=1000)
-    print(f"✅ SUKSES! {len(df_final)} baris dimuat ke Dim_Lokasi.")
+    with engine_st.begin() as connection:
+        if full_rebuild:
+            database.bulk_load(df_final, 'Dim_Lokasi', connection)
+        else:
+            # Mode inkremental: id_lokasi di-generate DB, jadi cukup sisipkan kota yang belum ada
+            jumlah = _upsert_dataframe(connection, df_final, 'Dim_Lokasi', ['nama_kota'], update=False)
+        database.tandai_tabel_berubah(connection, 'Dim_Lokasi')
+    if full_rebuild:
+        print(f"✅ SUKSES! {len(df_final)} baris dimuat ke Dim_Lokasi.")
+    else:
+        print(f"✅ SUKSES! {jumlah} kota baru dimuat ke Dim_Lokasi.")
+
+def _ekstrak_teks_pdf(file_path):
+    """Ekstrak teks semua halaman PDF. Level modul supaya bisa dipakai di process pool."""
+    import PyPDF2  # import berat, hanya dimuat saat memang ada PDF yang perlu di-parse
+    with open(file_path, 'rb') as file:
+        reader = PyPDF2.PdfReader(file)
+        # Kumpulkan per halaman lalu join sekali (hindari text += berulang)
+        halaman = [(page.extract_text() or '') + "\n" for page in reader.pages] # Tambah baris baru antar halaman
+    return ''.join(halaman)
+
+def _ekstrak_teks_pdf_aman(file_path):
+    """(teks, None) jika berhasil, (None, alasan) jika PDF rusak/terenkripsi, supaya satu file tidak menggagalkan batch."""
+    try:
+        return _ekstrak_teks_pdf(file_path), None
+    except Exception as e:
+        return None, f"pdf_tidak_terbaca: {type(e).__name__}: {e}"
+
+def _baca_hash_staging(engine_st, nama_tabel, kolom_hash):
+    """Mengambil {nama_file: hash} yang sudah ada di tabel staging (kosong jika belum ada)."""
+    try:
+        hasil = {}
+        for chunk in database.baca_streaming(f'SELECT nama_file, {kolom_hash} FROM {nama_tabel}', engine_st):
+            hasil.update(zip(chunk['nama_file'], chunk[kolom_hash]))
+        return hasil
+    except Exception:
+        # Tabel belum ada / masih skema lama tanpa kolom hash -> anggap semua file baru
+        return {}
 
-def etl_pdf_to_staging(engine_st):
+def _muat_staging_inkremental(engine_st, df, nama_tabel, kolom_hash, sebelum_ganti=None, sebelum_commit=None):
+    """
+    Mengganti baris milik file-file di df (berdasarkan nama_file) lalu menambahkan versi barunya.
+    sebelum_ganti(connection, df) dipanggil di transaksi yang sama sebelum baris lama dihapus
+    (mis. untuk memelihara tabel turunan dari delta lama -> baru).
+    sebelum_commit(df) dipanggil setelah load, sebelum commit: jika gagal, load ikut di-rollback.
+    """
+    with engine_st.begin() as connection:
+        if sebelum_ganti is not None:
+            sebelum_ganti(connection, df)
+        if sa_inspect(connection).has_table(nama_tabel):
+            connection.execute(text(f"ALTER TABLE {nama_tabel} ADD COLUMN IF NOT EXISTS {kolom_hash} TEXT"))
+            connection.execute(text(f"DELETE FROM {nama_tabel} WHERE nama_file = ANY(:nama_file)"), {'nama_file': df['nama_file'].tolist()})
+        database.bulk_load(df, nama_tabel, connection)
+        database.tandai_tabel_berubah(connection, nama_tabel)
+        if sebelum_commit is not None:
+            sebelum_commit(df)
+
+def etl_pdf_to_staging(engine_st, max_workers=None):
     print("\n--- Memulai ETL untuk file PDF ---")
     
     # Tentukan path folder PDF
     pdf_folder = os.path.join(config.ORGANIZED_PATH, 'pdf')
-    
-    # List kosong untuk menampung hasil ekstraksi
-    hasil_ekstraksi = []
+    cache_folder = config.PDF_CACHE_PATH
+    os.makedirs(cache_folder, exist_ok=True)
     
     try:
-        # Loop melalui semua file di dalam folder pdf
+        # 1. Hitung hash isi setiap PDF (jauh lebih murah daripada parsing)
+        daftar_pdf = {}
         for filename in os.listdir(pdf_folder):
             if filename.lower().endswith('.pdf'):
-                print(f"  -> Memproses file: {filename}...")
-                file_path = os.path.join(pdf_folder, filename)
-                
-                text = ""
-                # Buka dan baca file PDF
-                with open(file_path, 'rb') as file:
-                    reader = PyPDF2.PdfReader(file)
-                    for page in reader.pages:
-                        text += page.extract_text() + "\n" # Tambah baris baru antar halaman
-                
-                # Tambahkan hasil ke list
-                hasil_ekstraksi.append({
-                    'nama_file': filename,
-                    'isi_teks': text
-                })
-        
-        if not hasil_ekstraksi:
+                daftar_pdf[filename] = ingestion.hitung_hash_file(os.path.join(pdf_folder, filename))
+
+        if not daftar_pdf:
             print("⚠️ Tidak ada file PDF yang ditemukan untuk diproses.")
             return
 
-        # Transformasi: Ubah list menjadi DataFrame dan tambahkan timestamp
-        df_pdf = pd.DataFrame(hasil_ekstraksi)
+        # 2. Lewati dokumen yang hash-nya sama dengan yang sudah ada di staging
+        hash_staging = _baca_hash_staging(engine_st, 'stg_dokumen_pdf', 'hash_konten')
+        berubah = {nama: h for nama, h in daftar_pdf.items() if hash_staging.get(nama) != h}
+        print(f"  -> {len(daftar_pdf)} PDF ditemukan, {len(berubah)} baru/berubah, {len(daftar_pdf) - len(berubah)} dilewati.")
+        if not berubah:
+            print(f"✅ SUKSES! Semua dokumen PDF sudah up-to-date.")
+            return
+
+        # 3. Ambil teks dari cache disk (key = hash konten); parse hanya yang belum pernah dilihat
+        hasil_teks = {}
+        karantina = {}
+        perlu_parse = []
+        for nama, h in berubah.items():
+            path_cache = os.path.join(cache_folder, f"{h}.txt")
+            if os.path.exists(path_cache):
+                with open(path_cache, 'r', encoding='utf-8') as file:
+                    hasil_teks[nama] = file.read()
+            else:
+                perlu_parse.append(nama)
+
+        if perlu_parse:
+            print(f"  -> Memproses {len(perlu_parse)} file PDF...")
+            paths = [os.path.join(pdf_folder, nama) for nama in perlu_parse]
+            # Parsing terjadi di proses anak, jadi byte yang dibaca dicatat dari sini
+            for path in paths:
+                run_metrics.catat_file(path)
+            workers = max_workers or config.PDF_MAX_WORKERS
+            if workers > 1 and len(perlu_parse) > 1:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    daftar_hasil = run_metrics.petakan(executor, _ekstrak_teks_pdf_aman, paths)
+            else:
+                daftar_hasil = [_ekstrak_teks_pdf_aman(path) for path in paths]
+
+            for nama, (teks, alasan) in zip(perlu_parse, daftar_hasil):
+                if teks is None:
+                    karantina[nama] = alasan
+                    continue
+                hasil_teks[nama] = teks
+                with open(os.path.join(cache_folder, f"{berubah[nama]}.txt"), 'w', encoding='utf-8') as file:
+                    file.write(teks)
+
+        # Validasi: dokumen yang gagal di-parse atau tanpa teks (mis. hasil scan) dikarantina, sisanya tetap dimuat
+        karantina.update({nama: 'teks_kosong' for nama, teks in hasil_teks.items() if not teks.strip()})
+        valid = [nama for nama in berubah if nama not in karantina]
+        df_karantina = pd.DataFrame({
+            'nama_file': list(karantina),
+            'hash_konten': [berubah[nama] for nama in karantina],
+            'alasan': list(karantina.values()),
+        })
+        validasi.simpan_karantina(engine_st, 'dokumen_pdf', df_karantina, kolom_kunci='nama_file', kunci_diproses=list(berubah))
+        if karantina:
+            print(f"  -> ⚠️ {len(karantina)} PDF dikarantina ke '{config.QUARANTINE_PREFIX}dokumen_pdf' ({validasi.ringkas_alasan(df_karantina)}).")
+        if not valid:
+            print("⚠️ Tidak ada dokumen PDF valid untuk dimuat.")
+            return
+
+        # Transformasi: Ubah hasil menjadi DataFrame dan tambahkan timestamp
+        df_pdf = pd.DataFrame({
+            'nama_file': valid,
+            'isi_teks': [hasil_teks[nama] for nama in valid],
+            'hash_konten': [berubah[nama] for nama in valid],
+        })
         df_pdf['tgl_ekstrak'] = datetime.now()
         
-        # Load: Masukkan data ke tabel stg_dokumen_pdf
+        # Load: upsert hanya dokumen baru/berubah ke tabel stg_dokumen_pdf
         target_table_name = 'stg_dokumen_pdf'
         print(f"   -> Memuat {len(df_pdf)} dokumen ke tabel '{target_table_name}'...")
-        
-        # Kita pakai 'replace' untuk staging, agar setiap run hasilnya fresh
-        df_pdf.to_sql(target_table_name, engine_st, if_exists='replace', index=False)
+        _muat_staging_inkremental(engine_st, df_pdf, target_table_name, 'hash_konten')
 
         print(f"✅ SUKSES! ETL untuk PDF selesai.")
 
     except Exception as e:
+        run_metrics.catat_error(e)
         print(f"❌ GAGAL! Terjadi error saat proses ETL PDF: {e}")
+        raise
 
-def etl_txt_to_staging(engine_st):
+def etl_txt_to_staging(engine_st, max_workers=None):
     print("\n--- Memulai ETL TXT dengan ID Pelanggan ---")
     
     txt_folder = os.path.join(config.ORGANIZED_PATH, 'txt')
-    hasil_analisis = []
+    target_table_name = 'stg_analisis_sentimen'
     
     try:
         # Langkah Baru 1: Ambil daftar ID pelanggan asli dari DWH
         print("  -> Mengambil daftar ID pelanggan dari Dim_Pelanggan...")
-        list_id_pelanggan = pd.read_sql_query('SELECT id_pelanggan FROM "Dim_Pelanggan"', engine_st)['id_pelanggan'].tolist()
+        # Dibaca streaming ke array integer ringkas (bukan list objek Python)
+        list_id_pelanggan = database.baca_streaming_df('SELECT id_pelanggan FROM "Dim_Pelanggan"', engine_st)['id_pelanggan'].to_numpy()
         
-        if not list_id_pelanggan:
+        if len(list_id_pelanggan) == 0:
             print("⚠️ GAGAL! Tidak ada data pelanggan di Dim_Pelanggan untuk dijadikan referensi.")
             return
 
         print(f"  -> Ditemukan {len(list_id_pelanggan)} ID pelanggan.")
 
-        # Loop melalui file TXT
+        # Baca semua file TXT sekaligus, lalu pilih yang baru/berubah saja
+        # File yang bukan UTF-8 atau kosong dikarantina, tidak menggagalkan file lain
+        semua_tweet = {}
+        karantina = {}
         for filename in os.listdir(txt_folder):
             if filename.lower().endswith('.txt'):
-                print(f"  -> Menganalisis file: {filename}...")
-                file_path = os.path.join(txt_folder, filename)
-                
-                with open(file_path, 'r', encoding='utf-8') as file:
-                    text = file.read()
-                
-                blob = TextBlob(text)
-                
-                # Langkah Baru 2: Pilih ID pelanggan secara acak dan tempelkan
-                random_customer_id = random.choice(list_id_pelanggan)
-                
-                hasil_analisis.append({
-                    'id_pelanggan': random_customer_id, # <-- KOLOM BARU
-                    'nama_file': filename,
-                    'isi_tweet': text,
-                    'polarity': blob.sentiment.polarity,
-                    'subjectivity': blob.sentiment.subjectivity
-                })
-        
-        # ... (Sisa prosesnya sama)
-        df_txt = pd.DataFrame(hasil_analisis)
+                run_metrics.catat_file(os.path.join(txt_folder, filename))
+                try:
+                    with open(os.path.join(txt_folder, filename), 'r', encoding='utf-8') as file:
+                        teks = file.read()
+                except UnicodeDecodeError as e:
+                    karantina[filename] = f"encoding_tidak_valid: {e.reason}"
+                    continue
+                if teks.strip():
+                    semua_tweet[filename] = teks
+                else:
+                    karantina[filename] = 'teks_kosong'
+
+        hash_staging = _baca_hash_staging(engine_st, target_table_name, 'hash_teks')
+        tweet_baru = {nama: teks for nama, teks in semua_tweet.items() if hash_staging.get(nama) != sentiment_engine.hash_teks(teks)}
+        df_karantina = pd.DataFrame({'nama_file': list(karantina), 'alasan': list(karantina.values())})
+        validasi.simpan_karantina(engine_st, 'analisis_sentimen', df_karantina, kolom_kunci='nama_file',
+                                  kunci_diproses=list(tweet_baru) + list(karantina))
+        print(f"  -> {len(semua_tweet) + len(karantina)} file TXT ditemukan, {len(tweet_baru)} baru/berubah, {len(karantina)} dikarantina.")
+        if not tweet_baru:
+            print(f"✅ SUKSES! Semua tweet sudah ada di staging.")
+            return
+
+        # Skoring batch (dengan cache per hash teks) di worker pool
+        daftar_teks = list(tweet_baru.values())
+        daftar_skor = sentiment_engine.skor_sentimen(engine_st, daftar_teks, max_workers=max_workers)
+
+        df_txt = pd.DataFrame({
+            # Langkah Baru 2: Pilih ID pelanggan secara acak dan tempelkan
+            'id_pelanggan': [random.choice(list_id_pelanggan) for _ in daftar_teks], # <-- KOLOM BARU
+            'nama_file': list(tweet_baru),
+            'isi_tweet': daftar_teks,
+            'polarity': [skor[0] for skor in daftar_skor],
+            'subjectivity': [skor[1] for skor in daftar_skor],
+            'hash_teks': [sentiment_engine.hash_teks(teks) for teks in daftar_teks],
+        })
         df_txt['tgl_ekstrak'] = datetime.now()
         
-        target_table_name = 'stg_analisis_sentimen'
-        
-        # Kita perlu pastikan tabelnya bisa menampung kolom baru
-        # Cara paling aman adalah dengan 'replace' karena ini tabel staging
+        # Tambahkan hanya hasil baru (append inkremental, bukan replace seluruh tabel)
         print(f"   -> Memuat {len(df_txt)} hasil analisis ke tabel '{target_table_name}'...")
-        df_txt.to_sql(target_table_name, engine_st, if_exists='replace', index=False)
+        # Frekuensi kata untuk word cloud ikut diperbarui dari delta tweet, di transaksi yang sama
+        # Salinan append-only di zona curated untuk laporan mode lake (DuckDB) ditulis sebelum commit,
+        # supaya tweet yang sudah ada di staging tidak pernah hilang dari lake
+        _muat_staging_inkremental(engine_st, df_txt, target_table_name, 'hash_teks', sebelum_ganti=frekuensi_kata.terapkan_delta_tweet,
+                                  sebelum_commit=partial(lake_storage.tulis_batch, 'sentimen'))
 
         print(f"✅ SUKSES! ETL untuk TXT dengan ID pelanggan selesai.")
 
     except Exception as e:
+        run_metrics.catat_error(e)
         print(f"❌ GAGAL! Terjadi error saat proses ETL TXT: {e}")
+        raise
         
-def etl_fakta_penjualan(engine_st):
-    print("\n--- Memulai ETL Fakta_Penjualan (Versi Final & Robust) ---")
-    
+# --- Fakta_Penjualan: transformasi & load paralel per potongan ---
+# Tabel muat bersama: setiap proses worker COPY potongannya ke sini lewat koneksinya sendiri,
+# lalu satu transaksi terakhir memindahkannya ke Fakta_Penjualan (bersama rollup, Dim_Waktu & watermark).
+TABEL_MUAT_FAKTA = '_fakta_muat'
+_KOLOM_FAKTA = ['id_order_detail', 'id_order', 'pelanggan_key', 'id_produk', 'id_waktu', 'id_lokasi',
+                'jumlah_barang', 'harga_satuan', 'total_harga']
+# urutan = posisi baris di sumber (untuk memilih baris terakhir jika id_order_detail dobel antar-potongan);
+# id_pelanggan & tanggal_order hanya dibawa untuk mencatat baris dobel itu ke tabel reject
+_KOLOM_MUAT = ['urutan'] + _KOLOM_FAKTA + ['id_pelanggan', 'tanggal_order']
+_KOLOM_REJECT = config.PENJUALAN_COLS + ['id_waktu', 'alasan', 'tgl_reject']
+
+def _pastikan_tabel_reject(connection):
+    connection.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {config.REJECT_FAKTA_TABLE} (
+            id_order BIGINT, id_order_detail BIGINT, tanggal_order TIMESTAMP, id_pelanggan BIGINT, id_produk BIGINT,
+            jumlah_barang BIGINT, harga_satuan NUMERIC, total_harga NUMERIC, id_waktu INTEGER,
+            alasan TEXT, tgl_reject TIMESTAMP
+        )
+    """))
+
+def _siapkan_tabel_muat(engine_st):
+    # UNLOGGED: isi tabel ini sementara, jadi tidak perlu ditulis ke WAL
+    with engine_st.begin() as connection:
+        connection.execute(text(f"DROP TABLE IF EXISTS {TABEL_MUAT_FAKTA}"))
+        connection.execute(text(f"""
+            CREATE UNLOGGED TABLE {TABEL_MUAT_FAKTA} (
+                urutan BIGINT, id_order_detail BIGINT, id_order BIGINT, pelanggan_key INTEGER, id_produk INTEGER,
+                id_waktu INTEGER, id_lokasi INTEGER, jumlah_barang INTEGER, harga_satuan NUMERIC, total_harga NUMERIC,
+                id_pelanggan INTEGER, tanggal_order TIMESTAMP
+            )
+        """))
+
+def _hapus_tabel_muat(engine_st):
+    """Membuang tabel muat di semua jalur keluar (tanpa data baru, gagal); error-nya tidak menutupi error tahap."""
     try:
-        # --- EXTRACT ---
-        print("   -> [E] Mengekstrak data penjualan mentah...")
-        df_penjualan = pd.read_csv(os.path.join(config.ORGANIZED_PATH, 'csv', 'raw_penjualan.csv'), sep=',', header=None, skiprows=1, names=config.PENJUALAN_COLS)
-        
-        print("   -> [E] Mengekstrak dimensi AKTIF dari DWH...")
-        # KUNCI UTAMA: Kita hanya ambil data pelanggan yang statusnya saat ini aktif
-        df_dim_pelanggan_aktif = pd.read_sql_query('SELECT pelanggan_key, id_pelanggan, kota_asal FROM "Dim_Pelanggan" WHERE status_sekarang = TRUE', engine_st)
-        df_dim_lokasi = pd.read_sql_table('Dim_Lokasi', engine_st)
-        
-        # --- TRANSFORM ---
-        print("   -> [T] Melakukan transformasi dan penggabungan data...")
-        
-        # 1. Buat id_waktu dari tanggal_order
-        df_penjualan['tanggal_order'] = pd.to_datetime(df_penjualan['tanggal_order'])
-        df_penjualan['id_waktu'] = df_penjualan['tanggal_order'].dt.strftime('%Y%m%d').astype(int)
+        with engine_st.begin() as connection:
+            connection.execute(text(f"DROP TABLE IF EXISTS {TABEL_MUAT_FAKTA}"))
+    except Exception as e:
+        print(f"   -> ⚠️ Gagal menghapus tabel muat {TABEL_MUAT_FAKTA}: {e}")
 
-        # 2. Gabungkan penjualan dengan pelanggan AKTIF untuk mendapatkan pelanggan_key dan kota_asal
-        # Kita pakai INNER JOIN untuk memastikan hanya penjualan dari pelanggan yang terdaftar di DWH yang masuk
-        df_merged = pd.merge(df_penjualan, df_dim_pelanggan_aktif, on='id_pelanggan', how='inner')
-        
-        # 3. Gabungkan dengan Dim_Lokasi untuk mendapatkan id_lokasi
-        df_final = pd.merge(df_merged, df_dim_lokasi, left_on='kota_asal', right_on='nama_kota', how='left')
-
-        # 4. Pilih kolom final sesuai struktur tabel Fakta_Penjualan yang baru
-        kolom_final = [
-            'id_order_detail', 
-            'id_order', 
-            'pelanggan_key', # <-- Ini kunci surrogate kita
-            'id_produk', 
-            'id_waktu', 
-            'id_lokasi', 
-            'jumlah_barang', 
-            'harga_satuan', 
-            'total_harga'
-        ]
-        df_final = df_final[kolom_final].copy()
-        
-        # 5. Jaring pengaman duplikat terakhir
-        df_final.drop_duplicates(subset=['id_order_detail'], keep='first', inplace=True)
-
-        # --- LOAD ---
-        print(f"   -> [L] Memuat {len(df_final)} baris data ke Fakta_Penjualan...")
-        if len(df_final) > 0:
-            df_final.to_sql('Fakta_Penjualan', engine_st, if_exists='append', index=False, chunksize=1000)
-            print("\n✅ Proses ETL untuk Fakta_Penjualan selesai!")
-        else:
-            print("\n⚠️ Tidak ada data yang valid untuk dimuat ke Fakta_Penjualan.")
+_peta_worker = None
+_nama_db_worker = None
+
+def _inisialisasi_worker_fakta(peta, nama_db):
+    """Initializer process pool: peta kunci dikirim sekali per proses, bukan per potongan."""
+    global _peta_worker, _nama_db_worker
+    _peta_worker, _nama_db_worker = peta, nama_db
+
+def _proses_potongan_fakta(df):
+    """
+    Transformasi + load satu potongan penjualan di proses worker (level modul supaya bisa di-pickle).
+    Baris valid di-COPY ke TABEL_MUAT_FAKTA lewat koneksi milik proses ini;
+    mengembalikan (jumlah baris valid, df_reject) ke proses induk.
+    """
+    df['id_waktu'] = hitung_id_waktu(df['tanggal_order'])
+    df_valid, df_reject = _peta_worker.resolusi(df)
+    df_valid['urutan'] = df_valid.index
+    if len(df_valid) > 0:
+        with database.get_engine(_nama_db_worker).begin() as connection:
+            database.bulk_load(df_valid[_KOLOM_MUAT], TABEL_MUAT_FAKTA, connection)
+    return len(df_valid), df_reject
+
+def _potongan_penjualan(engine_st, full_rebuild):
+    """
+    Generator potongan penjualan yang perlu dimuat, dengan index = posisi baris di sumber.
+    Mode inkremental hanya menghasilkan baris di atas high-water mark.
+    """
+    filters, wm_tanggal, wm_id = None, None, None
+    if not full_rebuild:
+        # Hari watermark ikut diproses ulang supaya koreksi di hari yang sama tetap terbawa (upsert aman diulang).
+        wm_tanggal, wm_id = baca_watermark(engine_st, 'Fakta_Penjualan')
+        if wm_tanggal is not None:
+            # Partisi bulan sebelum watermark tidak dibaca sama sekali (kecuali id baru yang terlambat masuk)
+            filters = lake_storage.filter_sejak_tanggal(wm_tanggal) + [[('id_order_detail', '>', wm_id)]]
+            print(f"   -> [E] Watermark {wm_tanggal} / id {wm_id}: hanya baris baru/berubah yang diproses.")
+
+    posisi = 0
+    for df in lake_storage.baca_dataset_per_potongan('penjualan', columns=config.PENJUALAN_COLS, filters=filters,
+                                                     ukuran=config.FAKTA_CHUNKSIZE):
+        df.index = pd.RangeIndex(posisi, posisi + len(df))
+        posisi += len(df)
+        if wm_tanggal is not None:
+            df = df[(df['tanggal_order'] >= pd.Timestamp(wm_tanggal)) | (df['id_order_detail'] > wm_id)]
+        if not df.empty:
+            yield df
+
+def _muat_partisi_fakta(connection, full_rebuild):
+    """
+    Memindahkan isi TABEL_MUAT_FAKTA ke Fakta_Penjualan yang dipartisi per bulan (lihat partisi_fakta).
+    Bulan yang dimuat ulang penuh (full rebuild) dan bulan yang belum punya partisi dimuat lewat
+    partition swap: tabel baru tanpa indeks diisi, indeks dibangun setelahnya saat ATTACH.
+    Bulan lain (delta inkremental kecil ke partisi yang sudah ada) di-upsert dengan indeks aktif.
+    Sketsa laporan perkiraan (lihat sketsa) dibangun ulang untuk setiap bulan yang isinya berubah.
+    Mengembalikan jumlah baris fakta yang ditulis.
+    """
+    if partisi_fakta.pastikan_terpartisi(connection):
+        print(f"   -> [L] Fakta_Penjualan sekarang dipartisi per bulan ({len(partisi_fakta.daftar_partisi(connection))} partisi).")
+    partisi_fakta.pastikan_indeks(connection)
+    sketsa_baru = sketsa.pastikan_tabel_sketsa(connection)
+    ada = partisi_fakta.daftar_partisi(connection)
+
+    # Baris di bulan yang sudah lewat jendela retensi tidak dibuatkan partisi (yang akan langsung
+    # dipensiunkan lagi dan bertabrakan dengan arsipnya), tapi dicatat ke tabel reject
+    bulan_terbaru = max([connection.execute(text(f"SELECT MAX(id_waktu) / 100 FROM {TABEL_MUAT_FAKTA}")).scalar() or 0, *ada])
+    tertua = partisi_fakta.bulan_tertua_disimpan(bulan_terbaru) if bulan_terbaru else None
+    if tertua:
+        di_luar_retensi = connection.execute(text(f"""
+            WITH lama AS (DELETE FROM {TABEL_MUAT_FAKTA} WHERE id_waktu < :batas RETURNING *)
+            INSERT INTO {config.REJECT_FAKTA_TABLE} ({', '.join(_KOLOM_REJECT)})
+            SELECT {', '.join(config.PENJUALAN_COLS)}, id_waktu, 'di_luar_retensi', :tgl_reject FROM lama
+        """), {'batas': tertua * 100, 'tgl_reject': datetime.now()}).rowcount
+        if di_luar_retensi:
+            print(f"   -> [T] ⚠️ {di_luar_retensi} baris sebelum bulan {tertua} (di luar retensi) ditolak -> {config.REJECT_FAKTA_TABLE}")
+
+    rows = connection.execute(text(f"SELECT DISTINCT id_waktu / 100 FROM {TABEL_MUAT_FAKTA}")).fetchall()
+    bulan_muat = sorted(row[0] for row in rows)
+    ditukar = bulan_muat if full_rebuild else [b for b in bulan_muat if b not in ada]
+    langsung = [b for b in bulan_muat if b not in ditukar]
+
+    # Rollup laporan di-merge dari delta ini (harus sebelum fakta ditulis, lihat aggregates.terapkan_delta).
+    # Baris lama di partisi yang akan ditukar tapi tidak ada di delta ikut hilang bersama partisinya,
+    # jadi kontribusinya juga dikeluarkan dari rollup.
+    aggregates.terapkan_delta_tabel(connection, TABEL_MUAT_FAKTA)
+    for bulan in (b for b in ditukar if b in ada):
+        aggregates.keluarkan_dari_agregat(connection, f"""
+            SELECT f.* FROM "{ada[bulan]}" f
+            WHERE NOT EXISTS (SELECT 1 FROM {TABEL_MUAT_FAKTA} s WHERE s.id_order_detail = f.id_order_detail)
+        """)
+
+    # Upsert pada id_order_detail: versi lama dihapus di partisi mana pun (tanggalnya bisa pindah bulan),
+    # karena primary key tabel terpartisi wajib memuat id_waktu sehingga ON CONFLICT (id_order_detail) tidak bisa dipakai
+    rows = connection.execute(text(f"""
+        WITH hapus AS (
+            DELETE FROM "Fakta_Penjualan" f USING {TABEL_MUAT_FAKTA} s WHERE f.id_order_detail = s.id_order_detail
+            RETURNING f.id_waktu / 100 AS bulan
+        )
+        SELECT DISTINCT bulan FROM hapus
+    """)).fetchall()
+    bulan_hapus = [row[0] for row in rows]
+    jumlah = 0
+    if langsung:
+        kolom = ', '.join(f'"{k}"' for k in _KOLOM_FAKTA)
+        jumlah += connection.execute(text(f"""
+            INSERT INTO "Fakta_Penjualan" ({kolom})
+            SELECT {kolom} FROM {TABEL_MUAT_FAKTA} WHERE id_waktu / 100 = ANY(:bulan)
+        """), {'bulan': langsung}).rowcount
+    for bulan in ditukar:
+        jumlah += partisi_fakta.tukar_partisi(connection, TABEL_MUAT_FAKTA, bulan, _KOLOM_FAKTA)
+    if ditukar:
+        print(f"   -> [L] {len(ditukar)} partisi bulan dimuat lewat partition swap, {len(langsung)} partisi di-upsert langsung.")
+
+    # Statistik planner disegarkan untuk partisi yang berubah (dan tabel induk setelah muat ulang penuh)
+    ada = partisi_fakta.daftar_partisi(connection)
+    partisi_fakta.perbarui_statistik(connection, [ada[b] for b in bulan_muat] + (['Fakta_Penjualan'] if full_rebuild else []))
+
+    dipensiunkan = partisi_fakta.pensiunkan_partisi(connection)
+    if dipensiunkan:
+        print(f"   -> [L] {len(dipensiunkan)} partisi lama dipensiunkan ({config.FAKTA_RETENSI_AKSI}): {', '.join(dipensiunkan)}")
+
+    # Sketsa: bulan yang dimuat, bulan asal baris yang dikoreksi, dan bulan dengan parameter sketsa lama
+    # (semua bulan jika tabel sketsa baru dibuat di atas fakta yang sudah ada)
+    bulan_sketsa = set(bulan_muat) | set(bulan_hapus) | set(sketsa.bulan_basi(connection))
+    if sketsa_baru:
+        bulan_sketsa |= set(partisi_fakta.daftar_partisi(connection))
+    jumlah_sketsa = sketsa.bangun_ulang_bulan(connection, bulan_sketsa)
+    print(f"   -> [L] Sketsa: {len(bulan_sketsa)} bulan dibangun ulang ({jumlah_sketsa} sketsa lokasi x kategori).")
+    return jumlah
+
+def etl_fakta_penjualan(engine_st, full_rebuild=True, max_workers=None):
+    """
+    ETL Fakta_Penjualan sebagai pipeline streaming: sumber dibaca per potongan (config.FAKTA_CHUNKSIZE),
+    setiap potongan ditransformasi & di-COPY oleh process pool dengan koneksi DB masing-masing,
+    lalu satu transaksi akhir memindahkan hasilnya ke Fakta_Penjualan. Memori puncak dibatasi oleh
+    jumlah potongan yang sedang diproses, bukan ukuran sumber. Dim_Waktu dibangun/diperluas dari
+    rentang tanggal yang dikumpulkan di pass yang sama.
+    """
+    print("\n--- Memulai ETL Fakta_Penjualan (Streaming & Paralel) ---")
+    
+    # Tabel muat bersama & watermark hanya boleh dipakai satu run sekaligus (mis. `etl` dan `watch`
+    # yang berjalan bersamaan): run kedua menunggu kunci ini, jadi tidak saling menghapus tabel muat
+    with database.kunci_eksklusif(engine_st, TABEL_MUAT_FAKTA):
+        try:
+            # KUNCI UTAMA: hanya pelanggan yang statusnya saat ini aktif. Peta kunci (array terurut)
+            # di-cache antar-run dan hanya disegarkan dari delta dimensi.
+            peta = kunci_dimensi.dapatkan_peta(engine_st, muat_ulang=full_rebuild)
+            _siapkan_tabel_muat(engine_st)
+
+            # --- EXTRACT + TRANSFORM + LOAD per potongan ---
+            workers = max_workers or config.FAKTA_MAX_WORKERS
+            print(f"   -> [E/T/L] Memproses potongan penjualan dengan {workers} worker...")
+            jumlah_sumber, jumlah_valid, daftar_reject = 0, 0, []
+            tanggal_min = tanggal_max = id_max = None
+            with ProcessPoolExecutor(max_workers=workers, initializer=_inisialisasi_worker_fakta,
+                                     initargs=(peta, engine_st.url.database)) as executor:
+                berjalan = set()
+
+                def kumpulkan(selesai):
+                    nonlocal jumlah_valid
+                    for future in selesai:
+                        valid, df_reject = future.result()
+                        jumlah_valid += valid
+                        if not df_reject.empty:
+                            daftar_reject.append(df_reject)
+
+                for df in _potongan_penjualan(engine_st, full_rebuild):
+                    # Rentang tanggal & id terbesar dikumpulkan di pass yang sama (untuk Dim_Waktu & watermark)
+                    jumlah_sumber += len(df)
+                    t_min, t_max, i_max = df['tanggal_order'].min(), df['tanggal_order'].max(), int(df['id_order_detail'].max())
+                    tanggal_min = t_min if tanggal_min is None else min(tanggal_min, t_min)
+                    tanggal_max = t_max if tanggal_max is None else max(tanggal_max, t_max)
+                    id_max = i_max if id_max is None else max(id_max, i_max)
+
+                    # Paling banyak 2 potongan per worker yang sedang diproses -> memori tetap terbatas
+                    if len(berjalan) >= workers * 2:
+                        selesai, berjalan = wait(berjalan, return_when=FIRST_COMPLETED)
+                        kumpulkan(selesai)
+                    berjalan.add(run_metrics.kirim(executor, _proses_potongan_fakta, df))
+                kumpulkan(wait(berjalan).done)
+
+            if jumlah_sumber == 0:
+                print("\n✅ Tidak ada data penjualan baru sejak run terakhir.")
+                return
+
+            df_reject = pd.concat(daftar_reject) if daftar_reject else pd.DataFrame(columns=_KOLOM_REJECT)
+            if not df_reject.empty:
+                # Baris yang pelanggan/produknya tidak dikenal atau id_order_detail-nya dobel tidak
+                # hilang diam-diam, tapi dicatat ke tabel reject beserta alasannya.
+                ringkasan = ', '.join(f"{alasan}: {jumlah}" for alasan, jumlah in df_reject['alasan'].value_counts().items())
+                print(f"   -> [T] ⚠️ {len(df_reject)} baris ditolak ({ringkasan}) -> {config.REJECT_FAKTA_TABLE}")
+            df_reject['tgl_reject'] = datetime.now()
+
+            # --- LOAD (satu transaksi: reject, Dim_Waktu, rollup, fakta, watermark) ---
+            print(f"   -> [L] Memindahkan {jumlah_valid} baris dari {TABEL_MUAT_FAKTA} ke Fakta_Penjualan...")
+            with engine_st.begin() as connection:
+                _pastikan_tabel_reject(connection)
+                database.bulk_load(df_reject[_KOLOM_REJECT], config.REJECT_FAKTA_TABLE, connection)
+
+                # id_order_detail yang muncul di lebih dari satu potongan: baris terakhir di sumber yang dipakai
+                connection.execute(text(f"CREATE INDEX ON {TABEL_MUAT_FAKTA} (id_order_detail, urutan)"))
+                dobel = connection.execute(text(f"""
+                    WITH dobel AS (
+                        DELETE FROM {TABEL_MUAT_FAKTA} s USING {TABEL_MUAT_FAKTA} t
+                        WHERE t.id_order_detail = s.id_order_detail AND t.urutan > s.urutan
+                        RETURNING s.*
+                    )
+                    INSERT INTO {config.REJECT_FAKTA_TABLE} ({', '.join(_KOLOM_REJECT)})
+                    SELECT {', '.join(config.PENJUALAN_COLS)}, id_waktu, 'duplikat_id_order_detail', :tgl_reject FROM dobel
+                """), {'tgl_reject': datetime.now()}).rowcount
+                if dobel:
+                    print(f"   -> [T] ⚠️ {dobel} baris dobel antar-potongan ditolak -> {config.REJECT_FAKTA_TABLE}")
+
+                jumlah_tanggal = muat_dim_waktu(connection, tanggal_min, tanggal_max, full_rebuild)
+                print(f"   -> [L] Dim_Waktu: {jumlah_tanggal} tanggal dimuat ({tanggal_min:%Y-%m-%d} s/d {tanggal_max:%Y-%m-%d}).")
+
+                jumlah = _muat_partisi_fakta(connection, full_rebuild)
+                run_metrics.catat_tulis(jumlah)
+                connection.execute(text(f"DROP TABLE IF EXISTS {TABEL_MUAT_FAKTA}"))
+                database.tandai_tabel_berubah(connection, 'Fakta_Penjualan', *aggregates.TABEL_AGREGAT, sketsa.TABEL_SKETSA)
+                # Watermark disimpan di transaksi yang sama, jadi tidak pernah maju tanpa datanya
+                simpan_watermark(connection, 'Fakta_Penjualan', tanggal_max.date(), id_max)
+
+            if jumlah > 0:
+                print("\n✅ Proses ETL untuk Fakta_Penjualan selesai!")
+            else:
+                print("\n⚠️ Tidak ada data yang valid untuk dimuat ke Fakta_Penjualan.")
             
-    except Exception as e:
-        print(f"❌ GAGAL! Terjadi error saat ETL Fakta Penjualan: {e}")
+        except Exception as e:
+            run_metrics.catat_error(e)
+            print(f"❌ GAGAL! Terjadi error saat ETL Fakta Penjualan: {e}")
+            raise
+        finally:
+            # Jalur sukses sudah membuangnya di transaksi load; ini untuk jalur 'tidak ada data baru' & gagal
+            _hapus_tabel_muat(engine_st)
 
 # Kita juga bisa buat satu fungsi utama di sini untuk menjalankan semuanya
-def run_all_etl(engine_st):
-    """Fungsi untuk menjalankan semua tugas ETL secara berurutan."""
+def bangun_dag_etl(engine_st, full_rebuild=False):
+    """
+    Mendefinisikan tahapan ETL beserta dependensinya.
+    Dimensi produk/lokasi/pelanggan (dibaca dari zona curated) dan staging PDF saling independen;
+    TXT butuh Dim_Pelanggan & Dim_Lokasi, fakta butuh semua dimensi (foreign key).
+    Dim_Waktu dimuat oleh tahap fakta sendiri, dari rentang tanggal di pass yang sama.
+    """
+    # Semua tahap menunggu sortir file (dan reset tabel jika full rebuild)
+    awal = ['reset'] if full_rebuild else ['sortir']
+    tahapan = {
+        'sortir': (sortir_file_mentah, []),
+        'curated': (partial(lake_storage.konversi_semua_ke_parquet, engine_st), awal),
+        'dim_produk': (partial(etl_dim_produk, engine_st, full_rebuild), ['curated']),
+        'dim_pelanggan': (partial(etl_dim_pelanggan_scd2, engine_st), ['curated']),
+        'dim_lokasi': (partial(etl_dim_lokasi, engine_st, full_rebuild), ['curated']),
+        'pdf': (partial(etl_pdf_to_staging, engine_st), awal),
+        'txt': (partial(etl_txt_to_staging, engine_st), ['dim_pelanggan', 'dim_lokasi']),
+        'fakta': (partial(etl_fakta_penjualan, engine_st, full_rebuild), ['dim_pelanggan', 'dim_lokasi', 'dim_produk']),
+    }
+    if full_rebuild:
+        tahapan['reset'] = (partial(reset_all_tables, engine_st), ['sortir'])
+    return tahapan
+
+def _sidik_tahap(engine_st, nama):
+    """
+    Input tahap ETL (plus tabel yang ditulisnya) untuk checkpoint --resume: tahap yang sudah sukses
+    dilewati hanya jika nilai ini sama dengan saat tahap itu selesai.
+    """
+    versi = lambda *tabel: database.baca_versi_tabel(engine_st, tabel)
+    folder = lambda tipe: checkpoint.sidik_folder(os.path.join(config.ORGANIZED_PATH, tipe))
+    if nama == 'sortir':
+        return checkpoint.sidik_folder(config.RAW_DATA_PATH)
+    if nama == 'reset':
+        # Cukup sekali per rantai run: --resume --full-rebuild melanjutkan rebuild yang sama, jadi reset
+        # yang sudah sukses tidak mengosongkan lagi hasil tahap lain (kecuali sortir dijalankan ulang)
+        return ['full_rebuild']
+    if nama == 'curated':
+        return [folder('csv')] + [lake_storage.sidik_dataset(dataset) for dataset in config.DATASET_LAKE]
+    if nama == 'dim_produk':
+        return [lake_storage.sidik_dataset('produk'), versi('Dim_Produk')]
+    if nama == 'dim_pelanggan':
+        return [lake_storage.sidik_dataset('pelanggan'), versi('Dim_Pelanggan')]
+    if nama == 'dim_lokasi':
+        return [lake_storage.sidik_dataset('pelanggan'), versi('Dim_Lokasi')]
+    if nama == 'pdf':
+        return [folder('pdf'), versi('stg_dokumen_pdf')]
+    if nama == 'txt':
+        return [folder('txt'), versi('Dim_Pelanggan', 'stg_analisis_sentimen')]
+    if nama == 'fakta':
+        return [lake_storage.sidik_dataset('penjualan'), versi('Dim_Pelanggan', 'Dim_Lokasi', 'Dim_Produk', 'Fakta_Penjualan')]
+    raise ValueError(f"Tahap ETL tidak dikenal: {nama}")
+
+def run_all_etl(engine_st, full_rebuild=False, max_workers=None, hanya=None, engine_metrik=None, resume=False):
+    """
+    Fungsi untuk menjalankan semua tugas ETL sebagai DAG paralel.
+    Default-nya inkremental (berbasis watermark); full_rebuild=True mengosongkan
+    semua tabel lalu memuat ulang dari nol seperti sebelumnya.
+    hanya=['fakta', ...] -> jalankan tahap-tahap itu saja; dependensi di luar pilihan
+    dianggap sudah terpenuhi dari run sebelumnya.
+    Setiap tahap mengambil koneksinya sendiri dari pool engine.
+    Metrik tiap tahap disimpan ke file JSON dan ke tabel config.RUN_METRICS_TABLE di engine_metrik (jika ada).
+    Status tiap tahap dicatat di config.RUN_STATE_TABLE; resume=True melewati tahap yang sudah sukses
+    di run sebelumnya (dan inputnya tidak berubah), jadi run dilanjutkan dari tahap yang gagal.
+    Bersama full_rebuild, reset yang sudah sukses di rantai run yang sama juga dilewati.
+    """
     print("\n\n===== MEMULAI PIPELINE ETL LENGKAP =====")
-    sortir_file_mentah() # Sesuaikan fungsi ini agar menggunakan path dari config
-    reset_all_tables(engine_st)
-    etl_dim_produk(engine_st)
-    etl_dim_waktu(engine_st)
-    etl_dim_pelanggan_scd2(engine_st) 
-    etl_dim_lokasi(engine_st)
-    etl_pdf_to_staging(engine_st)
-    etl_txt_to_staging(engine_st)
-    etl_fakta_penjualan(engine_st)
-    print("\n\n===== PIPELINE ETL SELESAI DENGAN SUKSES! =====")
\ No newline at end of file
+    print(f"   -> Mode: {'FULL REBUILD' if full_rebuild else 'INKREMENTAL'}")
+    tahapan = bangun_dag_etl(engine_st, full_rebuild)
+    if hanya:
+        tidak_dikenal = set(hanya) - set(tahapan)
+        if tidak_dikenal:
+            raise ValueError(f"Tahap ETL tidak dikenal: {', '.join(sorted(tidak_dikenal))}. Pilihan: {', '.join(tahapan)}")
+        tahapan = {nama: (fungsi, [dep for dep in deps if dep in hanya]) for nama, (fungsi, deps) in tahapan.items() if nama in hanya}
+        print(f"   -> Hanya tahap: {', '.join(tahapan)}")
+    database.pastikan_tabel_versi(engine_st)
+    id_run = run_metrics.mulai_run('etl')
+    status_run = checkpoint.Checkpoint(engine_st, 'etl', id_run, resume=resume)
+    tahapan = {nama: (status_run.bungkus(nama, run_metrics.instrumentasi(nama, 'etl')(fungsi), partial(_sidik_tahap, engine_st, nama), deps), deps)
+               for nama, (fungsi, deps) in tahapan.items()}
+    status = scheduler.jalankan_dag(tahapan, max_workers or config.ETL_MAX_WORKERS)
+    run_metrics.simpan_run(engine_metrik)
+    if all(s == scheduler.SUKSES for s in status.values()):
+        print("\n\n===== PIPELINE ETL SELESAI DENGAN SUKSES! =====")
+    else:
+        print("\n\n===== PIPELINE ETL SELESAI DENGAN KEGAGALAN SEBAGIAN =====")
+    return status
\ No newline at end of file
@@ -0,0 +1,124 @@
+import re
+from collections import Counter
+import pandas as pd
+from sqlalchemy import text, inspect as sa_inspect
+import config
+import database
+
+# Tabel frekuensi kata untuk laporan word cloud, dipelihara inkremental saat tweet di-ingest.
+# Laporan cukup membaca kata teratas dari tabel ini, jadi biayanya sebanding dengan ukuran
+# kosakata, bukan ukuran korpus. Stopword difilter saat laporan dibaca, sehingga daftar
+# stopword bisa diubah tanpa menghitung ulang tabel.
+
+TABEL_FREKUENSI = 'agg_frekuensi_kata'
+_DDL = f"""
+    CREATE TABLE IF NOT EXISTS {TABEL_FREKUENSI} (
+        kata TEXT PRIMARY KEY,
+        frekuensi BIGINT NOT NULL DEFAULT 0,
+        jumlah_dokumen BIGINT NOT NULL DEFAULT 0
+    )
+"""
+
+# Pola token sama dengan regexp default WordCloud (minimal dua karakter)
+_POLA_TOKEN = re.compile(r"\w[\w']+")
+
+def tokenisasi(teks):
+    """Memecah satu teks menjadi token huruf kecil (generator, tanpa menyalin seluruh korpus); angka murni dibuang."""
+    for cocok in _POLA_TOKEN.finditer(teks.lower()):
+        kata = cocok.group(0)
+        if not kata.isdigit():
+            yield kata
+
+def hitung_frekuensi(daftar_teks, tanda=1, frekuensi=None, dokumen=None):
+    """Menambahkan (tanda=1) atau mengurangkan (tanda=-1) kontribusi teks ke Counter frekuensi & dokumen."""
+    frekuensi = Counter() if frekuensi is None else frekuensi
+    dokumen = Counter() if dokumen is None else dokumen
+    for teks in daftar_teks:
+        if not isinstance(teks, str):
+            continue
+        token = Counter(tokenisasi(teks))
+        for kata, jumlah in token.items():
+            frekuensi[kata] += tanda * jumlah
+            dokumen[kata] += tanda
+    return frekuensi, dokumen
+
+def baca_stopwords(path=None):
+    """Daftar stopword (satu kata per baris, '#' untuk komentar) dari config.STOPWORDS_FILE."""
+    path = path or config.STOPWORDS_FILE
+    with open(path, 'r', encoding='utf-8') as file:
+        return sorted({baris.split('#', 1)[0].strip().lower() for baris in file} - {''})
+
+def pastikan_tabel_frekuensi(connection):
+    """Membuat tabel frekuensi jika belum ada. Mengembalikan True jika tabelnya baru dibuat."""
+    if sa_inspect(connection).has_table(TABEL_FREKUENSI):
+        return False
+    connection.execute(text(_DDL))
+    return True
+
+def _gabungkan(connection, frekuensi, dokumen):
+    """Merge delta {kata: +/-n} ke tabel frekuensi lalu buang kata yang frekuensinya habis."""
+    delta = [(kata, jumlah, dokumen[kata]) for kata, jumlah in frekuensi.items() if jumlah or dokumen[kata]]
+    if not delta:
+        return 0
+    tabel_delta = '_frek_delta'
+    database.bulk_load(pd.DataFrame(delta, columns=['kata', 'frekuensi', 'jumlah_dokumen']), tabel_delta, connection, if_exists='replace')
+    connection.execute(text(f"""
+        INSERT INTO {TABEL_FREKUENSI} (kata, frekuensi, jumlah_dokumen)
+        SELECT kata, frekuensi, jumlah_dokumen FROM {tabel_delta}
+        ON CONFLICT (kata) DO UPDATE SET
+            frekuensi = {TABEL_FREKUENSI}.frekuensi + EXCLUDED.frekuensi,
+            jumlah_dokumen = {TABEL_FREKUENSI}.jumlah_dokumen + EXCLUDED.jumlah_dokumen
+    """))
+    connection.execute(text(f"DELETE FROM {TABEL_FREKUENSI} WHERE frekuensi <= 0"))
+    connection.execute(text(f"DROP TABLE IF EXISTS {tabel_delta}"))
+    return len(delta)
+
+def bangun_ulang_frekuensi(connection, tabel_sumber='stg_analisis_sentimen', chunksize=None):
+    """Menghitung ulang tabel frekuensi dari nol dengan membaca tweet staging per potongan (server-side cursor)."""
+    pastikan_tabel_frekuensi(connection)
+    connection.execute(text(f"TRUNCATE TABLE {TABEL_FREKUENSI}"))
+    if not sa_inspect(connection).has_table(tabel_sumber):
+        return
+    chunksize = chunksize or config.STREAM_CHUNKSIZE
+    frekuensi, dokumen = Counter(), Counter()
+    result = connection.execution_options(stream_results=True, max_row_buffer=chunksize).execute(text(f"SELECT isi_tweet FROM {tabel_sumber}"))
+    while True:
+        rows = result.fetchmany(chunksize)
+        if not rows:
+            break
+        hitung_frekuensi((row[0] for row in rows), 1, frekuensi, dokumen)
+    _gabungkan(connection, frekuensi, dokumen)
+    print(f"   -> ✅ Tabel {TABEL_FREKUENSI} dibangun ulang dari {tabel_sumber} ({len(frekuensi)} kata).")
+
+def terapkan_delta_tweet(connection, df_baru, tabel_sumber='stg_analisis_sentimen'):
+    """
+    Memperbarui frekuensi untuk batch tweet baru/berubah.
+    WAJIB dipanggil di transaksi load, SEBELUM baris lama (nama_file sama) dihapus dari staging:
+    teks versi lama dikurangkan, teks baru ditambahkan.
+    """
+    if pastikan_tabel_frekuensi(connection):
+        # Tabel baru dibuat sementara staging mungkin sudah berisi -> isi dulu dari staging
+        bangun_ulang_frekuensi(connection, tabel_sumber)
+
+    frekuensi, dokumen = hitung_frekuensi(df_baru['isi_tweet'])
+    if sa_inspect(connection).has_table(tabel_sumber):
+        rows = connection.execute(text(f"SELECT isi_tweet FROM {tabel_sumber} WHERE nama_file = ANY(:nama_file)"),
+                                  {'nama_file': df_baru['nama_file'].tolist()})
+        hitung_frekuensi((row[0] for row in rows), -1, frekuensi, dokumen)
+    jumlah = _gabungkan(connection, frekuensi, dokumen)
+    database.tandai_tabel_berubah(connection, TABEL_FREKUENSI)
+    return jumlah
+
+def kata_teratas(engine, stopwords, batas=None):
+    """{kata: frekuensi} untuk kata teratas di luar stopword, siap untuk WordCloud.generate_from_frequencies."""
+    batas = batas or config.WORDCLOUD_MAX_KATA
+    with engine.begin() as connection:
+        if pastikan_tabel_frekuensi(connection):
+            bangun_ulang_frekuensi(connection)
+        rows = connection.execute(text(f"""
+            SELECT kata, frekuensi FROM {TABEL_FREKUENSI}
+            WHERE NOT (kata = ANY(CAST(:stopwords AS TEXT[])))
+            ORDER BY frekuensi DESC, kata
+            LIMIT :batas
+        """), {'stopwords': list(stopwords), 'batas': batas}).fetchall()
+    return {row[0]: int(row[1]) for row in rows}
@@ -0,0 +1,188 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+import config
+import run_metrics
+
+# Manifest ingest landing zone: setiap file yang diterima dicatat (path, ukuran, mtime, hash isi)
+# di config.MANIFEST_FILE. Dari manifest inilah kita tahu file mana yang benar-benar baru/berubah,
+# file mana yang duplikat (isi sama dengan file yang sudah pernah diterima), dan tahap ETL mana
+# yang perlu dijalankan untuk file-file itu.
+
+# Folder tujuan per ekstensi (relatif terhadap config.ORGANIZED_PATH)
+FOLDER_TIPE = {'.csv': 'csv', '.pdf': 'pdf', '.txt': 'txt'}
+
+_kunci_manifest = threading.Lock()
+
+def hitung_hash_file(file_path, ukuran_blok=1024 * 1024):
+    """Menghitung SHA-256 dari isi file (dibaca per blok supaya hemat memori)."""
+    h = hashlib.sha256()
+    run_metrics.catat_file(file_path)
+    with open(file_path, 'rb') as file:
+        for blok in iter(lambda: file.read(ukuran_blok), b''):
+            h.update(blok)
+    return h.hexdigest()
+
+def _info_file(path, hash_isi=None):
+    stat = os.stat(path)
+    return {'ukuran': stat.st_size, 'mtime': stat.st_mtime, 'hash': hash_isi or hitung_hash_file(path)}
+
+def _tulis_manifest(manifest):
+    os.makedirs(os.path.dirname(config.MANIFEST_FILE), exist_ok=True)
+    path_tmp = config.MANIFEST_FILE + '.tmp'
+    with open(path_tmp, 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(path_tmp, config.MANIFEST_FILE)
+
+def _bootstrap_manifest():
+    """Manifest pertama kali: daftarkan file yang sudah ada di folder terorganisir."""
+    manifest = {}
+    for folder in FOLDER_TIPE.values():
+        path_folder = os.path.join(config.ORGANIZED_PATH, folder)
+        if not os.path.isdir(path_folder):
+            continue
+        for filename in sorted(os.listdir(path_folder)):
+            path = os.path.join(path_folder, filename)
+            if os.path.isfile(path):
+                entri = _info_file(path)
+                entri.update(path=path, tgl_terima=datetime.fromtimestamp(entri['mtime']).isoformat(), sumber='bootstrap')
+                manifest[f"{folder}/{filename}"] = entri
+    return manifest
+
+def baca_manifest():
+    """{'<folder>/<nama_file>': {path, ukuran, mtime, hash, tgl_terima, sumber}}"""
+    if not os.path.exists(config.MANIFEST_FILE):
+        manifest = _bootstrap_manifest()
+        _tulis_manifest(manifest)
+        return manifest
+    with open(config.MANIFEST_FILE, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+def _buang_duplikat(path_sumber, filename):
+    """File duplikat tidak dihapus, cukup dipindah ke config.DUPLIKAT_PATH supaya bisa diperiksa."""
+    os.makedirs(config.DUPLIKAT_PATH, exist_ok=True)
+    tujuan = os.path.join(config.DUPLIKAT_PATH, f"{datetime.now():%Y%m%d_%H%M%S}_{filename}")
+    shutil.move(path_sumber, tujuan)
+
+def terima_file_baru(stabil_detik=0):
+    """
+    Memindahkan file dari landing zone ke folder terorganisir sambil memperbarui manifest.
+    File yang isinya (hash) sudah pernah diterima dibuang sebagai duplikat; file yang masih
+    ditulis (mtime < stabil_detik yang lalu) dibiarkan untuk putaran berikutnya.
+    Mengembalikan list entri {kunci, folder, nama_file, status ('baru'/'berubah')} yang diterima.
+    """
+    source_path = config.RAW_DATA_PATH
+    for folder in FOLDER_TIPE.values():
+        os.makedirs(os.path.join(config.ORGANIZED_PATH, folder), exist_ok=True)
+    if not os.path.isdir(source_path):
+        return []
+
+    diterima = []
+    with _kunci_manifest:
+        manifest = baca_manifest()
+        hash_dikenal = {entri['hash']: kunci for kunci, entri in manifest.items()}
+        sekarang = time.time()
+        for filename in sorted(os.listdir(source_path)):
+            path_sumber = os.path.join(source_path, filename)
+            if not os.path.isfile(path_sumber):
+                continue
+            folder = FOLDER_TIPE.get(os.path.splitext(filename)[1].lower())
+            if folder is None:
+                print(f"  -> File '{filename}' tidak dikenali tipenya, dilewati.")
+                continue
+            if stabil_detik and sekarang - os.path.getmtime(path_sumber) < stabil_detik:
+                print(f"  -> File '{filename}' masih ditulis, ditunda ke putaran berikutnya.")
+                continue
+
+            info = _info_file(path_sumber)
+            kunci = f"{folder}/{filename}"
+            if info['hash'] in hash_dikenal:
+                print(f"  -> File '{filename}' duplikat dari '{hash_dikenal[info['hash']]}', dibuang ke '{config.DUPLIKAT_PATH}'.")
+                _buang_duplikat(path_sumber, filename)
+                continue
+
+            tujuan = os.path.join(config.ORGANIZED_PATH, folder, filename)
+            status = 'berubah' if kunci in manifest else 'baru'
+            if status == 'berubah':
+                hash_dikenal.pop(manifest[kunci]['hash'], None)
+            shutil.move(path_sumber, tujuan)
+            # mtime disetel ke waktu terima: deteksi up-to-date zona curated membandingkan mtime,
+            # dan file upload bisa membawa mtime lama dari mesin pengirimnya
+            os.utime(tujuan)
+            info = _info_file(tujuan, info['hash'])
+            info.update(path=tujuan, tgl_terima=datetime.now().isoformat(), sumber=path_sumber)
+            manifest[kunci] = info
+            hash_dikenal[info['hash']] = kunci
+            diterima.append({'kunci': kunci, 'folder': folder, 'nama_file': filename, 'status': status})
+            print(f"  -> File '{filename}' ({status}) dipindahkan ke '{os.path.dirname(tujuan)}'")
+        if diterima:
+            _tulis_manifest(manifest)
+    return diterima
+
+def tahap_terdampak(diterima):
+    """Tahap ETL yang perlu dijalankan untuk file-file yang baru diterima (lihat config.TAHAP_PER_FILE)."""
+    tahap = []
+    for entri in diterima:
+        daftar = config.TAHAP_PER_FILE.get(entri['nama_file'].lower()) or config.TAHAP_PER_FILE.get(entri['folder'], [])
+        tahap.extend(t for t in daftar if t not in tahap)
+    return tahap
+
+def _penanda_inotify():
+    """
+    Event yang di-set setiap ada file masuk ke landing zone, jika paket watchdog (inotify/FSEvents)
+    terpasang; None jika tidak, dan watch mode cukup polling.
+    """
+    try:
+        from watchdog.observers import Observer
+        from watchdog.events import FileSystemEventHandler
+    except ImportError:
+        return None, None
+
+    ada_file = threading.Event()
+
+    class _Handler(FileSystemEventHandler):
+        def on_any_event(self, event):
+            if not event.is_directory:
+                ada_file.set()
+
+    observer = Observer()
+    observer.schedule(_Handler(), config.RAW_DATA_PATH, recursive=False)
+    observer.start()
+    return ada_file, observer
+
+def pantau(jalankan_tahap, interval=None, stabil_detik=None, maks_putaran=None):
+    """
+    Watch mode: menunggu file di landing zone (inotify jika tersedia, selain itu polling setiap
+    'interval' detik), menerima file baru lewat manifest, lalu memanggil jalankan_tahap(tahap)
+    hanya untuk tahap yang membaca tipe file tersebut. Berhenti dengan Ctrl+C.
+    """
+    interval = interval or config.INGEST_INTERVAL_DETIK
+    stabil_detik = config.INGEST_STABIL_DETIK if stabil_detik is None else stabil_detik
+    os.makedirs(config.RAW_DATA_PATH, exist_ok=True)
+    ada_file, observer = _penanda_inotify()
+    print(f"👀 Memantau '{config.RAW_DATA_PATH}' ({'inotify' if observer else f'polling {interval} dtk'}). Ctrl+C untuk berhenti.")
+    putaran = 0
+    try:
+        while maks_putaran is None or putaran < maks_putaran:
+            putaran += 1
+            diterima = terima_file_baru(stabil_detik)
+            tahap = tahap_terdampak(diterima)
+            if tahap:
+                print(f"\n📥 {len(diterima)} file diterima -> menjalankan tahap: {', '.join(tahap)}")
+                jalankan_tahap(tahap)
+            if ada_file is not None:
+                # Tetap bangun tiap 'interval' untuk file yang tadi ditunda karena belum stabil
+                ada_file.wait(interval)
+                ada_file.clear()
+            else:
+                time.sleep(interval)
+    except KeyboardInterrupt:
+        print("\n👋 Watch mode dihentikan.")
+    finally:
+        if observer is not None:
+            observer.stop()
+            observer.join()
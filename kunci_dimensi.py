@@ -0,0 +1,181 @@
+import json
+import os
+import threading
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+import config
+import database
+
+# Cache lookup kunci surrogate untuk load Fakta_Penjualan.
+# Peta disimpan sebagai array numpy terurut (bukan DataFrame) dan dicari dengan searchsorted,
+# jadi resolusi kunci tidak menyalin frame penjualan lewat merge. Peta disimpan di memori proses
+# (mis. watch mode) dan di config.KUNCI_DIMENSI_CACHE_FILE antar-run, dan hanya disegarkan dari delta dimensi:
+#   - Dim_Pelanggan / Dim_Lokasi: baris dengan kunci serial di atas kunci terbesar yang sudah dikenal
+#     (versi SCD2 baru selalu mendapat pelanggan_key baru),
+#   - Dim_Produk: daftar id_produk dibaca ulang hanya jika versi tabelnya berubah (id tidak monoton).
+
+TABEL_DIMENSI = ['Dim_Pelanggan', 'Dim_Lokasi', 'Dim_Produk']
+
+class PetaKunci:
+    """Peta id_pelanggan -> (pelanggan_key, kota), kota_asal -> id_lokasi, dan himpunan id_produk valid."""
+
+    def __init__(self):
+        self.id_pelanggan = np.empty(0, dtype=np.int64)   # terurut
+        self.pelanggan_key = np.empty(0, dtype=np.int64)
+        self.kode_kota = np.empty(0, dtype=np.int32)      # indeks ke self.kota, -1 jika kota kosong
+        self.kota = pd.Index([], dtype=object)            # kosakata nama kota
+        self.lokasi_per_kota = np.empty(0, dtype=np.int64)  # id_lokasi per kode kota, -1 jika belum ada di Dim_Lokasi
+        self.id_produk = np.empty(0, dtype=np.int64)      # terurut
+        self.maks_pelanggan_key = 0
+        self.maks_id_lokasi = 0
+        self.versi = {}
+
+    # --- Penyegaran dari delta ---
+    def _kode_kota(self, nama_kota):
+        """Kode kota untuk nilai-nilai nama_kota, menambah kosakata untuk kota yang belum dikenal."""
+        nama_kota = pd.Series(nama_kota, dtype=object)
+        baru = pd.Index(nama_kota.dropna().unique()).difference(self.kota)
+        if len(baru):
+            self.kota = self.kota.append(baru)
+            self.lokasi_per_kota = np.concatenate([self.lokasi_per_kota, np.full(len(baru), -1, dtype=np.int64)])
+        return self.kota.get_indexer(nama_kota).astype(np.int32)
+
+    def tambah_pelanggan(self, df):
+        """Menggabungkan baris aktif Dim_Pelanggan (pelanggan_key, id_pelanggan, kota_asal); kunci terbesar menang per id."""
+        if df.empty:
+            return
+        ids = np.concatenate([self.id_pelanggan, df['id_pelanggan'].to_numpy(dtype=np.int64)])
+        keys = np.concatenate([self.pelanggan_key, df['pelanggan_key'].to_numpy(dtype=np.int64)])
+        kode = np.concatenate([self.kode_kota, self._kode_kota(df['kota_asal'])])
+        urutan = np.lexsort((keys, ids))
+        ids, keys, kode = ids[urutan], keys[urutan], kode[urutan]
+        terakhir = np.append(ids[1:] != ids[:-1], True)  # baris terakhir per id = kunci terbesar = versi terbaru
+        self.id_pelanggan, self.pelanggan_key, self.kode_kota = ids[terakhir], keys[terakhir], kode[terakhir]
+        self.maks_pelanggan_key = max(self.maks_pelanggan_key, int(df['pelanggan_key'].max()))
+
+    def tambah_lokasi(self, df):
+        """Menggabungkan baris Dim_Lokasi (id_lokasi, nama_kota)."""
+        if df.empty:
+            return
+        kode = self._kode_kota(df['nama_kota'])
+        valid = kode >= 0
+        self.lokasi_per_kota[kode[valid]] = df['id_lokasi'].to_numpy(dtype=np.int64)[valid]
+        self.maks_id_lokasi = max(self.maks_id_lokasi, int(df['id_lokasi'].max()))
+
+    def set_produk(self, ids):
+        self.id_produk = np.unique(np.asarray(ids, dtype=np.int64))
+
+    # --- Persistensi antar-run ---
+    def simpan(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        path_tmp = path + '.tmp.npz'
+        np.savez(path_tmp, id_pelanggan=self.id_pelanggan, pelanggan_key=self.pelanggan_key, kode_kota=self.kode_kota,
+                 kota=np.array(self.kota, dtype=str), lokasi_per_kota=self.lokasi_per_kota, id_produk=self.id_produk,
+                 meta=np.array(json.dumps({'maks_pelanggan_key': self.maks_pelanggan_key, 'maks_id_lokasi': self.maks_id_lokasi,
+                                           'versi': self.versi})))
+        os.replace(path_tmp, path)
+
+    @classmethod
+    def muat(cls, path):
+        peta = cls()
+        with np.load(path) as data:
+            peta.id_pelanggan, peta.pelanggan_key, peta.kode_kota = data['id_pelanggan'], data['pelanggan_key'], data['kode_kota']
+            peta.kota = pd.Index(data['kota'].tolist(), dtype=object)
+            peta.lokasi_per_kota, peta.id_produk = data['lokasi_per_kota'], data['id_produk']
+            meta = json.loads(str(data['meta']))
+        peta.maks_pelanggan_key, peta.maks_id_lokasi, peta.versi = meta['maks_pelanggan_key'], meta['maks_id_lokasi'], meta['versi']
+        return peta
+
+    # --- Resolusi vektor ---
+    @staticmethod
+    def _cari(terurut, nilai):
+        """(posisi, ketemu) untuk setiap nilai di array terurut, via searchsorted."""
+        if len(terurut) == 0:
+            return np.zeros(len(nilai), dtype=np.int64), np.zeros(len(nilai), dtype=bool)
+        posisi = np.minimum(np.searchsorted(terurut, nilai), len(terurut) - 1)
+        return posisi, terurut[posisi] == nilai
+
+    def resolusi(self, df_penjualan):
+        """
+        Menambahkan kolom pelanggan_key & id_lokasi ke df_penjualan lewat operasi indeks vektor.
+        Mengembalikan (df_valid, df_reject); df_reject berisi baris sumber + kolom 'alasan'.
+        """
+        posisi, ada_pelanggan = self._cari(self.id_pelanggan, df_penjualan['id_pelanggan'].to_numpy(dtype=np.int64))
+        _, ada_produk = self._cari(self.id_produk, df_penjualan['id_produk'].to_numpy(dtype=np.int64))
+        duplikat = df_penjualan['id_order_detail'].duplicated(keep='last').to_numpy()
+
+        # Satu alasan per baris; urutan penugasan = prioritas (yang terakhir menang)
+        alasan = np.full(len(df_penjualan), None, dtype=object)
+        alasan[~ada_produk] = 'id_produk_tidak_dikenal'
+        alasan[~ada_pelanggan] = 'id_pelanggan_tidak_dikenal'
+        alasan[duplikat] = 'duplikat_id_order_detail'
+        valid = pd.isna(alasan)
+
+        df_valid = df_penjualan[valid].copy()
+        posisi = posisi[valid]
+        df_valid['pelanggan_key'] = self.pelanggan_key[posisi]
+        # Kode kota -1 (kota kosong) jatuh ke elemen tambahan -1 di akhir tabel
+        lokasi = np.append(self.lokasi_per_kota, -1)[self.kode_kota[posisi]]
+        # Kota tanpa baris Dim_Lokasi tetap dimuat dengan id_lokasi NULL (sama seperti left join sebelumnya)
+        df_valid['id_lokasi'] = pd.Series(lokasi, index=df_valid.index).where(lokasi >= 0).astype('Int64')
+
+        df_reject = df_penjualan[~valid].copy()
+        df_reject['alasan'] = alasan[~valid]
+        return df_valid, df_reject
+
+_peta = None
+_kunci = threading.Lock()
+
+def _baca(engine_st, query, params=None, kategori=()):
+    return database.baca_streaming_df(query, engine_st, params=params, kategori=kategori)
+
+def _segarkan(peta, engine_st, versi):
+    with engine_st.connect() as connection:
+        maks_pelanggan, maks_lokasi = connection.execute(text(
+            'SELECT (SELECT MAX(pelanggan_key) FROM "Dim_Pelanggan"), (SELECT MAX(id_lokasi) FROM "Dim_Lokasi")'
+        )).fetchone()
+    if (maks_pelanggan or 0) < peta.maks_pelanggan_key or (maks_lokasi or 0) < peta.maks_id_lokasi:
+        # Kunci serial mundur = dimensi dikosongkan & dimuat ulang (RESTART IDENTITY) -> bangun dari nol
+        return None
+
+    if versi.get('Dim_Lokasi') != peta.versi.get('Dim_Lokasi'):
+        peta.tambah_lokasi(_baca(engine_st, 'SELECT id_lokasi, nama_kota FROM "Dim_Lokasi" WHERE id_lokasi > :maks',
+                                 {'maks': peta.maks_id_lokasi}))
+    if versi.get('Dim_Pelanggan') != peta.versi.get('Dim_Pelanggan'):
+        peta.tambah_pelanggan(_baca(engine_st, 'SELECT pelanggan_key, id_pelanggan, kota_asal FROM "Dim_Pelanggan" '
+                                               'WHERE status_sekarang = TRUE AND pelanggan_key > :maks',
+                                    {'maks': peta.maks_pelanggan_key}, kategori=('kota_asal',)))
+    if versi.get('Dim_Produk') != peta.versi.get('Dim_Produk'):
+        peta.set_produk(_baca(engine_st, 'SELECT id_produk FROM "Dim_Produk"')['id_produk'].to_numpy())
+    peta.versi = versi
+    return peta
+
+def dapatkan_peta(engine_st, muat_ulang=False):
+    """
+    Peta kunci bersama, disegarkan dari delta dimensi sejak pemanggilan (atau run) terakhir.
+    muat_ulang=True (mis. full rebuild) membangun peta dari nol.
+    """
+    global _peta
+    with _kunci:
+        versi = database.baca_versi_tabel(engine_st, TABEL_DIMENSI)
+        path = config.KUNCI_DIMENSI_CACHE_FILE.format(db=config.DB_NAME_STAGING)
+        if _peta is None and not muat_ulang and os.path.exists(path):
+            try:
+                _peta = PetaKunci.muat(path)
+            except (OSError, ValueError, KeyError):
+                _peta = None  # file cache rusak/format lama -> bangun ulang
+        if _peta is not None and not muat_ulang:
+            if versi == _peta.versi:
+                print("   -> [E] Peta kunci dimensi masih up-to-date (tidak ada delta dimensi).")
+                return _peta
+            if _segarkan(_peta, engine_st, versi) is not None:
+                _peta.simpan(path)
+                print(f"   -> [E] Peta kunci disegarkan dari delta dimensi ({len(_peta.id_pelanggan)} pelanggan, "
+                      f"{len(_peta.kota)} kota, {len(_peta.id_produk)} produk).")
+                return _peta
+        peta = _segarkan(PetaKunci(), engine_st, versi)
+        peta.simpan(path)
+        _peta = peta
+        print(f"   -> [E] Peta kunci dibangun: {len(peta.id_pelanggan)} pelanggan aktif, {len(peta.kota)} kota, {len(peta.id_produk)} produk.")
+        return peta
@@ -0,0 +1,237 @@
+import hashlib
+import json
+import os
+import shutil
+from datetime import datetime
+import pandas as pd
+import config
+import run_metrics
+import validasi
+
+# Zona curated: CSV terorganisir -> Parquet bertipe (penjualan dipartisi per tahun/bulan tanggal_order)
+
+def _path_csv(nama):
+    return os.path.join(config.ORGANIZED_PATH, 'csv', config.DATASET_LAKE[nama]['csv'])
+
+def _path_parquet(nama):
+    return os.path.join(config.CURATED_PATH, nama)
+
+def dtype_kolom(spec):
+    """dtype pandas untuk satu entri registry skema; integer nullable memakai extension type (Int32 dst.)."""
+    dtype = spec['dtype']
+    if spec.get('nullable') and dtype.startswith('int'):
+        return dtype.capitalize()
+    return dtype
+
+def _versi_skema(nama):
+    """Sidik jari registry skema dataset; Parquet yang ditulis dengan skema lain dianggap basi."""
+    return hashlib.md5(json.dumps(config.DATASET_LAKE[nama]['skema'], sort_keys=True).encode()).hexdigest()
+
+def terapkan_skema(df, nama):
+    """Meng-cast kolom DataFrame sesuai registry skema dataset (config.DATASET_LAKE[nama]['skema'])."""
+    for kolom, spec in config.DATASET_LAKE[nama]['skema'].items():
+        if kolom not in df.columns:
+            continue
+        dtype = dtype_kolom(spec)
+        if dtype.startswith('datetime'):
+            if not pd.api.types.is_datetime64_any_dtype(df[kolom]):
+                df[kolom] = pd.to_datetime(df[kolom])
+        elif df[kolom].dtype != dtype:
+            df[kolom] = df[kolom].astype(dtype)
+    return df
+
+def isi_kosong(seri, nilai):
+    """fillna yang aman untuk kolom category (nilai pengganti ditambahkan ke kategorinya dulu)."""
+    if isinstance(seri.dtype, pd.CategoricalDtype) and nilai not in seri.cat.categories:
+        seri = seri.cat.add_categories([nilai])
+    return seri.fillna(nilai)
+
+def _argumen_csv(nama, columns=None, mentah=False):
+    """
+    Argumen pd.read_csv untuk CSV terorganisir: nama kolom & dtype ringkas dari registry skema di config.
+    mentah=True membaca semua kolom sebagai teks, untuk di-parse per nilai oleh validasi.validasi.
+    """
+    meta = config.DATASET_LAKE[nama]
+    if mentah:
+        return dict(sep=',', header=None, skiprows=1, names=meta['kolom'], usecols=columns, dtype='string[pyarrow]')
+    kolom_dibaca = columns or meta['kolom']
+    dtypes = {k: dtype_kolom(meta['skema'][k]) for k in kolom_dibaca}
+    kolom_tanggal = [k for k, dtype in dtypes.items() if dtype.startswith('datetime')]
+    return dict(sep=',', header=None, skiprows=1, names=meta['kolom'], usecols=columns,
+                dtype={k: dtype for k, dtype in dtypes.items() if k not in kolom_tanggal}, parse_dates=kolom_tanggal)
+
+def _baca_csv(nama, columns=None, referensi=None):
+    """
+    Membaca & memvalidasi CSV terorganisir. Mengembalikan (df_valid dengan dtype ringkas, df_karantina).
+    Pembacaan bertipe langsung dipakai jika semua nilai cocok dengan tipenya; jika tidak, CSV dibaca
+    ulang sebagai teks supaya hanya baris yang salah yang dikarantina, bukan seluruh file gagal.
+    """
+    try:
+        df = pd.read_csv(_path_csv(nama), **_argumen_csv(nama, columns))
+    except (ValueError, TypeError, OverflowError) as e:
+        print(f"  -> ⚠️ '{nama}' berisi nilai yang tidak sesuai tipenya ({e}); dibaca ulang sebagai teks untuk divalidasi.")
+        df = pd.read_csv(_path_csv(nama), **_argumen_csv(nama, columns, mentah=True))
+    run_metrics.catat_file(_path_csv(nama))
+    run_metrics.catat_baca(len(df))
+    df_valid, df_karantina = validasi.validasi(df, nama, referensi)
+    return terapkan_skema(df_valid, nama), df_karantina
+
+def _referensi(nama):
+    """{kolom: array kunci valid} dari dataset dimensi yang dirujuk (config.DATASET_LAKE[nama]['referensi'])."""
+    referensi = {}
+    for kolom, dataset in config.DATASET_LAKE[nama].get('referensi', {}).items():
+        if os.path.exists(os.path.join(_path_parquet(dataset), '_SUCCESS')) or os.path.exists(_path_csv(dataset)):
+            referensi[kolom] = baca_dataset(dataset, columns=[kolom])[kolom].to_numpy()
+        else:
+            print(f"  -> ⚠️ Dataset '{dataset}' tidak ada; keberadaan '{kolom}' tidak diperiksa.")
+    return referensi
+
+def _parquet_up_to_date(nama):
+    """
+    Parquet dianggap up-to-date jika penanda konversinya lebih baru dari CSV sumbernya
+    dan dari penanda dataset yang dirujuknya (hasil cek referensi bisa berubah),
+    serta ditulis dengan versi registry skema yang sama.
+    """
+    penanda = os.path.join(_path_parquet(nama), '_SUCCESS')
+    if not os.path.exists(penanda) or os.path.getmtime(penanda) < os.path.getmtime(_path_csv(nama)):
+        return False
+    for dataset in config.DATASET_LAKE[nama].get('referensi', {}).values():
+        penanda_ref = os.path.join(_path_parquet(dataset), '_SUCCESS')
+        if os.path.exists(penanda_ref) and os.path.getmtime(penanda) < os.path.getmtime(penanda_ref):
+            return False
+    with open(penanda, 'r', encoding='utf-8') as file:
+        return file.read().strip() == _versi_skema(nama)
+
+def sidik_dataset(nama):
+    """Versi satu dataset di zona curated: (mtime, versi skema) penanda _SUCCESS, atau stat CSV jika belum dikonversi."""
+    penanda = os.path.join(_path_parquet(nama), '_SUCCESS')
+    if os.path.exists(penanda):
+        with open(penanda, 'r', encoding='utf-8') as file:
+            return [os.path.getmtime(penanda), file.read().strip()]
+    path_csv = _path_csv(nama)
+    return [os.path.getmtime(path_csv), os.path.getsize(path_csv)] if os.path.exists(path_csv) else None
+
+def konversi_ke_parquet(nama, paksa=False, engine_karantina=None):
+    """
+    Mengonversi satu CSV terorganisir ke Parquet di zona curated. Baris yang gagal validasi tidak ikut
+    ditulis; baris itu disimpan ke tabel karantina di engine_karantina (jika diberikan).
+    Mengembalikan True jika ditulis ulang.
+    """
+    if not os.path.exists(_path_csv(nama)):
+        print(f"  -> CSV untuk dataset '{nama}' tidak ditemukan, dilewati.")
+        return False
+    if not paksa and _parquet_up_to_date(nama):
+        print(f"  -> Dataset '{nama}' sudah up-to-date di zona curated.")
+        return False
+
+    meta = config.DATASET_LAKE[nama]
+    df, df_karantina = _baca_csv(nama, referensi=_referensi(nama))
+    if len(df_karantina):
+        print(f"  -> ⚠️ Dataset '{nama}': {len(df_karantina)} baris dikarantina ({validasi.ringkas_alasan(df_karantina)}).")
+    tujuan = _path_parquet(nama)
+    # Tulis ulang penuh ke folder sementara (to_parquet dengan partition_cols menambah file, bukan mengganti),
+    # lalu ditukar dengan versi lama: konversi yang gagal di tengah tidak meninggalkan dataset setengah jadi
+    sementara = tujuan + '.tmp'
+    shutil.rmtree(sementara, ignore_errors=True)
+    os.makedirs(sementara)
+
+    kolom_tanggal = meta.get('partisi')
+    if kolom_tanggal:
+        df['tahun'] = df[kolom_tanggal].dt.year
+        df['bulan'] = df[kolom_tanggal].dt.month
+        df.to_parquet(sementara, engine='pyarrow', partition_cols=['tahun', 'bulan'], index=False)
+    else:
+        df.to_parquet(os.path.join(sementara, 'data.parquet'), engine='pyarrow', index=False)
+
+    with open(os.path.join(sementara, '_SUCCESS'), 'w', encoding='utf-8') as file:
+        file.write(_versi_skema(nama))
+    shutil.rmtree(tujuan, ignore_errors=True)
+    os.replace(sementara, tujuan)
+    if engine_karantina is not None:
+        # Selalu ditulis (juga saat kosong) supaya karantina konversi sebelumnya tidak tertinggal
+        validasi.simpan_karantina(engine_karantina, nama, df_karantina)
+    print(f"  -> Dataset '{nama}': {len(df)} baris ({df.memory_usage(deep=True).sum() / 1e6:.1f} MB di memori) ditulis ke {tujuan}")
+    return True
+
+def konversi_semua_ke_parquet(engine_karantina=None):
+    """
+    Tahap pipeline: membangun/menyegarkan zona curated dari semua CSV terorganisir.
+    Dataset dimensi dikonversi lebih dulu, karena dataset yang merujuknya memvalidasi kunci terhadapnya.
+    """
+    print("\n--- Memulai Konversi CSV ke Zona Curated (Parquet) ---")
+    for nama in sorted(config.DATASET_LAKE, key=lambda n: bool(config.DATASET_LAKE[n].get('referensi'))):
+        konversi_ke_parquet(nama, engine_karantina=engine_karantina)
+    print("✅ Zona curated siap.")
+
+def filter_sejak_tanggal(tanggal):
+    """Filter partisi (DNF pyarrow) untuk semua bulan mulai dari bulan 'tanggal'."""
+    tanggal = pd.Timestamp(tanggal)
+    return [[('tahun', '>', tanggal.year)], [('tahun', '=', tanggal.year), ('bulan', '>=', tanggal.month)]]
+
+def baca_dataset(nama, columns=None, filters=None):
+    """
+    Membaca dataset dari zona curated dengan proyeksi kolom dan partition pruning.
+    filters memakai format DNF pyarrow, mis. filter_sejak_tanggal(...).
+    Jika Parquet belum ada, fallback ke CSV (filters diabaikan, jadi pemanggil
+    tetap harus memfilter ulang di pandas bila perlu).
+    """
+    if os.path.exists(os.path.join(_path_parquet(nama), '_SUCCESS')):
+        df = pd.read_parquet(_path_parquet(nama), engine='pyarrow', columns=columns, filters=filters)
+        run_metrics.catat_baca(len(df))
+        # Category/string Arrow/int32 dipulihkan dari metadata pandas di Parquet; cast ini hanya no-op pengaman
+        return terapkan_skema(df, nama)
+    df, df_karantina = _baca_csv(nama, columns)
+    if len(df_karantina):
+        print(f"  -> ⚠️ '{nama}' dibaca dari CSV: {len(df_karantina)} baris tidak valid dilewati "
+              f"(jalankan tahap curated untuk menyimpannya ke karantina).")
+    return df
+
+def baca_dataset_per_potongan(nama, columns=None, filters=None, ukuran=None):
+    """
+    Seperti baca_dataset, tetapi menghasilkan (generator) DataFrame per potongan sekitar 'ukuran' baris,
+    sehingga memori puncak pembaca sebanding dengan ukuran potongan, bukan ukuran dataset.
+    Parquet dipindai lewat pyarrow.dataset (proyeksi kolom & partition pruning tetap berlaku);
+    fallback CSV dibaca dengan read_csv(chunksize=...), filters diabaikan seperti di baca_dataset.
+    """
+    ukuran = ukuran or config.STREAM_CHUNKSIZE
+    if not os.path.exists(os.path.join(_path_parquet(nama), '_SUCCESS')):
+        run_metrics.catat_file(_path_csv(nama))
+        # Teks mentah per potongan: nilai yang salah tipe tidak bisa menggagalkan pembaca di tengah file
+        with pd.read_csv(_path_csv(nama), chunksize=ukuran, **_argumen_csv(nama, columns, mentah=True)) as pembaca:
+            for df in pembaca:
+                run_metrics.catat_baca(len(df))
+                df_valid, df_karantina = validasi.validasi(df, nama)
+                if len(df_karantina):
+                    print(f"  -> ⚠️ '{nama}' dibaca dari CSV: {len(df_karantina)} baris tidak valid dilewati.")
+                yield terapkan_skema(df_valid, nama)
+        return
+
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+    dataset = ds.dataset(_path_parquet(nama), format='parquet', partitioning='hive')
+    ekspresi = pq.filters_to_expression(filters) if filters else None
+    # File per partisi bulan bisa kecil; batch dikumpulkan dulu sampai kira-kira 'ukuran' baris
+    kumpulan, jumlah = [], 0
+    for batch in dataset.to_batches(columns=columns, filter=ekspresi, batch_size=ukuran):
+        kumpulan.append(batch)
+        jumlah += batch.num_rows
+        if jumlah >= ukuran:
+            df = pa.Table.from_batches(kumpulan).to_pandas()
+            kumpulan, jumlah = [], 0
+            run_metrics.catat_baca(len(df))
+            yield terapkan_skema(df, nama)
+    if jumlah:
+        df = pa.Table.from_batches(kumpulan).to_pandas()
+        run_metrics.catat_baca(len(df))
+        yield terapkan_skema(df, nama)
+
+def tulis_batch(nama, df):
+    """
+    Menambahkan satu batch ke dataset append-only di zona curated (satu file per run).
+    Pembaca yang butuh versi terbaru per kunci perlu men-dedup berdasarkan timestamp.
+    """
+    tujuan = _path_parquet(nama)
+    os.makedirs(tujuan, exist_ok=True)
+    nama_file = f"batch_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.parquet"
+    df.to_parquet(os.path.join(tujuan, nama_file), engine='pyarrow', index=False)
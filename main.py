@@ -1,23 +1,134 @@
-import database
-import etl_pipeline
-import analysis_pipeline
+import time
+_MULAI = time.perf_counter()  # diukur sedini mungkin untuk metrik waktu startup
+
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+import config
+
+# CLI ringan: modul pipeline (pandas, SQLAlchemy, dst.) baru di-import di dalam subcommand
+# yang membutuhkannya, sehingga `--help` atau satu tahap kecil tidak memuat semuanya.
+
+def _catat_startup(perintah):
+    """Mencatat waktu dari start proses sampai modul pipeline siap (riwayat di config.STARTUP_METRICS_FILE)."""
+    durasi = time.perf_counter() - _MULAI
+    print(f"⏱️  Startup '{perintah}': {durasi:.3f} dtk")
+    os.makedirs(os.path.dirname(config.STARTUP_METRICS_FILE), exist_ok=True)
+    with open(config.STARTUP_METRICS_FILE, 'a', encoding='utf-8') as file:
+        file.write(json.dumps({'waktu': datetime.now().isoformat(), 'perintah': perintah, 'startup_detik': round(durasi, 4)}) + '\n')
+
+def _daftar(nilai):
+    """Mengubah '--only a,b' (boleh diulang) menjadi list nama."""
+    if not nilai:
+        return None
+    return [nama.strip() for bagian in nilai for nama in bagian.split(',') if nama.strip()]
+
+def perintah_etl(args):
+    import database
+    import etl_pipeline
+    _catat_startup('etl')
+    etl_pipeline.run_all_etl(database.get_staging_engine(), full_rebuild=args.full_rebuild, hanya=_daftar(args.only),
+                             engine_metrik=database.get_warehouse_engine(), resume=args.resume)
+
+def perintah_report(args):
+    import database
+    import analysis_pipeline
+    _catat_startup('report')
+    staging_engine = None if args.tanpa_db else database.get_staging_engine()
+    warehouse_engine = None if args.tanpa_db else database.get_warehouse_engine()
+    analysis_pipeline.run_all_analysis(staging_engine, warehouse_engine, mesin=args.mesin_analisis,
+                                       pakai_cache=not args.no_cache, profil_render=args.profil, hanya=_daftar(args.only),
+                                       resume=args.resume)
+
+def perintah_watch(args):
+    import database
+    import etl_pipeline
+    import ingestion
+    _catat_startup('watch')
+    staging_engine = database.get_staging_engine()
+    warehouse_engine = database.get_warehouse_engine()
+    # Setiap batch file baru hanya menjalankan tahap yang membaca tipe file tersebut (inkremental)
+    jalankan = lambda tahap: etl_pipeline.run_all_etl(staging_engine, full_rebuild=False, hanya=tahap, engine_metrik=warehouse_engine)
+    ingestion.pantau(jalankan, interval=args.interval, stabil_detik=args.stabil)
 
 # Fungsi utama untuk menjalankan keseluruhan proses
-def main():
+def perintah_all(args):
+    import database
+    import etl_pipeline
+    import analysis_pipeline
+    _catat_startup('all')
     print("🚀 --- Memulai Project Data Lakehouse --- 🚀")
     
     # Dapatkan koneksi engine
     staging_engine = database.get_staging_engine()
     warehouse_engine = database.get_warehouse_engine()
     
-    # Jalankan pipeline ETL
-    etl_pipeline.run_all_etl(staging_engine)
+    # Jalankan pipeline ETL (default inkremental, --full-rebuild untuk memuat ulang semuanya)
+    etl_pipeline.run_all_etl(staging_engine, full_rebuild=args.full_rebuild, engine_metrik=warehouse_engine, resume=args.resume)
     
     # Jalankan pipeline Analisis
-    analysis_pipeline.run_all_analysis(staging_engine, warehouse_engine)
+    analysis_pipeline.run_all_analysis(staging_engine, warehouse_engine, mesin=args.mesin_analisis,
+                                       pakai_cache=not args.no_cache, profil_render=args.profil, resume=args.resume)
     
     print("\n✨ --- Semua Proses Telah Selesai dengan Sukses! --- ✨")
 
+def _opsi_laporan(parser):
+    parser.add_argument('--mesin-analisis', choices=['postgres', 'duckdb'], default='postgres', help="Mesin query untuk laporan (duckdb = in-process di atas file lake)")
+    parser.add_argument('--profil', choices=list(config.RENDER_PROFIL), default=None, help="Profil render grafik (default: config.RENDER_PROFIL_AKTIF)")
+    parser.add_argument('--no-cache', action='store_true', help="Abaikan cache laporan dan buat ulang semuanya")
+
+def _opsi_resume(parser):
+    parser.add_argument('--resume', action='store_true', help="Lanjutkan run terakhir: tahap yang sudah sukses dan inputnya tidak berubah dilewati")
+
+def buat_parser():
+    parser = argparse.ArgumentParser(description="Pipeline Data Lakehouse AdventureWorks")
+    sub = parser.add_subparsers(dest='perintah')
+
+    p_all = sub.add_parser('all', help="ETL lengkap lalu semua laporan (default)")
+    p_all.add_argument('--full-rebuild', action='store_true', help="Kosongkan semua tabel lalu muat ulang dari nol (default: inkremental)")
+    _opsi_laporan(p_all)
+    _opsi_resume(p_all)
+    p_all.set_defaults(fungsi=perintah_all)
+
+    p_etl = sub.add_parser('etl', help="Jalankan pipeline ETL (atau sebagian tahapnya)")
+    p_etl.add_argument('--only', action='append', metavar='TAHAP', help=f"Tahap yang dijalankan, pisahkan dengan koma: {', '.join(config.TAHAP_ETL)}")
+    p_etl.add_argument('--full-rebuild', action='store_true', help="Kosongkan semua tabel lalu muat ulang dari nol")
+    _opsi_resume(p_etl)
+    p_etl.set_defaults(fungsi=perintah_etl)
+
+    p_report = sub.add_parser('report', help="Jalankan laporan (atau sebagian laporan)")
+    p_report.add_argument('--only', action='append', metavar='LAPORAN', help=f"Laporan yang dijalankan, pisahkan dengan koma: {', '.join(config.LAPORAN)}")
+    p_report.add_argument('--tanpa-db', action='store_true', help="Tanpa koneksi database (wajib bersama --mesin-analisis duckdb)")
+    _opsi_laporan(p_report)
+    _opsi_resume(p_report)
+    p_report.set_defaults(fungsi=perintah_report)
+
+    p_watch = sub.add_parser('watch', help="Pantau landing zone dan jalankan tahap ETL yang terdampak setiap ada file baru")
+    p_watch.add_argument('--interval', type=float, default=None, help=f"Interval polling dalam detik (default: {config.INGEST_INTERVAL_DETIK})")
+    p_watch.add_argument('--stabil', type=float, default=None, help=f"Tunda file yang diubah kurang dari N detik lalu (default: {config.INGEST_STABIL_DETIK})")
+    p_watch.set_defaults(fungsi=perintah_watch)
+    return parser
+
+def _validasi_argumen(parser, args):
+    """Menolak kombinasi opsi yang tidak masuk akal sebelum modul pipeline di-import."""
+    if getattr(args, 'tanpa_db', False) and args.mesin_analisis != 'duckdb':
+        parser.error("--tanpa-db hanya bisa dipakai bersama --mesin-analisis duckdb (laporan postgres butuh database).")
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    # Kompatibel dengan pemanggilan lama: `python main.py [--full-rebuild ...]` = `python main.py all ...`
+    if not argv or (argv[0].startswith('-') and argv[0] not in ('-h', '--help')):
+        argv = ['all'] + argv
+    parser = buat_parser()
+    args = parser.parse_args(argv)
+    _validasi_argumen(parser, args)
+    args.fungsi(args)
+    # Ringkasan pool hanya kalau subcommand memang memakai database (modulnya sudah ter-import)
+    if 'database' in sys.modules:
+        sys.modules['database'].cetak_statistik_pool()
+
 # Ini adalah 'pintu masuk' standar untuk script Python
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,201 @@
+import re
+from sqlalchemy import text
+import config
+import aggregates
+import sketsa
+
+# Manajemen partisi Fakta_Penjualan: tabel induk dipartisi RANGE per bulan pada id_waktu (YYYYMMDD),
+# partisi bulan YYYYMM mencakup id_waktu [YYYYMM00, bulan berikutnya 00). Partisi dibuat sesuai
+# kebutuhan dari rentang id_waktu yang dimuat; bulan yang dimuat ulang diganti dengan partition swap
+# (tabel baru tanpa indeks diisi dulu, indeks dibangun saat ATTACH), bukan TRUNCATE seluruh tabel.
+
+TABEL_FAKTA = 'Fakta_Penjualan'
+_POLA_PARTISI = re.compile(rf'^{TABEL_FAKTA}_p(\d{{6}})$')
+
+def nama_partisi(bulan):
+    """Nama partisi untuk bulan YYYYMM (int)."""
+    return f"{TABEL_FAKTA}_p{bulan}"
+
+def _bulan_berikutnya(bulan):
+    tahun, bln = divmod(bulan, 100)
+    return (tahun + 1) * 100 + 1 if bln == 12 else bulan + 1
+
+def batas_partisi(bulan):
+    """(dari, sampai) id_waktu untuk partisi bulan YYYYMM; 'sampai' eksklusif."""
+    return bulan * 100, _bulan_berikutnya(bulan) * 100
+
+def _jenis_tabel(connection):
+    """relkind tabel fakta: 'p' = terpartisi, 'r' = heap biasa, None = belum ada."""
+    return connection.execute(text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:nama)"),
+                              {'nama': f'"{TABEL_FAKTA}"'}).scalar()
+
+def daftar_partisi(connection):
+    """{bulan YYYYMM: nama tabel} untuk partisi yang saat ini terpasang di Fakta_Penjualan."""
+    rows = connection.execute(text("""
+        SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(:nama)
+    """), {'nama': f'"{TABEL_FAKTA}"'}).fetchall()
+    hasil = {}
+    for (relname,) in rows:
+        cocok = _POLA_PARTISI.match(relname)
+        if cocok:
+            hasil[int(cocok.group(1))] = relname
+    return hasil
+
+def pastikan_indeks(connection):
+    """Indeks sekunder (config.FAKTA_INDEKS_SEKUNDER) di tabel induk; otomatis diturunkan ke setiap partisi."""
+    for kolom in config.FAKTA_INDEKS_SEKUNDER:
+        connection.execute(text(f'CREATE INDEX IF NOT EXISTS "idx_fakta_{kolom}" ON "{TABEL_FAKTA}" ("{kolom}")'))
+
+def pastikan_terpartisi(connection):
+    """
+    Memastikan Fakta_Penjualan berupa tabel terpartisi. Tabel heap lama dimigrasikan sekali:
+    kolom, default dan foreign key-nya disalin ke tabel induk baru, isinya dipindah ke partisi bulanan.
+    Primary key menjadi (id_order_detail, id_waktu) karena kunci partisi wajib ada di kunci unik.
+    Mengembalikan True jika migrasi dilakukan.
+    """
+    jenis = _jenis_tabel(connection)
+    if jenis == 'p':
+        return False
+    if jenis is None:
+        raise RuntimeError(f'Tabel "{TABEL_FAKTA}" belum ada di database staging.')
+
+    print(f"   -> [L] Migrasi {TABEL_FAKTA} ke tabel terpartisi per bulan (sekali saja)...")
+    heap = f"{TABEL_FAKTA}_heap"
+    fk = connection.execute(text("""
+        SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+        WHERE conrelid = to_regclass(:nama) AND contype = 'f'
+    """), {'nama': f'"{TABEL_FAKTA}"'}).fetchall()
+    connection.execute(text(f'ALTER TABLE "{TABEL_FAKTA}" RENAME TO "{heap}"'))
+    connection.execute(text(f'CREATE TABLE "{TABEL_FAKTA}" (LIKE "{heap}" INCLUDING DEFAULTS) PARTITION BY RANGE (id_waktu)'))
+    connection.execute(text(f'ALTER TABLE "{TABEL_FAKTA}" ALTER COLUMN id_waktu SET NOT NULL'))
+    connection.execute(text(f'ALTER TABLE "{TABEL_FAKTA}" ADD CONSTRAINT "{TABEL_FAKTA}_pk" PRIMARY KEY (id_order_detail, id_waktu)'))
+    for nama, definisi in fk:
+        connection.execute(text(f'ALTER TABLE "{TABEL_FAKTA}" ADD CONSTRAINT "{nama}" {definisi}'))
+    pastikan_indeks(connection)
+
+    rentang = connection.execute(text(f'SELECT MIN(id_waktu), MAX(id_waktu) FROM "{heap}"')).fetchone()
+    if rentang[0] is not None:
+        pastikan_partisi(connection, bulan_dalam_rentang(*rentang))
+        connection.execute(text(f'INSERT INTO "{TABEL_FAKTA}" SELECT * FROM "{heap}"'))
+    connection.execute(text(f'DROP TABLE "{heap}"'))
+    return True
+
+def bulan_dalam_rentang(id_waktu_min, id_waktu_max):
+    """Daftar bulan YYYYMM dari id_waktu_min sampai id_waktu_max (inklusif)."""
+    bulan, akhir = int(id_waktu_min) // 100, int(id_waktu_max) // 100
+    hasil = []
+    while bulan <= akhir:
+        hasil.append(bulan)
+        bulan = _bulan_berikutnya(bulan)
+    return hasil
+
+def pastikan_partisi(connection, daftar_bulan):
+    """Membuat partisi yang belum ada untuk bulan-bulan YYYYMM. Mengembalikan list partisi yang baru dibuat."""
+    ada = daftar_partisi(connection)
+    baru = []
+    for bulan in sorted(set(daftar_bulan) - set(ada)):
+        dari, sampai = batas_partisi(bulan)
+        connection.execute(text(f'CREATE TABLE "{nama_partisi(bulan)}" PARTITION OF "{TABEL_FAKTA}" FOR VALUES FROM ({dari}) TO ({sampai})'))
+        baru.append(nama_partisi(bulan))
+    return baru
+
+def tukar_partisi(connection, tabel_sumber, bulan, kolom):
+    """
+    Partition swap untuk satu bulan: baris bulan itu dari tabel_sumber dimuat ke tabel baru tanpa indeks,
+    partisi lama (jika ada) dilepas & dihapus, lalu tabel baru dipasang sebagai partisinya.
+    Indeks induk (primary key & sekunder) dibangun sekali saat ATTACH, setelah datanya masuk,
+    dan CHECK rentang yang dipasang lebih dulu membuat ATTACH tidak perlu memindai ulang isinya.
+    Mengembalikan jumlah baris yang dimuat.
+    """
+    dari, sampai = batas_partisi(bulan)
+    nama = nama_partisi(bulan)
+    baru = f"{nama}_baru"
+    daftar_kolom = ', '.join(f'"{k}"' for k in kolom)
+    connection.execute(text(f'DROP TABLE IF EXISTS "{baru}"'))
+    connection.execute(text(f'CREATE TABLE "{baru}" (LIKE "{TABEL_FAKTA}" INCLUDING DEFAULTS)'))
+    connection.execute(text(f'ALTER TABLE "{baru}" ADD CONSTRAINT "{baru}_rentang" CHECK (id_waktu >= {dari} AND id_waktu < {sampai})'))
+    jumlah = connection.execute(text(f"""
+        INSERT INTO "{baru}" ({daftar_kolom})
+        SELECT {daftar_kolom} FROM {tabel_sumber} WHERE id_waktu >= {dari} AND id_waktu < {sampai}
+    """)).rowcount
+
+    if bulan in daftar_partisi(connection):
+        connection.execute(text(f'ALTER TABLE "{TABEL_FAKTA}" DETACH PARTITION "{nama}"'))
+        connection.execute(text(f'DROP TABLE "{nama}"'))
+    connection.execute(text(f'ALTER TABLE "{baru}" RENAME TO "{nama}"'))
+    connection.execute(text(f'ALTER TABLE "{TABEL_FAKTA}" ATTACH PARTITION "{nama}" FOR VALUES FROM ({dari}) TO ({sampai})'))
+    connection.execute(text(f'ALTER TABLE "{nama}" DROP CONSTRAINT "{baru}_rentang"'))
+    return jumlah
+
+def _nomor_bulan(bulan):
+    """Nomor bulan berurutan dari YYYYMM, supaya selisih bulan lintas tahun bisa dihitung."""
+    return (bulan // 100) * 12 + bulan % 100 - 1
+
+def bulan_tertua_disimpan(bulan_terbaru, retensi_bulan=None):
+    """
+    Bulan YYYYMM tertua yang masih disimpan jika bulan_terbaru adalah partisi terbaru
+    (None jika retensi tidak diset). Partisi yang lebih tua dari ini dipensiunkan.
+    """
+    retensi_bulan = config.FAKTA_RETENSI_BULAN if retensi_bulan is None else retensi_bulan
+    if not retensi_bulan:
+        return None
+    tahun, bln = divmod(_nomor_bulan(bulan_terbaru) - retensi_bulan + 1, 12)
+    return tahun * 100 + bln + 1
+
+def _arsipkan(connection, nama):
+    """
+    Partisi yang sudah dilepas menjadi arsip_<nama>. Jika arsip bulan itu sudah ada (bulan yang sama
+    pernah dipensiunkan, mis. sebelum full rebuild), isinya digabung: versi baris di partisi menggantikan
+    baris dengan id_order_detail yang sama di arsip.
+    """
+    arsip = f"arsip_{nama.lower()}"
+    if connection.execute(text("SELECT to_regclass(:nama)"), {'nama': f'"{arsip}"'}).scalar() is None:
+        connection.execute(text(f'ALTER TABLE "{nama}" RENAME TO "{arsip}"'))
+        return
+    connection.execute(text(f'DELETE FROM "{arsip}" a USING "{nama}" p WHERE a.id_order_detail = p.id_order_detail'))
+    connection.execute(text(f'INSERT INTO "{arsip}" SELECT * FROM "{nama}"'))
+    connection.execute(text(f'DROP TABLE "{nama}"'))
+
+def perbarui_statistik(connection, daftar_tabel):
+    """ANALYZE partisi yang baru dimuat supaya planner tidak memakai statistik (atau ketiadaan statistik) lama."""
+    for nama in daftar_tabel:
+        connection.execute(text(f'ANALYZE "{nama}"'))
+
+def pensiunkan_partisi(connection, retensi_bulan=None, aksi=None):
+    """
+    Melepas ('detach', jadi tabel arsip_<nama>) atau menghapus ('drop') partisi yang lebih tua dari
+    retensi_bulan dihitung dari partisi terbaru. Kontribusinya dikeluarkan dari rollup laporan,
+    jadi rollup & sketsa tetap sama dengan isi tabel fakta. Mengembalikan list partisi yang dipensiunkan.
+    """
+    retensi_bulan = config.FAKTA_RETENSI_BULAN if retensi_bulan is None else retensi_bulan
+    aksi = aksi or config.FAKTA_RETENSI_AKSI
+    if not retensi_bulan:
+        return []
+    ada = daftar_partisi(connection)
+    if not ada:
+        return []
+    tertua = bulan_tertua_disimpan(max(ada), retensi_bulan)
+
+    dipensiunkan = []
+    for bulan in sorted(b for b in ada if b < tertua):
+        nama = ada[bulan]
+        aggregates.keluarkan_dari_agregat(connection, f'SELECT * FROM "{nama}"')
+        sketsa.hapus_bulan(connection, [bulan])
+        connection.execute(text(f'ALTER TABLE "{TABEL_FAKTA}" DETACH PARTITION "{nama}"'))
+        if aksi == 'drop':
+            connection.execute(text(f'DROP TABLE "{nama}"'))
+        else:
+            _arsipkan(connection, nama)
+        dipensiunkan.append(nama)
+    return dipensiunkan
+
+def hapus_semua_partisi(connection):
+    """Untuk reset: melepas & menghapus semua partisi (instan, tanpa TRUNCATE ... CASCADE pada data fakta)."""
+    if _jenis_tabel(connection) != 'p':
+        return 0
+    ada = daftar_partisi(connection)
+    for nama in ada.values():
+        connection.execute(text(f'ALTER TABLE "{TABEL_FAKTA}" DETACH PARTITION "{nama}"'))
+        connection.execute(text(f'DROP TABLE "{nama}"'))
+    return len(ada)
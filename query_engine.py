@@ -0,0 +1,138 @@
+import os
+import config
+
+# Mesin query embedded (DuckDB) untuk menjalankan query laporan langsung di atas file lake,
+# tanpa membebani server PostgreSQL. DuckDB adalah dependency opsional: hanya di-import saat dipakai.
+#
+# Query lake memakai view yang meniru aturan warehouse (lihat buka_koneksi_lake):
+#   fakta_penjualan = baris penjualan yang lolos load fakta (pelanggan & produk dikenal, id_order_detail
+#                     dobel -> baris terakhir, jendela retensi config.FAKTA_RETENSI_BULAN);
+#   dim_pelanggan   = versi aktif Dim_Pelanggan (status_sekarang = TRUE), nama_lengkap dibentuk
+#                     sama seperti etl_dim_pelanggan_scd2.
+# Satu perbedaan yang tidak bisa ditiru: lake hanya menyimpan snapshot pelanggan terkini, tanpa riwayat
+# SCD2. Warehouse menghitung penjualan per pelanggan_key yang aktif saat baris itu dimuat, dan laporan
+# Postgres hanya menghitung versi yang masih aktif; penjualan yang dimuat sebelum atribut pelanggannya
+# berubah (run inkremental) tidak ikut di top-10 / sentimen Postgres, tapi ikut di lake. Setelah
+# --full-rebuild (semua fakta menunjuk versi aktif) hasil kedua mesin sama.
+
+QUERY_LAKE = {
+    'penjualan_per_kategori': """
+        SELECT dp.kategori, SUM(fp.total_harga) AS total_penjualan
+        FROM fakta_penjualan fp JOIN produk dp ON fp.id_produk = dp.id_produk
+        GROUP BY dp.kategori ORDER BY total_penjualan DESC;
+    """,
+    'tren_bulanan': """
+        SELECT CAST(date_trunc('month', fp.tanggal_order) AS DATE) AS periode, SUM(fp.total_harga) AS total_penjualan
+        FROM fakta_penjualan fp
+        GROUP BY 1 ORDER BY 1;
+    """,
+    'top_10_pelanggan': """
+        SELECT p.nama_lengkap, SUM(fp.total_harga) AS total_belanja
+        FROM fakta_penjualan fp JOIN dim_pelanggan p ON fp.id_pelanggan = p.id_pelanggan
+        GROUP BY p.nama_lengkap
+        ORDER BY total_belanja DESC LIMIT 10;
+    """,
+    'sentimen_vs_penjualan': """
+        WITH
+            BelanjaPelanggan AS (
+                SELECT p.id_pelanggan, p.nama_lengkap, SUM(fp.total_harga) AS total_belanja
+                FROM fakta_penjualan fp JOIN dim_pelanggan p ON fp.id_pelanggan = p.id_pelanggan
+                GROUP BY p.id_pelanggan, p.nama_lengkap
+            ),
+            SentimenPelanggan AS (
+                -- Dataset sentimen append-only: ambil versi terbaru per file tweet
+                SELECT id_pelanggan, polarity, isi_tweet
+                FROM sentimen
+                QUALIFY ROW_NUMBER() OVER (PARTITION BY nama_file ORDER BY tgl_ekstrak DESC) = 1
+            )
+        SELECT bp.nama_lengkap, sp.polarity, bp.total_belanja, sp.isi_tweet
+        FROM SentimenPelanggan sp
+        JOIN BelanjaPelanggan bp ON sp.id_pelanggan = bp.id_pelanggan;
+    """,
+}
+
+# dtype registry skema (config.SKEMA_*) -> tipe kolom DuckDB untuk fallback CSV
+_TIPE_DUCKDB = {
+    'int16': 'SMALLINT', 'int32': 'INTEGER', 'int64': 'BIGINT', 'float64': 'DOUBLE',
+    'datetime64[ns]': 'TIMESTAMP', 'category': 'VARCHAR', 'string[pyarrow]': 'VARCHAR',
+}
+
+def _sql_sumber(nama):
+    """Ekspresi FROM untuk satu dataset: Parquet di zona curated jika ada, selain itu CSV terorganisir."""
+    folder_parquet = os.path.join(config.CURATED_PATH, nama)
+    if os.path.exists(os.path.join(folder_parquet, '_SUCCESS')):
+        return f"read_parquet('{folder_parquet}/**/*.parquet', hive_partitioning = true)"
+
+    meta = config.DATASET_LAKE[nama]
+    path_csv = os.path.join(config.ORGANIZED_PATH, 'csv', meta['csv'])
+    # Tipe kolom dari registry skema, jadi DuckDB tidak perlu menebak (sniffing) tipe dari isi file
+    kolom = ', '.join(f"'{k}': '{_TIPE_DUCKDB[meta['skema'][k]['dtype']]}'" for k in meta['kolom'])
+    return f"read_csv('{path_csv}', header = false, skip = 1, columns = {{{kolom}}})"
+
+def _sql_fakta_penjualan():
+    """
+    View penjualan dengan aturan load Fakta_Penjualan: hanya pelanggan & produk yang dikenal dimensi,
+    id_order_detail dobel -> baris terakhir di sumber, dan (jika diset) hanya config.FAKTA_RETENSI_BULAN
+    bulan terakhir dihitung dari bulan terbaru, seperti partisi yang dipensiunkan.
+    """
+    sql = """
+        WITH urut AS (SELECT *, ROW_NUMBER() OVER () AS urutan FROM penjualan),
+        dikenal AS (
+            SELECT u.* EXCLUDE (urutan), year(u.tanggal_order) * 12 + month(u.tanggal_order) AS nomor_bulan
+            FROM urut u
+            WHERE u.id_pelanggan IN (SELECT id_pelanggan FROM pelanggan)
+              AND u.id_produk IN (SELECT id_produk FROM produk)
+            QUALIFY ROW_NUMBER() OVER (PARTITION BY u.id_order_detail ORDER BY u.urutan DESC) = 1
+        )
+        SELECT * EXCLUDE (nomor_bulan) FROM dikenal
+    """
+    if config.FAKTA_RETENSI_BULAN:
+        sql += f" WHERE nomor_bulan > (SELECT MAX(nomor_bulan) FROM dikenal) - {int(config.FAKTA_RETENSI_BULAN)}"
+    return sql
+
+def buka_koneksi_lake():
+    """
+    Membuka koneksi DuckDB in-process dengan view penjualan/produk/pelanggan/sentimen di atas file lake,
+    plus fakta_penjualan & dim_pelanggan yang meniru aturan warehouse untuk query laporan.
+    """
+    import duckdb
+
+    con = duckdb.connect()
+    for nama in config.DATASET_LAKE:
+        con.execute(f"CREATE VIEW {nama} AS SELECT * FROM {_sql_sumber(nama)}")
+    con.execute(f"CREATE VIEW fakta_penjualan AS {_sql_fakta_penjualan()}")
+    # Sama dengan etl_dim_pelanggan_scd2: nama_depan + ' ' + nama_belakang
+    con.execute("CREATE VIEW dim_pelanggan AS SELECT *, nama_depan || ' ' || nama_belakang AS nama_lengkap FROM pelanggan")
+
+    folder_sentimen = os.path.join(config.CURATED_PATH, 'sentimen')
+    if os.path.isdir(folder_sentimen) and os.listdir(folder_sentimen):
+        con.execute(f"CREATE VIEW sentimen AS SELECT * FROM read_parquet('{folder_sentimen}/*.parquet')")
+    else:
+        # Belum ada tweet yang diproses: view kosong supaya query tetap valid
+        con.execute("""
+            CREATE VIEW sentimen AS
+            SELECT NULL::BIGINT AS id_pelanggan, NULL::VARCHAR AS nama_file, NULL::VARCHAR AS isi_tweet,
+                   NULL::DOUBLE AS polarity, NULL::TIMESTAMP AS tgl_ekstrak
+            WHERE FALSE
+        """)
+    return con
+
+def adalah_koneksi_lake(sumber):
+    """True jika 'sumber' adalah koneksi DuckDB (bukan engine SQLAlchemy)."""
+    return type(sumber).__module__.startswith('duckdb')
+
+def jalankan_query_lake(con, nama_laporan):
+    """Menjalankan query laporan versi lake dan mengembalikan DataFrame."""
+    return con.execute(QUERY_LAKE[nama_laporan]).df()
+
+def sidik_jari_lake():
+    """Versi input untuk mode lake: mtime penanda _SUCCESS tiap dataset + daftar batch sentimen."""
+    versi = {}
+    for nama in config.DATASET_LAKE:
+        penanda = os.path.join(config.CURATED_PATH, nama, '_SUCCESS')
+        path_csv = os.path.join(config.ORGANIZED_PATH, 'csv', config.DATASET_LAKE[nama]['csv'])
+        path = penanda if os.path.exists(penanda) else path_csv
+        versi[nama] = os.path.getmtime(path) if os.path.exists(path) else None
+    folder_sentimen = os.path.join(config.CURATED_PATH, 'sentimen')
+    versi['sentimen'] = sorted(os.listdir(folder_sentimen)) if os.path.isdir(folder_sentimen) else []
+    return versi
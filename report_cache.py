@@ -0,0 +1,58 @@
+import hashlib
+import json
+import os
+import threading
+import config
+
+# Cache hasil laporan: kunci = hash(query + versi tabel input).
+# Jika kunci sama dengan run sebelumnya, query, penulisan ke Data Mart dan render grafik dilewati.
+
+_kunci_lock = threading.Lock()
+_statistik = {'hit': 0, 'miss': 0}
+
+def _baca_cache():
+    if not os.path.exists(config.REPORT_CACHE_FILE):
+        return {}
+    with open(config.REPORT_CACHE_FILE, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+def _tulis_cache(cache):
+    os.makedirs(os.path.dirname(config.REPORT_CACHE_FILE), exist_ok=True)
+    path_tmp = config.REPORT_CACHE_FILE + '.tmp'
+    with open(path_tmp, 'w', encoding='utf-8') as file:
+        json.dump(cache, file, indent=2, default=str)
+    os.replace(path_tmp, config.REPORT_CACHE_FILE)
+
+def hitung_kunci(query, versi_input):
+    """Kunci cache dari teks query dan versi/checksum tabel-tabel inputnya."""
+    isi = json.dumps({'query': query, 'versi': versi_input}, sort_keys=True, default=str)
+    return hashlib.sha256(isi.encode('utf-8')).hexdigest()
+
+def cek(nama_laporan, kunci):
+    """True jika kunci sama dengan run terakhir dan output-nya masih ada. Menghitung hit/miss."""
+    with _kunci_lock:
+        entri = _baca_cache().get(nama_laporan)
+        hit = (entri is not None and entri['kunci'] == kunci
+               and (entri.get('output') is None or os.path.exists(entri['output'])))
+        _statistik['hit' if hit else 'miss'] += 1
+    return hit
+
+def simpan(nama_laporan, kunci, output=None):
+    """Mencatat kunci (dan path output-nya) setelah laporan berhasil dibuat."""
+    with _kunci_lock:
+        cache = _baca_cache()
+        cache[nama_laporan] = {'kunci': kunci, 'output': output}
+        _tulis_cache(cache)
+
+def output_terakhir(nama_laporan):
+    """Path output dari run terakhir yang tercatat (mis. untuk dikembalikan saat cache hit)."""
+    entri = _baca_cache().get(nama_laporan)
+    return entri.get('output') if entri else None
+
+def statistik():
+    """Jumlah cache hit/miss sejak proses dimulai."""
+    return dict(_statistik)
+
+def reset_statistik():
+    _statistik['hit'] = 0
+    _statistik['miss'] = 0
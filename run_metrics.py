@@ -0,0 +1,313 @@
+import contextvars
+import functools
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from contextlib import contextmanager
+from datetime import datetime
+import config
+
+try:
+    import resource
+except ImportError:  # Windows: tidak ada getrusage, RSS puncak worker tidak dicatat
+    resource = None
+
+# Instrumentasi per tahap ETL / laporan: waktu wall & CPU, RSS, baris dibaca/ditulis
+# dan byte yang dibaca dari config.ORGANIZED_PATH. Setiap run disimpan ke JSON dan ke tabel
+# config.RUN_METRICS_TABLE di warehouse supaya hot path & regresi antar-run terlihat.
+# CPU & RSS worker ProcessPool hanya terhitung jika tugasnya dikirim lewat kirim()/petakan(),
+# yang mengatribusikannya ke tahap pengirim (bukan ke semua tahap yang kebetulan sedang berjalan).
+
+_pengukuran_aktif = contextvars.ContextVar('pengukuran_aktif', default=None)
+_KUNCI = threading.Lock()
+_run = {'id_run': None, 'jenis': None, 'mulai': None, 'tahap': []}
+_run_terakhir = {}
+
+class _Pengukuran:
+    def __init__(self, nama, jenis):
+        self.nama = nama
+        self.jenis = jenis
+        self.status = 'sukses'
+        self.error = None
+        self.baris_dibaca = 0
+        self.baris_ditulis = 0
+        self.bytes_dibaca = 0
+        self.cpu_worker = 0.0
+        self.rss_proses_puncak = 0.0
+        self.rss_worker_puncak = 0.0
+        self.kunci = threading.Lock()
+
+    def amati_rss(self, rss_mb):
+        with self.kunci:
+            self.rss_proses_puncak = max(self.rss_proses_puncak, rss_mb)
+
+    def catat_worker(self, cpu_detik, rss_mb):
+        with self.kunci:
+            self.cpu_worker += cpu_detik
+            self.rss_worker_puncak = max(self.rss_worker_puncak, rss_mb)
+
+# --- RSS: disampel selama tahap berjalan, bukan high-water mark sepanjang umur proses ---
+_aktif = set()
+_sampler = None
+
+def _rss_mb():
+    """RSS proses saat ini (MB) dari /proc/self/statm; di luar Linux jatuh ke high-water mark getrusage."""
+    try:
+        with open('/proc/self/statm', 'r') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+    except (OSError, ValueError, IndexError):
+        if resource is None:
+            return 0.0
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _sampel_rss():
+    """Thread sampler: memperbarui RSS puncak semua tahap aktif, berhenti saat tidak ada tahap aktif."""
+    global _sampler
+    while True:
+        with _KUNCI:
+            if not _aktif:
+                _sampler = None
+                return
+            daftar = list(_aktif)
+        rss = _rss_mb()
+        for pengukuran in daftar:
+            pengukuran.amati_rss(rss)
+        time.sleep(config.RUN_METRICS_INTERVAL_RSS)
+
+def _aktifkan(pengukuran):
+    global _sampler
+    pengukuran.amati_rss(_rss_mb())
+    with _KUNCI:
+        _aktif.add(pengukuran)
+        if _sampler is None:
+            _sampler = threading.Thread(target=_sampel_rss, name='run_metrics_rss', daemon=True)
+            _sampler.start()
+
+def _nonaktifkan(pengukuran):
+    with _KUNCI:
+        _aktif.discard(pengukuran)
+    pengukuran.amati_rss(_rss_mb())
+
+# --- CPU & RSS worker ProcessPool, diatribusikan ke tahap yang mengirim tugasnya ---
+def _panggil_terukur(fungsi, *args):
+    """Dijalankan di proses worker: (hasil, detik CPU panggilan ini, RSS puncak worker dalam MB)."""
+    mulai = time.process_time()
+    hasil = fungsi(*args)
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 if resource is not None else 0.0
+    return hasil, time.process_time() - mulai, rss
+
+def kirim(executor, fungsi, *args):
+    """
+    Seperti executor.submit untuk ProcessPool, tapi CPU & RSS puncak worker dicatat ke tahap aktif
+    pemanggil. Mengembalikan Future berisi hasil fungsi (exception worker diteruskan apa adanya).
+    """
+    pengukuran = _pengukuran_aktif.get()
+    luar = Future()
+
+    def selesai(dalam):
+        try:
+            hasil, cpu, rss = dalam.result()
+        except BaseException as e:
+            luar.set_exception(e)
+            return
+        if pengukuran is not None:
+            pengukuran.catat_worker(cpu, rss)
+        luar.set_result(hasil)
+
+    executor.submit(_panggil_terukur, fungsi, *args).add_done_callback(selesai)
+    return luar
+
+def petakan(executor, fungsi, daftar):
+    """Seperti list(executor.map(fungsi, daftar)), dengan CPU & RSS worker dicatat ke tahap aktif."""
+    pengukuran = _pengukuran_aktif.get()
+    hasil = []
+    for nilai, cpu, rss in executor.map(functools.partial(_panggil_terukur, fungsi), daftar):
+        if pengukuran is not None:
+            pengukuran.catat_worker(cpu, rss)
+        hasil.append(nilai)
+    return hasil
+
+def mulai_run(jenis):
+    """Memulai run baru ('etl' / 'laporan'); semua tahap yang diukur setelahnya masuk ke run ini."""
+    with _KUNCI:
+        _run.update(id_run=f"{datetime.now():%Y%m%d_%H%M%S}_{uuid.uuid4().hex[:6]}", jenis=jenis,
+                    mulai=datetime.now(), tahap=[])
+    return _run['id_run']
+
+@contextmanager
+def ukur(nama, jenis='etl'):
+    """
+    Mengukur satu tahap. CPU = waktu CPU thread tahap ini + CPU worker ProcessPool yang tugasnya
+    dikirim tahap ini lewat kirim()/petakan().
+    rss_proses_puncak_mb adalah RSS puncak seluruh proses yang teramati selama tahap berjalan
+    (disampel tiap config.RUN_METRICS_INTERVAL_RSS detik), jadi ikut memuat tahap lain yang berjalan
+    bersamaan; rss_worker_puncak_mb adalah RSS puncak worker ProcessPool milik tahap ini (termasuk
+    halaman yang dibagi dengan proses induk lewat fork).
+    """
+    pengukuran = _Pengukuran(nama, jenis)
+    token = _pengukuran_aktif.set(pengukuran)
+    mulai_tgl = datetime.now()
+    mulai_wall = time.perf_counter()
+    mulai_cpu = time.thread_time()
+    _aktifkan(pengukuran)
+    try:
+        yield pengukuran
+    except BaseException as e:
+        catat_error(e)
+        raise
+    finally:
+        _pengukuran_aktif.reset(token)
+        _nonaktifkan(pengukuran)
+        hasil = {
+            'id_run': _run['id_run'], 'jenis': jenis, 'tahap': nama, 'status': pengukuran.status, 'error': pengukuran.error,
+            'mulai': mulai_tgl.isoformat(),
+            'durasi_detik': round(time.perf_counter() - mulai_wall, 4),
+            'cpu_detik': round(time.thread_time() - mulai_cpu + pengukuran.cpu_worker, 4),
+            'rss_proses_puncak_mb': round(pengukuran.rss_proses_puncak, 1),
+            'rss_worker_puncak_mb': round(pengukuran.rss_worker_puncak, 1),
+            'baris_dibaca': pengukuran.baris_dibaca,
+            'baris_ditulis': pengukuran.baris_ditulis,
+            'bytes_dibaca': pengukuran.bytes_dibaca,
+        }
+        with _KUNCI:
+            _run['tahap'].append(hasil)
+
+def instrumentasi(nama, jenis='etl'):
+    """Decorator: membungkus fungsi tahap dengan ukur(nama, jenis)."""
+    def dekorator(fungsi):
+        @functools.wraps(fungsi)
+        def pembungkus(*args, **kwargs):
+            with ukur(nama, jenis):
+                return fungsi(*args, **kwargs)
+        return pembungkus
+    return dekorator
+
+def catat_baca(baris=0, bytes_dibaca=0):
+    """Menambah hitungan baris/byte yang dibaca tahap aktif (diabaikan di luar tahap yang diukur)."""
+    pengukuran = _pengukuran_aktif.get()
+    if pengukuran is not None:
+        with pengukuran.kunci:
+            pengukuran.baris_dibaca += int(baris)
+            pengukuran.bytes_dibaca += int(bytes_dibaca)
+
+def catat_tulis(baris):
+    pengukuran = _pengukuran_aktif.get()
+    if pengukuran is not None:
+        with pengukuran.kunci:
+            pengukuran.baris_ditulis += int(baris)
+
+def catat_file(path):
+    """Mencatat ukuran file sebagai byte dibaca jika file berada di bawah config.ORGANIZED_PATH."""
+    if os.path.abspath(path).startswith(os.path.abspath(config.ORGANIZED_PATH) + os.sep):
+        catat_baca(bytes_dibaca=os.path.getsize(path))
+
+def catat_error(e):
+    """
+    Menandai tahap aktif gagal. Dipanggil juga dari blok except yang menelan error,
+    jadi kegagalan tetap tercatat walaupun tahapnya tidak melempar exception.
+    """
+    pengukuran = _pengukuran_aktif.get()
+    if pengukuran is not None:
+        pengukuran.status = 'gagal'
+        pengukuran.error = f"{type(e).__name__}: {e}"[:1000]
+
+def hasil_tahap(nama):
+    """Metrik terakhir tahap 'nama' di run aktif (None jika belum diukur)."""
+    with _KUNCI:
+        for hasil in reversed(_run['tahap']):
+            if hasil['tahap'] == nama:
+                return dict(hasil)
+    return None
+
+def run_terakhir(jenis):
+    """Metrik run terakhir yang disimpan di proses ini untuk jenis tersebut (dipakai benchmark)."""
+    return _run_terakhir.get(jenis)
+
+def _path_json(id_run):
+    return os.path.join(config.RUN_METRICS_PATH, f"{id_run}.json")
+
+def _run_sebelumnya(jenis, id_run):
+    """Metrik run sebelumnya dengan jenis yang sama (dari file JSON), atau None."""
+    for path in sorted(glob.glob(os.path.join(config.RUN_METRICS_PATH, '*.json')), reverse=True):
+        if os.path.basename(path) == f"{id_run}.json":
+            continue
+        with open(path, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+        if data.get('jenis') == jenis:
+            return data
+    return None
+
+def _tulis_tabel(engine, daftar_tahap):
+    import pandas as pd
+    from sqlalchemy import text
+    import database
+    with engine.begin() as connection:
+        connection.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS {config.RUN_METRICS_TABLE} (
+                id_run TEXT NOT NULL,
+                jenis TEXT NOT NULL,
+                tahap TEXT NOT NULL,
+                status TEXT,
+                error TEXT,
+                mulai TIMESTAMP,
+                durasi_detik DOUBLE PRECISION,
+                cpu_detik DOUBLE PRECISION,
+                rss_proses_puncak_mb DOUBLE PRECISION,
+                rss_worker_puncak_mb DOUBLE PRECISION,
+                baris_dibaca BIGINT,
+                baris_ditulis BIGINT,
+                bytes_dibaca BIGINT,
+                PRIMARY KEY (id_run, tahap)
+            )
+        """))
+        # Tabel dari versi lama: rss_puncak_mb (high-water mark proses) diganti dua kolom di atas
+        for kolom in ('rss_proses_puncak_mb', 'rss_worker_puncak_mb'):
+            connection.execute(text(f"ALTER TABLE {config.RUN_METRICS_TABLE} ADD COLUMN IF NOT EXISTS {kolom} DOUBLE PRECISION"))
+        df = pd.DataFrame(daftar_tahap)
+        df['mulai'] = pd.to_datetime(df['mulai'])
+        database.bulk_load(df, config.RUN_METRICS_TABLE, connection)
+
+def cetak_ringkasan(data, sebelumnya=None):
+    """Tabel ringkas per tahap (terlama dulu), dengan selisih durasi terhadap run sebelumnya."""
+    durasi_lama = {t['tahap']: t['durasi_detik'] for t in (sebelumnya or {}).get('tahap', [])}
+    print(f"\n📈 Metrik run {data['id_run']} ({data['jenis']}):")
+    print(f"   {'tahap':<24}{'status':<8}{'wall(s)':>9}{'cpu(s)':>9}{'rss proses':>11}{'rss worker':>11}{'baca':>11}{'tulis':>11}{'MB baca':>9}  vs run lalu")
+    for t in sorted(data['tahap'], key=lambda t: t['durasi_detik'], reverse=True):
+        selisih = ''
+        lama = durasi_lama.get(t['tahap'])
+        if lama:
+            persen = (t['durasi_detik'] - lama) / lama * 100
+            selisih = f"{persen:+.0f}%" + ('  ⚠️ regresi' if persen > config.RUN_METRICS_AMBANG_REGRESI and t['durasi_detik'] - lama > 1 else '')
+        print(f"   {t['tahap']:<24}{t['status']:<8}{t['durasi_detik']:>9.2f}{t['cpu_detik']:>9.2f}{t['rss_proses_puncak_mb']:>11.0f}{t['rss_worker_puncak_mb']:>11.0f}"
+              f"{t['baris_dibaca']:>11,}{t['baris_ditulis']:>11,}{t['bytes_dibaca'] / 1e6:>9.1f}  {selisih}")
+
+def simpan_run(engine=None):
+    """
+    Menyimpan metrik run aktif ke config.RUN_METRICS_PATH/<id_run>.json dan, jika engine diberikan,
+    ke tabel config.RUN_METRICS_TABLE. Mengembalikan dict metrik run.
+    """
+    with _KUNCI:
+        data = {'id_run': _run['id_run'], 'jenis': _run['jenis'],
+                'mulai': _run['mulai'].isoformat() if _run['mulai'] else None,
+                'selesai': datetime.now().isoformat(), 'tahap': list(_run['tahap'])}
+    _run_terakhir[data['jenis']] = data
+    if not data['id_run'] or not data['tahap']:
+        return data
+
+    os.makedirs(config.RUN_METRICS_PATH, exist_ok=True)
+    sebelumnya = _run_sebelumnya(data['jenis'], data['id_run'])
+    with open(_path_json(data['id_run']), 'w', encoding='utf-8') as file:
+        json.dump(data, file, indent=2)
+    cetak_ringkasan(data, sebelumnya)
+
+    if engine is not None:
+        try:
+            _tulis_tabel(engine, data['tahap'])
+        except Exception as e:
+            # Metrik tidak boleh menggagalkan pipeline; file JSON sudah tersimpan
+            print(f"⚠️ Gagal menyimpan metrik ke tabel {config.RUN_METRICS_TABLE}: {e}")
+    return data
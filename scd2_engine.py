@@ -0,0 +1,96 @@
+from datetime import date
+from sqlalchemy import text
+import database
+import run_metrics
+
+# Penanda NULL di dalam hash supaya (NULL, 'a') dan ('a', NULL) tidak bertabrakan
+_PENANDA_NULL = '\\N'
+
+def _tipe_kolom(connection, nama_tabel):
+    """Mengambil {kolom: tipe lengkap} dari tabel target, mis. 'numeric(19,4)'."""
+    rows = connection.execute(text("""
+        SELECT a.attname, format_type(a.atttypid, a.atttypmod)
+        FROM pg_attribute a
+        WHERE a.attrelid = CAST(:nama_tabel AS regclass) AND a.attnum > 0 AND NOT a.attisdropped
+    """), {'nama_tabel': f'"{nama_tabel}"'}).fetchall()
+    return {row[0]: row[1] for row in rows}
+
+def _ekspresi_hash(alias, kolom_dilacak, tipe):
+    """
+    Ekspresi SQL md5 atas atribut yang dilacak.
+    Nilai di-CAST ke tipe kolom target dulu supaya sumber (hasil to_sql, mis. double precision)
+    dan target (mis. numeric(19,4)) menghasilkan teks -> hash yang sama.
+    """
+    bagian = [f"COALESCE(CAST({alias}.\"{k}\" AS {tipe[k]})::text, '{_PENANDA_NULL}')" for k in kolom_dilacak]
+    return f"md5(concat_ws('||', {', '.join(bagian)}))"
+
+def terapkan_scd2(engine_st, df_sumber, nama_tabel, kolom_bisnis, kolom_dilacak,
+                  tanggal_efektif=None, tanggal_mulai_awal='1900-01-01'):
+    """
+    Engine SCD Tipe 2 berbasis hash-diff dan SQL set-based.
+    Tabel target wajib punya kolom tanggal_mulai, tanggal_akhir, status_sekarang dan kunci surrogate
+    sendiri (kolom_bisnis tidak boleh unik), dan setiap join ke dimensi itu harus memfilter
+    status_sekarang = TRUE (kolom hash_baris ditambahkan otomatis jika belum ada).
+    Saat ini hanya Dim_Pelanggan yang memenuhi syarat tersebut.
+
+    1. Sumber di-bulk-load ke temp table (ON COMMIT DROP: privat per sesi, hilang saat commit/rollback
+       atau koneksi putus, jadi run paralel tidak bertabrakan dan crash tidak meninggalkan sisa).
+    2. Hash atribut yang dilacak dibandingkan dengan hash versi aktif di target.
+    3. Versi lama yang berubah di-expire dan versi baru di-insert dengan UPDATE ... FROM
+       dan INSERT ... SELECT, semuanya dalam satu transaksi.
+    Mengembalikan (jumlah_expire, jumlah_insert).
+    """
+    tanggal_efektif = tanggal_efektif or date.today()
+    tabel_stg = f"_scd2_{nama_tabel.lower()}"
+    kolom_sumber = [kolom_bisnis] + [k for k in kolom_dilacak if k != kolom_bisnis]
+    daftar_kolom = ', '.join(f'"{k}"' for k in kolom_sumber)
+    kolom_s = ', '.join(f's."{k}"' for k in kolom_sumber)
+    params = {'tanggal_efektif': tanggal_efektif, 'tanggal_mulai_awal': tanggal_mulai_awal}
+
+    with engine_st.begin() as connection:
+        connection.execute(text(f'ALTER TABLE "{nama_tabel}" ADD COLUMN IF NOT EXISTS hash_baris TEXT'))
+        tipe = _tipe_kolom(connection, nama_tabel)
+
+        # 1. Stage sumber (COPY) ke temp table bertipe kolom target, lalu hitung hash-nya di SQL
+        connection.execute(text(f"""
+            CREATE TEMP TABLE {tabel_stg} ON COMMIT DROP AS
+            SELECT {daftar_kolom}, hash_baris FROM "{nama_tabel}" WITH NO DATA
+        """))
+        df_stg = df_sumber[kolom_sumber].drop_duplicates(subset=[kolom_bisnis], keep='last')
+        database.bulk_load(df_stg, tabel_stg, connection)
+        connection.execute(text(f"UPDATE {tabel_stg} s SET hash_baris = {_ekspresi_hash('s', kolom_dilacak, tipe)}"))
+        connection.execute(text(f'CREATE INDEX ON {tabel_stg} ("{kolom_bisnis}")'))
+
+        # Versi aktif lama yang belum punya hash (dimuat sebelum engine ini ada) di-backfill sekali
+        connection.execute(text(f"""
+            UPDATE "{nama_tabel}" t SET hash_baris = {_ekspresi_hash('t', kolom_dilacak, tipe)}
+            WHERE t.status_sekarang = TRUE AND t.hash_baris IS NULL
+        """))
+
+        # 2. Expire versi aktif yang hash-nya berbeda dengan sumber
+        jumlah_expire = connection.execute(text(f"""
+            UPDATE "{nama_tabel}" t
+            SET status_sekarang = FALSE, tanggal_akhir = :tanggal_efektif
+            FROM {tabel_stg} s
+            WHERE t."{kolom_bisnis}" = s."{kolom_bisnis}"
+              AND t.status_sekarang = TRUE
+              AND t.hash_baris IS DISTINCT FROM s.hash_baris
+        """), params).rowcount
+
+        # 3. Insert versi baru: kunci baru (mulai 1900-01-01) dan kunci yang barusan di-expire (mulai hari ini)
+        jumlah_insert = connection.execute(text(f"""
+            INSERT INTO "{nama_tabel}" ({daftar_kolom}, tanggal_mulai, tanggal_akhir, status_sekarang, hash_baris)
+            SELECT {kolom_s},
+                   CASE WHEN EXISTS (SELECT 1 FROM "{nama_tabel}" h WHERE h."{kolom_bisnis}" = s."{kolom_bisnis}")
+                        THEN CAST(:tanggal_efektif AS DATE) ELSE CAST(:tanggal_mulai_awal AS DATE) END,
+                   DATE '9999-12-31', TRUE, s.hash_baris
+            FROM {tabel_stg} s
+            LEFT JOIN "{nama_tabel}" t ON t."{kolom_bisnis}" = s."{kolom_bisnis}" AND t.status_sekarang = TRUE
+            WHERE t."{kolom_bisnis}" IS NULL
+        """), params).rowcount
+
+        if jumlah_expire or jumlah_insert:
+            database.tandai_tabel_berubah(connection, nama_tabel)
+    run_metrics.catat_tulis(jumlah_expire + jumlah_insert)
+
+    return jumlah_expire, jumlah_insert
@@ -0,0 +1,85 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# Status yang mungkin untuk setiap tahap
+SUKSES = 'sukses'
+GAGAL = 'gagal'
+DILEWATI = 'dilewati'
+
+def _validasi_dag(tahapan):
+    """Memastikan semua dependensi terdaftar dan tidak ada siklus."""
+    for nama, (_, deps) in tahapan.items():
+        for dep in deps:
+            if dep not in tahapan:
+                raise ValueError(f"Tahap '{nama}' bergantung pada tahap '{dep}' yang tidak terdaftar.")
+
+    # Deteksi siklus dengan DFS sederhana
+    sedang, selesai = set(), set()
+    def kunjungi(nama):
+        if nama in selesai:
+            return
+        if nama in sedang:
+            raise ValueError(f"Terdapat siklus dependensi yang melibatkan tahap '{nama}'.")
+        sedang.add(nama)
+        for dep in tahapan[nama][1]:
+            kunjungi(dep)
+        sedang.discard(nama)
+        selesai.add(nama)
+    for nama in tahapan:
+        kunjungi(nama)
+
+def _jalankan_tahap(nama, fungsi):
+    """Menjalankan satu tahap dan mengembalikan durasinya (detik)."""
+    mulai = time.perf_counter()
+    fungsi()
+    return time.perf_counter() - mulai
+
+def jalankan_dag(tahapan, max_workers=4):
+    """
+    Menjalankan tahapan pipeline sebagai DAG di thread pool terbatas.
+    tahapan: dict {nama: (callable_tanpa_argumen, [nama_dependensi, ...])}
+    Tahap dijalankan begitu semua dependensinya sukses. Jika satu tahap gagal,
+    hanya tahap-tahap hilirnya yang dilewati; cabang lain tetap jalan.
+    Mengembalikan dict {nama: status}.
+    """
+    _validasi_dag(tahapan)
+    status = {}
+    belum = dict(tahapan)
+    berjalan = {}
+    mulai_total = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='etl') as executor:
+        while belum or berjalan:
+            # Jadwalkan (atau lewati) semua tahap yang dependensinya sudah punya status
+            ada_perubahan = True
+            while ada_perubahan:
+                ada_perubahan = False
+                for nama in list(belum):
+                    fungsi, deps = belum[nama]
+                    if any(status.get(dep) in (GAGAL, DILEWATI) for dep in deps):
+                        status[nama] = DILEWATI
+                        del belum[nama]
+                        ada_perubahan = True
+                        print(f"⏭️  Tahap '{nama}' dilewati karena dependensinya gagal.")
+                    elif all(status.get(dep) == SUKSES for dep in deps):
+                        berjalan[executor.submit(_jalankan_tahap, nama, fungsi)] = nama
+                        del belum[nama]
+
+            if not berjalan:
+                break
+
+            selesai, _ = wait(berjalan, return_when=FIRST_COMPLETED)
+            for future in selesai:
+                nama = berjalan.pop(future)
+                try:
+                    durasi = future.result()
+                    status[nama] = SUKSES
+                    print(f"⏱️  Tahap '{nama}' selesai dalam {durasi:.2f} dtk.")
+                except Exception as e:
+                    status[nama] = GAGAL
+                    print(f"❌ Tahap '{nama}' GAGAL: {e}")
+
+    durasi_total = time.perf_counter() - mulai_total
+    jumlah_sukses = sum(1 for s in status.values() if s == SUKSES)
+    print(f"\n⏱️  DAG selesai dalam {durasi_total:.2f} dtk ({jumlah_sukses}/{len(tahapan)} tahap sukses).")
+    return status
@@ -0,0 +1,106 @@
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from sqlalchemy import text
+import config
+import database
+import run_metrics
+
+def hash_teks(teks):
+    """Hash SHA-256 dari teks, dipakai sebagai kunci memoization sentimen."""
+    return hashlib.sha256(teks.encode('utf-8')).hexdigest()
+
+def _skor_batch(daftar_teks):
+    """Menghitung (polarity, subjectivity) untuk satu batch teks. Level modul supaya bisa di-pickle."""
+    from textblob import TextBlob  # import berat, hanya dimuat di worker yang benar-benar menghitung skor
+    hasil = []
+    for teks in daftar_teks:
+        sentimen = TextBlob(teks).sentiment  # cukup dihitung sekali per teks
+        hasil.append((sentimen.polarity, sentimen.subjectivity))
+    return hasil
+
+def _baca_cache(engine_st, daftar_hash):
+    """Mengambil skor yang sudah pernah dihitung dari tabel cache untuk hash yang diminta."""
+    try:
+        with engine_st.connect() as connection:
+            rows = connection.execute(
+                text(f"SELECT hash_teks, polarity, subjectivity FROM {config.SENTIMEN_CACHE_TABLE} WHERE hash_teks = ANY(:daftar_hash)"),
+                {'daftar_hash': list(daftar_hash)}
+            ).fetchall()
+        return {row[0]: (row[1], row[2]) for row in rows}
+    except Exception:
+        # Tabel cache belum ada -> semua teks dianggap baru
+        return {}
+
+def _pastikan_tabel_cache(connection):
+    """
+    Tabel cache dengan primary key pada hash_teks. Tabel lama tanpa primary key (dibuat pandas)
+    dibersihkan dari hash dobel lalu diberi primary key sekali.
+    """
+    tabel = config.SENTIMEN_CACHE_TABLE
+    connection.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {tabel} (
+            hash_teks TEXT PRIMARY KEY,
+            polarity DOUBLE PRECISION,
+            subjectivity DOUBLE PRECISION
+        )
+    """))
+    ada_pk = connection.execute(text("""
+        SELECT 1 FROM pg_constraint WHERE conrelid = to_regclass(:tabel) AND contype = 'p'
+    """), {'tabel': tabel}).scalar()
+    if not ada_pk:
+        connection.execute(text(f"DELETE FROM {tabel} a USING {tabel} b WHERE a.hash_teks = b.hash_teks AND a.ctid < b.ctid"))
+        connection.execute(text(f"ALTER TABLE {tabel} ADD PRIMARY KEY (hash_teks)"))
+
+def _simpan_cache(engine_st, df_cache):
+    """
+    Menyimpan skor baru: COPY ke temp table lalu INSERT ... ON CONFLICT DO NOTHING, jadi teks yang
+    sama yang dihitung dua kali (atau oleh run lain bersamaan) tidak menghasilkan baris dobel.
+    """
+    tabel = config.SENTIMEN_CACHE_TABLE
+    with engine_st.begin() as connection:
+        _pastikan_tabel_cache(connection)
+        connection.execute(text(f"CREATE TEMP TABLE _cache_sentimen_baru ON COMMIT DROP AS SELECT * FROM {tabel} WITH NO DATA"))
+        database.bulk_load(df_cache, '_cache_sentimen_baru', connection)
+        jumlah = connection.execute(text(f"""
+            INSERT INTO {tabel} (hash_teks, polarity, subjectivity)
+            SELECT hash_teks, polarity, subjectivity FROM _cache_sentimen_baru
+            ON CONFLICT (hash_teks) DO NOTHING
+        """)).rowcount
+    run_metrics.catat_tulis(jumlah)
+
+def skor_sentimen(engine_st, daftar_teks, max_workers=None, ukuran_batch=None):
+    """
+    Menghitung sentimen untuk banyak teks sekaligus.
+    Teks identik (berdasarkan hash) hanya dihitung sekali; hasil lama diambil dari
+    tabel cache, sisanya dibagi per batch ke process pool lalu disimpan ke cache.
+    Mengembalikan list (polarity, subjectivity) sesuai urutan input.
+    """
+    workers = max_workers or config.SENTIMEN_MAX_WORKERS
+    ukuran_batch = ukuran_batch or config.SENTIMEN_BATCH_SIZE
+
+    daftar_hash = [hash_teks(teks) for teks in daftar_teks]
+    teks_unik = dict(zip(daftar_hash, daftar_teks))
+    cache = _baca_cache(engine_st, teks_unik)
+
+    hash_baru = [h for h in teks_unik if h not in cache]
+    print(f"  -> Sentimen: {len(daftar_teks)} teks, {len(teks_unik)} unik, {len(teks_unik) - len(hash_baru)} dari cache.")
+
+    if hash_baru:
+        batches = [[teks_unik[h] for h in hash_baru[i:i + ukuran_batch]] for i in range(0, len(hash_baru), ukuran_batch)]
+        if workers > 1 and len(batches) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                hasil_batches = run_metrics.petakan(executor, _skor_batch, batches)
+        else:
+            hasil_batches = [_skor_batch(batch) for batch in batches]
+        skor_baru = [skor for hasil in hasil_batches for skor in hasil]
+
+        df_cache = pd.DataFrame({
+            'hash_teks': hash_baru,
+            'polarity': [skor[0] for skor in skor_baru],
+            'subjectivity': [skor[1] for skor in skor_baru],
+        })
+        _simpan_cache(engine_st, df_cache)
+        cache.update(zip(hash_baru, skor_baru))
+
+    return [cache[h] for h in daftar_hash]
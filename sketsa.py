@@ -0,0 +1,262 @@
+import time
+import zlib
+import numpy as np
+import pandas as pd
+from sqlalchemy import text, inspect as sa_inspect
+import config
+import database
+
+# Sketsa ringkas yang bisa di-merge untuk laporan perkiraan di atas Fakta_Penjualan.
+# Satu baris config.SKETSA_TABLE per (bulan id_waktu, id_lokasi, kategori) berisi:
+#   - HyperLogLog pelanggan_key (pelanggan unik; galat baku 1.04 / sqrt(2^presisi)),
+#   - sketsa kuantil total_harga berbasis bucket logaritmik (gaya DDSketch): setiap nilai masuk ke
+#     bucket ceil(log_gamma(x)), gamma = (1 + alpha) / (1 - alpha), sehingga setiap kuantil yang dibaca
+#     punya galat relatif paling besar alpha. Merge = menjumlahkan hitungan bucket.
+# Sketsa bulan yang disentuh load fakta dibangun ulang dari partisi bulannya di transaksi load yang sama,
+# jadi koreksi/hapus baris tetap tercermin (HLL tidak bisa dikurangi). Laporan cukup me-merge sketsa kecil ini.
+
+TABEL_SKETSA = config.SKETSA_TABLE
+_BITS_HASH = 64
+
+# --- HyperLogLog (vektor: banyak grup sekaligus, register 2D [grup, 2^presisi]) ---
+def _hash64(nilai):
+    """splitmix64 per elemen; input integer, hasil uint64 yang tersebar merata."""
+    z = np.asarray(nilai, dtype=np.int64).astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+def _panjang_bit(x):
+    """int.bit_length() per elemen untuk array uint64 (eksak, tanpa log2 floating point)."""
+    x = x.copy()
+    n = np.zeros(len(x), dtype=np.int64)
+    for geser in (32, 16, 8, 4, 2, 1):
+        besar = x >= (np.uint64(1) << np.uint64(geser))
+        n[besar] += geser
+        x[besar] >>= np.uint64(geser)
+    return n + (x > 0)
+
+def register_hll(kode_grup, jumlah_grup, nilai, presisi):
+    """Register HLL [jumlah_grup, 2^presisi] (uint8) dari nilai per baris dan kode grupnya (0..jumlah_grup-1)."""
+    m = 1 << presisi
+    h = _hash64(nilai)
+    indeks = (h >> np.uint64(_BITS_HASH - presisi)).astype(np.int64)
+    sisa = h & np.uint64((1 << (_BITS_HASH - presisi)) - 1)
+    # rank = jumlah nol di depan pada (64 - presisi) bit sisanya + 1
+    rank = (_BITS_HASH - presisi) - _panjang_bit(sisa) + 1
+    register = np.zeros(jumlah_grup * m, dtype=np.uint8)
+    maks = pd.Series(rank).groupby(np.asarray(kode_grup, dtype=np.int64) * m + indeks).max()
+    register[maks.index.to_numpy()] = maks.to_numpy()
+    return register.reshape(jumlah_grup, m)
+
+def estimasi_hll(register):
+    """Perkiraan kardinalitas per baris register 2D (dengan koreksi linear counting untuk kardinalitas kecil)."""
+    register = np.atleast_2d(register)
+    m = register.shape[1]
+    alpha_m = 0.7213 / (1 + 1.079 / m)
+    mentah = alpha_m * m * m / np.exp2(-register.astype(np.float64)).sum(axis=1)
+    kosong = (register == 0).sum(axis=1)
+    kecil = (mentah <= 2.5 * m) & (kosong > 0)
+    linear = m * np.log(m / np.maximum(kosong, 1))
+    return np.where(kecil, linear, mentah)
+
+def galat_hll(presisi):
+    """Galat baku relatif HyperLogLog dengan 2^presisi register."""
+    return 1.04 / np.sqrt(1 << presisi)
+
+# --- Sketsa kuantil bucket logaritmik ---
+def _gamma(alpha):
+    return (1 + alpha) / (1 - alpha)
+
+def bucket_kuantil(nilai, alpha):
+    """Indeks bucket untuk nilai > 0; nilai <= 0 dihitung terpisah (jumlah_nol)."""
+    nilai = np.asarray(nilai, dtype=np.float64)
+    return np.ceil(np.log(nilai) / np.log(_gamma(alpha))).astype(np.int32)
+
+def kuantil(indeks, hitungan, jumlah_nol, daftar_q, alpha):
+    """
+    Kuantil dari satu sketsa (indeks bucket terurut, hitungan per bucket, jumlah nilai <= 0).
+    Nilai bucket = titik tengah relatifnya, jadi galat relatif <= alpha.
+    """
+    total = int(hitungan.sum()) + int(jumlah_nol)
+    if total == 0:
+        return [np.nan] * len(daftar_q)
+    gamma = _gamma(alpha)
+    kumulatif = np.cumsum(hitungan)
+    hasil = []
+    for q in daftar_q:
+        rank = q * (total - 1)
+        if rank < jumlah_nol:
+            hasil.append(0.0)
+            continue
+        posisi = min(int(np.searchsorted(kumulatif, rank - jumlah_nol, side='right')), len(indeks) - 1)
+        hasil.append(2 * gamma ** float(indeks[posisi]) / (gamma + 1))
+    return hasil
+
+def _kode_kuantil(indeks, hitungan):
+    return zlib.compress(indeks.astype('<i4').tobytes() + hitungan.astype('<i8').tobytes())
+
+def _urai_kuantil(data):
+    mentah = zlib.decompress(bytes(data))
+    n = len(mentah) // 12
+    return np.frombuffer(mentah[:4 * n], dtype='<i4'), np.frombuffer(mentah[4 * n:], dtype='<i8')
+
+def _urai_hll(data, presisi):
+    register = np.frombuffer(zlib.decompress(bytes(data)), dtype=np.uint8)
+    if len(register) != 1 << presisi:
+        raise ValueError(f"Ukuran register HLL {len(register)} tidak cocok dengan presisi {presisi}.")
+    return register
+
+# --- Pemeliharaan tabel sketsa ---
+def pastikan_tabel_sketsa(connection):
+    """Membuat tabel sketsa jika belum ada. Mengembalikan True jika baru dibuat (sketsa perlu dibangun untuk semua bulan)."""
+    if sa_inspect(connection).has_table(TABEL_SKETSA):
+        return False
+    connection.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {TABEL_SKETSA} (
+            bulan INTEGER NOT NULL,
+            id_lokasi INTEGER NOT NULL,
+            kategori TEXT NOT NULL,
+            presisi_hll SMALLINT NOT NULL,
+            alpha_kuantil DOUBLE PRECISION NOT NULL,
+            jumlah_baris BIGINT NOT NULL,
+            jumlah_nol BIGINT NOT NULL,
+            hll BYTEA NOT NULL,
+            kuantil BYTEA NOT NULL,
+            PRIMARY KEY (bulan, id_lokasi, kategori)
+        )
+    """))
+    return True
+
+def bulan_basi(connection):
+    """Bulan yang sketsanya dibuat dengan presisi/alpha lain dari config (perlu dibangun ulang)."""
+    rows = connection.execute(text(f"""
+        SELECT DISTINCT bulan FROM {TABEL_SKETSA} WHERE presisi_hll <> :presisi OR alpha_kuantil <> :alpha
+    """), {'presisi': config.SKETSA_HLL_PRESISI, 'alpha': config.SKETSA_KUANTIL_ALPHA}).fetchall()
+    return [row[0] for row in rows]
+
+def hapus_bulan(connection, daftar_bulan):
+    if daftar_bulan:
+        connection.execute(text(f"DELETE FROM {TABEL_SKETSA} WHERE bulan = ANY(:bulan)"), {'bulan': list(daftar_bulan)})
+
+def _baca_bulan(connection, bulan):
+    """Baris fakta satu bulan (partisi bulan itu saja) lewat server-side cursor di transaksi yang sedang berjalan."""
+    query = text("""
+        SELECT COALESCE(f.id_lokasi, 0) AS id_lokasi, COALESCE(dp.kategori, '') AS kategori, f.pelanggan_key, f.total_harga
+        FROM "Fakta_Penjualan" f LEFT JOIN "Dim_Produk" dp ON f.id_produk = dp.id_produk
+        WHERE f.id_waktu >= :dari AND f.id_waktu < :sampai
+    """).execution_options(stream_results=True, max_row_buffer=config.STREAM_CHUNKSIZE)
+    # Rentang [YYYYMM00, (YYYYMM+1)00) mencakup tepat id_waktu bulan itu, dan memungkinkan partition pruning
+    result = connection.execute(query, {'dari': bulan * 100, 'sampai': (bulan + 1) * 100})
+    potongan = []
+    while True:
+        rows = result.fetchmany(config.STREAM_CHUNKSIZE)
+        if not rows:
+            break
+        potongan.append(pd.DataFrame.from_records(rows, columns=['id_lokasi', 'kategori', 'pelanggan_key', 'total_harga']))
+    return pd.concat(potongan, ignore_index=True) if potongan else None
+
+def _sketsa_bulan(df, bulan, presisi, alpha):
+    """Baris tabel sketsa (satu per id_lokasi x kategori) dari baris fakta satu bulan."""
+    grup = df.groupby(['id_lokasi', 'kategori'], sort=True)
+    kode = grup.ngroup().to_numpy()
+    kunci = grup.size()
+    register = register_hll(kode, len(kunci), df['pelanggan_key'].to_numpy(), presisi)
+
+    nilai = df['total_harga'].to_numpy(dtype=np.float64)
+    positif = nilai > 0
+    jumlah_nol = np.bincount(kode[~positif], minlength=len(kunci))
+    # Hitungan per (grup, bucket), terurut per grup lalu per bucket
+    bucket = pd.DataFrame({'grup': kode[positif], 'bucket': bucket_kuantil(nilai[positif], alpha)})
+    hitungan = bucket.groupby(['grup', 'bucket'], sort=True).size()
+    grup_bucket = hitungan.index.get_level_values('grup').to_numpy()
+    batas = np.searchsorted(grup_bucket, np.arange(len(kunci) + 1))
+    indeks_bucket = hitungan.index.get_level_values('bucket').to_numpy()
+    hitungan = hitungan.to_numpy()
+
+    return pd.DataFrame({
+        'bulan': bulan,
+        'id_lokasi': kunci.index.get_level_values('id_lokasi').astype('int64'),
+        'kategori': kunci.index.get_level_values('kategori'),
+        'presisi_hll': presisi,
+        'alpha_kuantil': alpha,
+        'jumlah_baris': kunci.to_numpy(),
+        'jumlah_nol': jumlah_nol,
+        # BYTEA lewat COPY csv memakai format hex '\x...'
+        'hll': ['\\x' + zlib.compress(baris.tobytes()).hex() for baris in register],
+        'kuantil': ['\\x' + _kode_kuantil(indeks_bucket[a:b], hitungan[a:b]).hex() for a, b in zip(batas[:-1], batas[1:])],
+    })
+
+def bangun_ulang_bulan(connection, daftar_bulan):
+    """
+    Membangun ulang sketsa bulan-bulan YYYYMM dari isi Fakta_Penjualan (dipanggil di transaksi load fakta,
+    jadi baris yang baru dimuat sudah terlihat). Mengembalikan jumlah baris sketsa yang ditulis.
+    """
+    daftar_bulan = sorted(set(daftar_bulan))
+    hapus_bulan(connection, daftar_bulan)
+    jumlah = 0
+    for bulan in daftar_bulan:
+        df = _baca_bulan(connection, bulan)
+        if df is None:
+            continue
+        df_sketsa = _sketsa_bulan(df, bulan, config.SKETSA_HLL_PRESISI, config.SKETSA_KUANTIL_ALPHA)
+        jumlah += database.bulk_load(df_sketsa, TABEL_SKETSA, connection)
+    return jumlah
+
+# --- Jawaban laporan dari sketsa yang di-merge ---
+def pelanggan_unik_per_kota_bulan(engine):
+    """
+    Perkiraan pelanggan unik per kota & bulan: HLL semua kategori di-merge (max register).
+    Batas galat = +/- 1.96 x galat baku (kira-kira selang kepercayaan 95%).
+    """
+    mulai = time.perf_counter()
+    with engine.connect() as connection:
+        rows = connection.execute(text(f"""
+            SELECT s.bulan, s.id_lokasi, COALESCE(l.nama_kota, '(tanpa lokasi)') AS nama_kota, s.presisi_hll, s.hll
+            FROM {TABEL_SKETSA} s LEFT JOIN "Dim_Lokasi" l ON s.id_lokasi = l.id_lokasi
+            ORDER BY s.bulan, s.id_lokasi
+        """)).fetchall()
+    kolom = ['bulan', 'nama_kota', 'perkiraan_pelanggan_unik', 'galat_relatif', 'batas_bawah', 'batas_atas']
+    if not rows:
+        return pd.DataFrame(columns=kolom), 0.0
+    presisi = rows[0][3]
+    register = np.stack([_urai_hll(row[4], presisi) for row in rows])
+    kunci = pd.DataFrame.from_records([row[:3] for row in rows], columns=['bulan', 'id_lokasi', 'nama_kota'])
+    # Baris sudah terurut per (bulan, id_lokasi): awal setiap grup -> reduceat
+    awal = np.flatnonzero(np.r_[True, (kunci[['bulan', 'id_lokasi']].diff().abs().sum(axis=1) != 0).to_numpy()[1:]])
+    gabungan = np.maximum.reduceat(register, awal, axis=0)
+
+    galat = galat_hll(presisi)
+    perkiraan = estimasi_hll(gabungan)
+    df = kunci.iloc[awal][['bulan', 'nama_kota']].reset_index(drop=True)
+    df['perkiraan_pelanggan_unik'] = np.round(perkiraan).astype('int64')
+    df['galat_relatif'] = galat
+    df['batas_bawah'] = np.floor(perkiraan * (1 - 1.96 * galat)).clip(min=0).astype('int64')
+    df['batas_atas'] = np.ceil(perkiraan * (1 + 1.96 * galat)).astype('int64')
+    return df[kolom], (time.perf_counter() - mulai) * 1000
+
+def persentil_belanja_per_kategori(engine, daftar_q=None, sejak_bulan=None):
+    """
+    Persentil total_harga per kategori dari sketsa kuantil semua bulan (atau sejak bulan YYYYMM) & lokasi.
+    Setiap persentil dijamin dalam galat relatif alpha: nilai asli ada di [p / (1 + alpha), p / (1 - alpha)].
+    """
+    daftar_q = daftar_q or config.SKETSA_PERSENTIL
+    mulai = time.perf_counter()
+    with engine.connect() as connection:
+        rows = connection.execute(text(f"""
+            SELECT kategori, alpha_kuantil, jumlah_nol, kuantil FROM {TABEL_SKETSA}
+            WHERE bulan >= :sejak ORDER BY kategori
+        """), {'sejak': sejak_bulan or 0}).fetchall()
+
+    hasil = []
+    for kategori, baris in pd.DataFrame.from_records(rows, columns=['kategori', 'alpha', 'nol', 'kuantil']).groupby('kategori', sort=True):
+        alpha = float(baris['alpha'].iloc[0])
+        terurai = [_urai_kuantil(data) for data in baris['kuantil']]
+        # Merge: hitungan bucket yang sama dijumlahkan
+        gabungan = pd.Series(np.concatenate([h for _, h in terurai])).groupby(np.concatenate([i for i, _ in terurai])).sum()
+        nilai = kuantil(gabungan.index.to_numpy(), gabungan.to_numpy(), int(baris['nol'].sum()), daftar_q, alpha)
+        entri = {'kategori': kategori or None, 'jumlah_baris': int(gabungan.sum() + baris['nol'].sum()), 'galat_relatif': alpha}
+        for q, p in zip(daftar_q, nilai):
+            entri[f"p{q * 100:g}"] = p
+        hasil.append(entri)
+    return pd.DataFrame(hasil), (time.perf_counter() - mulai) * 1000
@@ -0,0 +1,146 @@
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from sqlalchemy import text, inspect as sa_inspect
+import config
+import database
+
+# Validasi kualitas data per batch sebelum dimuat, sepenuhnya dengan operasi kolom (tanpa loop per baris).
+# Baris yang gagal tidak lagi menggagalkan seluruh tahap: baris itu dipindah ke tabel
+# config.QUARANTINE_PREFIX + <nama> beserta alasannya (dipisah ';' jika lebih dari satu),
+# dan baris valid tetap dimuat di pass yang sama, jadi tidak perlu menjalankan ulang run.
+
+def _mask(nilai):
+    """Mask boolean numpy dari Series/array (NA dianggap lolos)."""
+    if isinstance(nilai, pd.Series):
+        return nilai.fillna(False).to_numpy(dtype=bool)
+    return np.asarray(nilai, dtype=bool)
+
+def _tandai(alasan, mask, label):
+    """Menambahkan label ke alasan baris-baris yang mask-nya True."""
+    mask = _mask(mask)
+    if not mask.any():
+        return alasan
+    return alasan.where(~mask, alasan + ';' + label)
+
+def _parse_kolom(seri, dtype):
+    """
+    (nilai, mask tipe tidak valid) untuk satu kolom. Kolom yang sudah bertipe benar (pembaca cepat)
+    dilewatkan apa adanya; kolom teks mentah di-parse dengan errors='coerce'.
+    """
+    tidak_ada = np.zeros(len(seri), dtype=bool)
+    kosong = seri.isna()
+    if dtype.startswith('datetime'):
+        if pd.api.types.is_datetime64_any_dtype(seri):
+            return seri, tidak_ada
+        nilai = pd.to_datetime(seri, errors='coerce')
+        return nilai, _mask(~kosong & nilai.isna())
+
+    jenis = dtype.lower()
+    if jenis.startswith('int'):
+        if pd.api.types.is_integer_dtype(seri):
+            return seri, tidak_ada
+        nilai = pd.to_numeric(seri, errors='coerce').astype('float64')
+        batas = np.iinfo(jenis)
+        salah = nilai.isna() | (nilai % 1 != 0) | (nilai < batas.min) | (nilai > batas.max)
+        return nilai, _mask(~kosong & salah)
+    if jenis.startswith('float'):
+        if pd.api.types.is_float_dtype(seri):
+            return seri, tidak_ada
+        nilai = pd.to_numeric(seri, errors='coerce').astype('float64')
+        return nilai, _mask(~kosong & nilai.isna())
+    # Teks (string/category): semua nilai valid secara tipe
+    return seri, tidak_ada
+
+# --- Aturan bisnis per dataset: fungsi (df ter-parse, referensi) -> [(label, mask)] ---
+def _cek_referensi(df, referensi):
+    """Keberadaan kunci di dimensi: referensi = {kolom: array kunci valid}."""
+    return [(f"{kolom}_tidak_dikenal", df[kolom].notna() & ~df[kolom].isin(kunci_valid))
+            for kolom, kunci_valid in referensi.items() if kolom in df.columns]
+
+def _aturan_penjualan(df, referensi):
+    hasil = []
+    if {'jumlah_barang', 'harga_satuan', 'total_harga'} <= set(df.columns):
+        selisih = (df['total_harga'] - df['jumlah_barang'] * df['harga_satuan']).abs()
+        hasil.append(('total_harga_tidak_cocok', selisih > config.VALIDASI_TOLERANSI_TOTAL))
+    if 'jumlah_barang' in df.columns:
+        hasil.append(('jumlah_barang_tidak_positif', df['jumlah_barang'] <= 0))
+    if 'harga_satuan' in df.columns:
+        hasil.append(('harga_negatif', df['harga_satuan'] < 0))
+    if 'tanggal_order' in df.columns:
+        awal = pd.Timestamp(config.VALIDASI_TANGGAL_MIN)
+        akhir = pd.Timestamp.now().normalize() + pd.Timedelta(days=config.VALIDASI_TANGGAL_MAKS_HARI_KE_DEPAN)
+        hasil.append(('tanggal_di_luar_rentang', (df['tanggal_order'] < awal) | (df['tanggal_order'] > akhir)))
+    return hasil + _cek_referensi(df, referensi)
+
+def _aturan_produk(df, referensi):
+    hasil = []
+    if 'harga_standar' in df.columns:
+        hasil.append(('harga_negatif', df['harga_standar'] < 0))
+    return hasil + _cek_referensi(df, referensi)
+
+_ATURAN = {
+    'penjualan': _aturan_penjualan,
+    'produk': _aturan_produk,
+    'pelanggan': _cek_referensi,
+}
+
+def validasi(df, nama, referensi=None):
+    """
+    Memvalidasi satu batch dataset 'nama' terhadap registry skema (tipe & nullability),
+    kunci unik dataset, dan aturan bisnisnya. df boleh sudah bertipe atau berisi teks mentah.
+    Hanya kolom yang ada di df yang diperiksa (mis. pembacaan dengan proyeksi kolom).
+    Mengembalikan (df_valid, df_karantina): df_valid berisi nilai ter-parse (belum di-cast ke dtype
+    ringkas), df_karantina berisi baris asli + kolom 'alasan'.
+    """
+    meta = config.DATASET_LAKE[nama]
+    alasan = pd.Series('', index=df.index, dtype=object)
+    bersih = pd.DataFrame(index=df.index)
+    for kolom, spec in meta['skema'].items():
+        if kolom not in df.columns:
+            continue
+        nilai, salah_tipe = _parse_kolom(df[kolom], spec['dtype'])
+        bersih[kolom] = nilai
+        alasan = _tandai(alasan, salah_tipe, f"tipe_tidak_valid:{kolom}")
+        if not spec.get('nullable', True):
+            alasan = _tandai(alasan, df[kolom].isna(), f"kosong:{kolom}")
+
+    for label, mask in _ATURAN.get(nama, _cek_referensi)(bersih, referensi or {}):
+        alasan = _tandai(alasan, mask, label)
+    kunci = meta.get('kunci')
+    if kunci in bersih.columns:
+        # Kunci dobel: baris terakhir di sumber yang dipakai (sama seperti dedup di tahap fakta/SCD2)
+        alasan = _tandai(alasan, bersih[kunci].notna() & bersih[kunci].duplicated(keep='last'), f"duplikat:{kunci}")
+
+    salah = (alasan != '').to_numpy()
+    if not salah.any():
+        return bersih, df.iloc[0:0].assign(alasan=pd.Series(dtype=object))
+    df_karantina = df[salah].copy()
+    df_karantina['alasan'] = alasan[salah].str.lstrip(';')
+    return bersih[~salah], df_karantina
+
+def ringkas_alasan(df_karantina):
+    """'alasan_a: n, alasan_b: m' untuk log (baris dengan beberapa alasan dihitung per alasan)."""
+    jumlah = df_karantina['alasan'].str.split(';').explode().value_counts()
+    return ', '.join(f"{alasan}: {n}" for alasan, n in jumlah.items())
+
+def simpan_karantina(engine, nama, df_karantina, kolom_kunci=None, kunci_diproses=None):
+    """
+    Menulis baris gagal ke tabel config.QUARANTINE_PREFIX + nama (kolom sumber sebagai teks,
+    ditambah alasan & tgl_karantina).
+    kolom_kunci=None -> isi tabel diganti (satu snapshot per konversi sumber);
+    kolom_kunci='nama_file' -> hanya baris milik kunci_diproses yang diganti, jadi file yang
+    kini sudah benar ikut keluar dari karantina.
+    Mengembalikan jumlah baris yang dikarantina.
+    """
+    tabel = config.QUARANTINE_PREFIX + nama
+    df = df_karantina.astype('string')
+    df['tgl_karantina'] = datetime.now()
+    with engine.begin() as connection:
+        if kolom_kunci is None:
+            database.bulk_load(df, tabel, connection, if_exists='replace')
+            return len(df)
+        if sa_inspect(connection).has_table(tabel):
+            connection.execute(text(f'DELETE FROM {tabel} WHERE "{kolom_kunci}" = ANY(:kunci)'), {'kunci': list(kunci_diproses or [])})
+        database.bulk_load(df, tabel, connection)
+    return len(df)